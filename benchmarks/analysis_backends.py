@@ -0,0 +1,77 @@
+import argparse
+import random
+import time
+
+import networkx as nx
+
+from reponetwork.SparseBipartite import SparseBipartite
+
+
+def synthetic_graph(repos: int, users: int, contributors: int, seed: int) -> nx.Graph:
+    rng = random.Random(seed)
+    g = nx.Graph()
+    population = ['user{0}'.format(i) for i in range(users)]
+    g.add_nodes_from(population, bipartite=1)
+    for i in range(repos):
+        repo_id = 'org{0}/project{0}'.format(i)
+        g.add_node(repo_id, bipartite=0, language='?', weight=0)
+        size = min(users, max(1, int(rng.paretovariate(1.1) * contributors / 5)))
+        g.add_edges_from((u, repo_id) for u in rng.sample(population, size))
+    g.remove_nodes_from([n for n in population if g.degree[n] == 0])
+    return g
+
+
+def analyze_networkx(g: nx.Graph, repos: set, users: set, betweenness: bool) -> dict:
+    results = {'degree': nx.algorithms.bipartite.degree_centrality(g, repos),
+               'closeness': nx.algorithms.bipartite.closeness_centrality(g, repos, normalized=True)}
+    if betweenness:
+        results['betweenness'] = nx.algorithms.bipartite.betweenness_centrality(g, users)
+    return results
+
+
+def analyze_sparse(g: nx.Graph, repos: set, users: set, betweenness: bool) -> dict:
+    matrix = SparseBipartite(g, repos)
+    results = {'degree': matrix.degree_centrality(), 'closeness': matrix.closeness_centrality('repos')}
+    if betweenness:
+        results['betweenness'] = matrix.betweenness_centrality()
+    return results
+
+
+def max_difference(expected: dict, actual: dict) -> float:
+    # The sparse closeness is only computed for the repositories, the ones reported by analize_graph.
+    return max((abs(expected[n] - v) for n, v in actual.items()), default=0.0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare the networkx and sparse analysis backends.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100, 300, 1000],
+                        help='Number of repositories of each synthetic graph.')
+    parser.add_argument('--users-per-repo', type=int, default=10)
+    parser.add_argument('--contributors', type=int, default=20)
+    parser.add_argument('--betweenness-limit', type=int, default=300,
+                        help='Skip the betweenness centrality on graphs with more repositories than this.')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    print('{0:>7} {1:>8} {2:>9} {3:>11} {4:>10} {5:>8} {6:>10}'.format(
+        'repos', 'users', 'edges', 'networkx', 'sparse', 'speedup', 'max error'))
+    for size in args.sizes:
+        g = synthetic_graph(size, size * args.users_per_repo, args.contributors, args.seed)
+        repos = {n for n, d in g.nodes(data=True) if d['bipartite'] == 0}
+        users = set(g) - repos
+        betweenness = size <= args.betweenness_limit
+
+        timings = []
+        results = []
+        for analyze in (analyze_networkx, analyze_sparse):
+            start = time.perf_counter()
+            results.append(analyze(g, repos, users, betweenness))
+            timings.append(time.perf_counter() - start)
+        error = max(max_difference(results[0][k], results[1][k]) for k in results[0])
+        print('{0:7} {1:8} {2:9} {3:10.2f}s {4:9.2f}s {5:7.1f}x {6:10.2e}{7}'.format(
+            len(repos), len(users), g.number_of_edges(), timings[0], timings[1], timings[0] / timings[1], error,
+            '' if betweenness else ' (no betweenness)'))
+
+
+if __name__ == '__main__':
+    main()
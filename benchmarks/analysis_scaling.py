@@ -0,0 +1,56 @@
+import argparse
+import contextlib
+import io
+import random
+import time
+
+import networkx as nx
+
+from reponetwork.repos import analize_graph, count_forks
+
+
+def synthetic_graph(nodes: int, fork_ratio: float, seed: int) -> nx.Graph:
+    # One repository every ten nodes, with small communities and many isolated projects, like a crawl does.
+    rng = random.Random(seed)
+    g = nx.Graph()
+    repos = max(1, nodes // 10)
+    users = nodes - repos
+    for i in range(repos):
+        g.add_node('repo{0}'.format(i), bipartite=0, language='?', weight=rng.randrange(100))
+    g.add_nodes_from(('user{0}'.format(i) for i in range(users)), bipartite=1)
+    for i in range(users):
+        repo = rng.randrange(repos)
+        g.add_edge('user{0}'.format(i), 'repo{0}'.format(repo), relation='contributor')
+        if rng.random() < fork_ratio:
+            # Forks of popular repositories stay close to them.
+            parent = min(repo, rng.randrange(repos) // 100)
+            g.add_edge('user{0}'.format(i), 'repo{0}'.format(parent), relation='fork', fork_source='fork')
+    return g
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure how the graph statistics of analize_graph scale.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 30000, 100000, 300000, 1000000],
+                        help='Number of nodes of each synthetic graph.')
+    parser.add_argument('--fork-ratio', type=float, default=0.3)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    print('{0:>9} {1:>9} {2:>11} {3:>11} {4:>10}'.format('nodes', 'edges', 'analysis', 'forks', 'us/node'))
+    for size in args.sizes:
+        g = synthetic_graph(size, args.fork_ratio, args.seed)
+        repos = {n for n, d in g.nodes(data=True) if d['bipartite'] == 0}
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            # The centrality measures are skipped with limit 0, they are measured by the other benchmarks.
+            analize_graph(g, limit=0)
+        analysis = time.perf_counter() - start
+        start = time.perf_counter()
+        count_forks(g, repos)
+        forks = time.perf_counter() - start
+        print('{0:9} {1:9} {2:10.2f}s {3:10.2f}s {4:10.2f}'.format(
+            g.number_of_nodes(), g.number_of_edges(), analysis, forks, (analysis + forks) / size * 1e6))
+
+
+if __name__ == '__main__':
+    main()
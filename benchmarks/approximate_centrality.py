@@ -0,0 +1,57 @@
+import argparse
+import time
+
+from benchmarks.analysis_backends import synthetic_graph
+from reponetwork.SparseBipartite import SparseBipartite
+
+
+def top(values: dict, nodes: list, limit: int) -> list:
+    return sorted(nodes, key=lambda n: values[n], reverse=True)[:limit]
+
+
+def compare(name: str, exact: dict, approximate: dict, errors: dict, nodes: list, limit: int):
+    expected = top(exact, nodes, limit)
+    found = top(approximate, nodes, limit)
+    overlap = len(set(expected) & set(found)) / max(len(expected), 1)
+    covered = sum(1 for n in found if abs(approximate[n] - exact[n]) <= errors[n]) / max(len(found), 1)
+    return '{0} overlap {1:4.0%} covered {2:4.0%}'.format(name, overlap, covered)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare the top-k rankings of the sampled centrality measures '
+                                                 'with the exact ones on seeded random graphs.')
+    parser.add_argument('--repos', type=int, default=300)
+    parser.add_argument('--users-per-repo', type=int, default=10)
+    parser.add_argument('--contributors', type=int, default=20)
+    parser.add_argument('--pivots', type=int, nargs='+', default=[64, 256, 1024])
+    parser.add_argument('--limit', type=int, default=10)
+    parser.add_argument('--confidence', type=float, default=0.95)
+    parser.add_argument('--seeds', type=int, default=3)
+    args = parser.parse_args()
+
+    for seed in range(args.seeds):
+        g = synthetic_graph(args.repos, args.repos * args.users_per_repo, args.contributors, seed)
+        matrix = SparseBipartite(g)
+        start = time.perf_counter()
+        closeness = matrix.closeness_centrality('repos')
+        betweenness = matrix.betweenness_centrality()
+        print('seed {0}: {1} nodes, {2} edges, exact {3:.2f}s'.format(
+            seed, g.number_of_nodes(), g.number_of_edges(), time.perf_counter() - start))
+        for pivots in args.pivots:
+            start = time.perf_counter()
+            sampled_closeness, closeness_errors, closeness_pivots = matrix.sample_closeness_centrality(
+                pivots, limit=args.limit, confidence=args.confidence, seed=seed)
+            sampled_betweenness, betweenness_errors, betweenness_pivots = matrix.sample_betweenness_centrality(
+                pivots, limit=args.limit, confidence=args.confidence, seed=seed)
+            elapsed = time.perf_counter() - start
+            print('  {0:5} pivots {1:6.2f}s  {2} ({3} pivots)  {4} ({5} pivots)'.format(
+                pivots, elapsed,
+                compare('closeness', closeness, sampled_closeness, closeness_errors, matrix.repos, args.limit),
+                closeness_pivots,
+                compare('betweenness', betweenness, sampled_betweenness, betweenness_errors, matrix.users,
+                        args.limit),
+                betweenness_pivots))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+import argparse
+import contextlib
+import io
+import time
+
+import networkx as nx
+
+from benchmarks.mock_api import Ecosystem, MockServer
+from reponetwork.AsyncGithubCrawler import AsyncGithubCrawler
+from reponetwork.GithubCrawler import GithubCrawler
+
+
+def crawl(crawler, query: str, limit: int) -> nx.Graph:
+    g = None
+    with contextlib.redirect_stdout(io.StringIO()):
+        for g in crawler.find(query, limit=limit):
+            pass
+    return g
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare the threaded, GraphQL and asynchronous crawling engines.')
+    parser.add_argument('--repos', type=int, default=60)
+    parser.add_argument('--users', type=int, default=400)
+    parser.add_argument('--latency', type=float, default=0.05, help='Simulated server latency in seconds.')
+    parser.add_argument('--abuse-limit', type=int, default=None,
+                        help='Answer with Retry-After when more requests than this are in flight.')
+    parser.add_argument('--workers', type=int, default=64)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    ecosystem = Ecosystem(repos=args.repos, users=args.users, seed=args.seed)
+    print('Ecosystem with {0} repositories.'.format(len(ecosystem.repos)))
+    graphs = {}
+    for name in ('threads', 'graphql', 'async'):
+        with MockServer(ecosystem, latency=args.latency, abuse_limit=args.abuse_limit) as server:
+            if name in ('threads', 'graphql'):
+                crawler = GithubCrawler(token=None, user=None, password=None, url=server.base_url,
+                                        graphql=name == 'graphql')
+            else:
+                crawler = AsyncGithubCrawler(token=None, user=None, password=None, url=server.base_url,
+                                             max_workers=args.workers)
+            start = time.perf_counter()
+            g = crawl(crawler, 'project', limit=None)
+            elapsed = time.perf_counter() - start
+            graphs[name] = g
+            print('{0:8} {1:8.2f}s {2:6} requests {3:8.1f} req/s {4:4} max in flight {5:6} nodes {6:6} edges'.format(
+                name, elapsed, server.requests, server.requests / elapsed, server.max_in_flight,
+                g.number_of_nodes(), g.number_of_edges()))
+
+    for name in ('graphql', 'async'):
+        same = set(graphs['threads'].nodes) == set(graphs[name].nodes) and \
+            {frozenset(e) for e in graphs['threads'].edges} == {frozenset(e) for e in graphs[name].edges}
+        print('The {0} engine built {1} graph as the threaded engine.'.format(name, 'the same' if same else 'a different'))
+
+
+if __name__ == '__main__':
+    main()
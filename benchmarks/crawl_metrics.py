@@ -0,0 +1,40 @@
+import argparse
+import os
+import tempfile
+import time
+
+from benchmarks.crawl_engines import crawl
+from benchmarks.mock_api import Ecosystem, MockServer
+from reponetwork.CrawlMetrics import CrawlMetrics
+from reponetwork.GithubCrawler import GithubCrawler
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure the cost of the crawl metrics and print a crawl profile.')
+    parser.add_argument('--repos', type=int, default=60)
+    parser.add_argument('--users', type=int, default=400)
+    parser.add_argument('--latency', type=float, default=0.02, help='Simulated server latency in seconds.')
+    parser.add_argument('--interval', type=float, default=0.1, help='Seconds between the metric snapshots.')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    ecosystem = Ecosystem(repos=args.repos, users=args.users, seed=args.seed)
+    print('Ecosystem with {0} repositories.'.format(len(ecosystem.repos)))
+    with tempfile.TemporaryDirectory() as directory:
+        for name in ('memory', 'jsonl', 'prom'):
+            path = os.path.join(directory, 'metrics.' + name) if name != 'memory' else None
+            metrics = CrawlMetrics(path, interval=args.interval)
+            with MockServer(ecosystem, latency=args.latency, quota=100000) as server:
+                crawler = GithubCrawler(token=None, user=None, password=None, url=server.base_url, metrics=metrics)
+                start = time.perf_counter()
+                crawl(crawler, 'project', limit=None)
+                elapsed = time.perf_counter() - start
+            metrics.close()
+            counted = sum(h.count for h in metrics.requests.values())
+            print('{0:8} {1:8.2f}s {2:6} requests {3:6} counted {4:8} bytes written'.format(
+                name, elapsed, server.requests, counted, os.path.getsize(path) if path else 0))
+    metrics.print_summary()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+import argparse
+import contextlib
+import io
+import multiprocessing
+import os
+import tempfile
+import time
+
+import networkx as nx
+
+from benchmarks.mock_api import Ecosystem, MockServer
+from reponetwork.DistributedCrawler import CrawlCoordinator, CrawlWorker
+from reponetwork.GithubCrawler import GithubCrawler
+from reponetwork.WorkQueue import WorkQueue
+
+
+def crawl(crawler, query: str) -> nx.Graph:
+    g = None
+    with contextlib.redirect_stdout(io.StringIO()):
+        for g in crawler.find(query):
+            pass
+    return g
+
+
+def run_worker(url: str, token: str, path: str, batch: int):
+    with contextlib.redirect_stdout(io.StringIO()):
+        crawler = GithubCrawler(token=token, user=None, password=None, url=url)
+        CrawlWorker(crawler, WorkQueue(path), name=token, batch=batch, poll=0.1).run()
+
+
+def distributed_crawl(url: str, query: str, workers: int, batch: int, directory: str) -> nx.Graph:
+    path = os.path.join(directory, 'queue{0}.db'.format(workers))
+    processes = [multiprocessing.Process(target=run_worker, args=(url, 'worker{0}'.format(i), path, batch))
+                 for i in range(workers)]
+    for process in processes:
+        process.start()
+    crawler = GithubCrawler(token='coordinator', user=None, password=None, url=url)
+    g = crawl(CrawlCoordinator(crawler, WorkQueue(path), poll=0.1), query)
+    for process in processes:
+        process.join()
+    return g
+
+
+def same_graph(g1: nx.Graph, g2: nx.Graph) -> bool:
+    return set(g1.nodes) == set(g2.nodes) and \
+        {frozenset(e) for e in g1.edges} == {frozenset(e) for e in g2.edges}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure how a distributed crawl scales with the number of tokens.')
+    parser.add_argument('--repos', type=int, default=80)
+    parser.add_argument('--users', type=int, default=300)
+    parser.add_argument('--latency', type=float, default=0.01, help='Simulated server latency in seconds.')
+    parser.add_argument('--quota', type=int, default=40, help='Requests allowed to each token in each window.')
+    parser.add_argument('--window', type=float, default=1, help='Seconds of the rate limit window.')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--batch', type=int, default=5, help='Repositories claimed at once by each worker.')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    ecosystem = Ecosystem(repos=args.repos, users=args.users, seed=args.seed)
+    print('Ecosystem with {0} repositories.'.format(len(ecosystem.repos)))
+    with MockServer(ecosystem, latency=args.latency) as server:
+        expected = crawl(GithubCrawler(token=None, user=None, password=None, url=server.base_url), 'project')
+    print('Local crawl: {0} nodes {1} edges'.format(expected.number_of_nodes(), expected.number_of_edges()))
+
+    baseline = None
+    with tempfile.TemporaryDirectory() as directory:
+        for workers in args.workers:
+            with MockServer(ecosystem, latency=args.latency, quota=args.quota, window=args.window,
+                            per_token=True) as server:
+                start = time.perf_counter()
+                g = distributed_crawl(server.base_url, 'project', workers, args.batch, directory)
+                elapsed = time.perf_counter() - start
+                requests = server.requests
+            baseline = baseline or elapsed * workers
+            print('{0:2} workers {1:8.2f}s {2:6} requests {3:6.2f}x speedup {4:6} nodes {5:6} edges, {6} graph'.format(
+                workers, elapsed, requests, baseline / elapsed, g.number_of_nodes(), g.number_of_edges(),
+                'same' if same_graph(expected, g) else 'different'))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+import argparse
+import contextlib
+import io
+import time
+
+import networkx as nx
+
+from benchmarks.mock_api import Ecosystem, MockServer
+from reponetwork.AsyncGithubCrawler import AsyncGithubCrawler
+from reponetwork.GithubCrawler import GithubCrawler
+
+
+def crawl(crawler, query: str) -> nx.Graph:
+    g = None
+    with contextlib.redirect_stdout(io.StringIO()):
+        for g in crawler.find(query):
+            pass
+    return g
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure the fork frontier on an ecosystem with deep fork trees.')
+    parser.add_argument('--repos', type=int, default=30)
+    parser.add_argument('--users', type=int, default=400)
+    parser.add_argument('--fork-ratio', type=float, default=0.6)
+    parser.add_argument('--fork-depth', type=int, default=5)
+    parser.add_argument('--latency', type=float, default=0.02, help='Simulated server latency in seconds.')
+    parser.add_argument('--search-forks', action='store_true',
+                        help='Let the search find the forks as well as the original repositories.')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    ecosystem = Ecosystem(repos=args.repos, users=args.users, fork_ratio=args.fork_ratio,
+                          fork_depth=args.fork_depth, seed=args.seed)
+    print('Ecosystem with {0} repositories.'.format(len(ecosystem.repos)))
+    for engine in ('threads', 'async'):
+        for max_depth in (None, 2, 0):
+            for priority in ('depth', 'stars') if max_depth is None else ('depth',):
+                with MockServer(ecosystem, latency=args.latency, search_forks=args.search_forks) as server:
+                    if engine == 'threads':
+                        crawler = GithubCrawler(token=None, user=None, password=None, url=server.base_url,
+                                                max_depth=max_depth, priority=priority)
+                    else:
+                        crawler = AsyncGithubCrawler(token=None, user=None, password=None, url=server.base_url,
+                                                     max_depth=max_depth, priority=priority)
+                    start = time.perf_counter()
+                    g = crawl(crawler, 'project')
+                    elapsed = time.perf_counter() - start
+                repos = sum(1 for _, d in g.nodes(data=True) if d.get('bipartite') == 0)
+                print('{0:8} depth {1:>4} {2:6} {3:7.2f}s {4:5} requests {5:5} repos {6:4} duplicates avoided '
+                      '{7:4} pruned'.format(engine, 'all' if max_depth is None else max_depth, priority, elapsed,
+                                            server.requests, repos, crawler.frontier.duplicates,
+                                            crawler.frontier.pruned))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,43 @@
+import argparse
+import contextlib
+import io
+import sys
+import time
+
+from benchmarks.mock_api import Ecosystem, MockServer
+from reponetwork.GitlabCrawler import GitlabCrawler
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Count the requests made by the GitLab crawler against a mock server.')
+    parser.add_argument('--repos', type=int, default=40)
+    parser.add_argument('--users', type=int, default=300)
+    parser.add_argument('--fork-ratio', type=float, default=0.5)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--max-requests-per-repo', type=float, default=None,
+                        help='Exit with an error when the crawl needs more requests per repository than this.')
+    args = parser.parse_args()
+
+    ecosystem = Ecosystem(repos=args.repos, users=args.users, fork_ratio=args.fork_ratio, seed=args.seed)
+    with MockServer(ecosystem, api='gitlab') as server:
+        crawler = GitlabCrawler(server.base_url, token='benchmark', user=None, password=None)
+        start = time.perf_counter()
+        g = None
+        with contextlib.redirect_stdout(io.StringIO()):
+            for g in crawler.find('project'):
+                pass
+        elapsed = time.perf_counter() - start
+
+    repos = sum(1 for _, d in g.nodes(data=True) if d['bipartite'] == 0)
+    print('Imported {0} of {1} repositories in {2:.2f}s.'.format(repos, len(ecosystem.repos), elapsed))
+    for endpoint, count in sorted(server.endpoints.items(), key=lambda t: -t[1]):
+        print('{0:6} {1}'.format(count, endpoint))
+    ratio = server.requests / max(repos, 1)
+    print('{0} requests, {1:.2f} per repository.'.format(server.requests, ratio))
+    if args.max_requests_per_repo is not None and ratio > args.max_requests_per_repo:
+        print('Request budget of {0} per repository exceeded.'.format(args.max_requests_per_repo))
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+import argparse
+import os
+import random
+import tempfile
+import time
+
+import networkx as nx
+
+from benchmarks.graph_drawing import synthetic_graph
+from reponetwork.CompactGraph import CompactGraph
+from reponetwork.GraphDiff import GraphDiff
+
+
+def next_snapshot(g: nx.Graph, changes: int, seed: int) -> tuple:
+    # A copy of the graph with some repositories removed, some added and some languages changed, and the expected
+    # number of each change.
+    rng = random.Random(seed)
+    h = g.copy()
+    repos = sorted(n for n, d in g.nodes(data=True) if d['bipartite'] == 0)
+    users = sorted(set(g) - set(repos))
+    removed = rng.sample(repos, changes)
+    h.remove_nodes_from(removed)
+    for i in range(changes):
+        repo_id = 'new/project{0}'.format(i)
+        h.add_node(repo_id, bipartite=0, language='Python', weight=0)
+        for user in rng.sample(users, 3):
+            if user in h:
+                h.add_edge(user, repo_id, relation='contributor')
+    shifted = rng.sample([n for n in repos if n in h], changes)
+    for n in shifted:
+        h.nodes[n]['language'] = 'Kotlin'
+    return h, {'removed': len(removed), 'added': changes, 'shifted': len(shifted)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Time the comparison of two snapshots of a graph.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000],
+                        help='Number of repositories of each synthetic graph.')
+    parser.add_argument('--changes', type=int, default=50)
+    parser.add_argument('--isomorphism-limit', type=int, default=10000,
+                        help='Skip could_be_isomorphic on graphs with more nodes than this.')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    print('{0:>8} {1:>8} {2:>14} {3:>9} {4:>9} {5:>8}'.format(
+        'nodes', 'edges', 'isomorphism', 'diff', 'compact', 'correct'))
+    with tempfile.TemporaryDirectory() as directory:
+        for size in args.sizes:
+            g = synthetic_graph(size, args.seed)
+            h, expected = next_snapshot(g, args.changes, args.seed)
+
+            isomorphism = None
+            if len(g) <= args.isomorphism_limit:
+                start = time.perf_counter()
+                nx.could_be_isomorphic(g, h)
+                isomorphism = time.perf_counter() - start
+
+            start = time.perf_counter()
+            diff = GraphDiff(g, h)
+            diff.write(os.path.join(directory, 'diff.json'))
+            elapsed = time.perf_counter() - start
+            old, new = CompactGraph(g), CompactGraph(h)
+            start = time.perf_counter()
+            GraphDiff(old, new)
+            compact = time.perf_counter() - start
+
+            correct = (len(diff.repos[0]), len(diff.repos[1]), len(diff.languages)) == \
+                (expected['removed'], expected['added'], expected['shifted'])
+            print('{0:8} {1:8} {2:>14} {3:8.2f}s {4:8.2f}s {5:>8}'.format(
+                len(g), g.number_of_edges(), '{0:.2f}s'.format(isomorphism) if isomorphism is not None else '-',
+                elapsed, compact, 'yes' if correct else 'no'))
+
+
+if __name__ == '__main__':
+    main()
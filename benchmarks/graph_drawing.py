@@ -0,0 +1,59 @@
+import argparse
+import os
+import tempfile
+import time
+
+import networkx as nx
+
+from benchmarks.graph_memory import synthetic_crawl
+from reponetwork.GraphLayout import GraphLayout
+from reponetwork.GraphStore import GraphStore
+from reponetwork.repos import draw_communities
+
+
+def synthetic_graph(repos: int, seed: int) -> nx.Graph:
+    g = nx.Graph()
+    for nodes, links in synthetic_crawl(repos, repos * 5, repos * 10, seed):
+        g.add_nodes_from(nodes)
+        g.add_edges_from(links)
+    return g
+
+
+def timed(f) -> float:
+    start = time.perf_counter()
+    f()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Time the spring and multilevel layouts and the drawing of graphs.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100, 1000, 10000, 100000],
+                        help='Number of repositories of each synthetic graph.')
+    parser.add_argument('--spring-limit', type=int, default=2000,
+                        help='Skip the spring layout on graphs with more nodes than this.')
+    parser.add_argument('--draw-nodes', type=int, default=2000)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    print('{0:>8} {1:>8} {2:>9} {3:>11} {4:>11} {5:>11}'.format(
+        'nodes', 'edges', 'spring', 'multilevel', 'first draw', 'next draw'))
+    with tempfile.TemporaryDirectory() as directory:
+        for size in args.sizes:
+            g = synthetic_graph(size, args.seed)
+            spring = timed(lambda: nx.spring_layout(g, seed=args.seed)) if len(g) <= args.spring_limit else None
+            multilevel = timed(lambda: GraphLayout(g, seed=args.seed))
+
+            # The first drawing computes the layout and stores it, the next one reads it back.
+            store = GraphStore(os.path.join(directory, 'graph{0}.db'.format(size)))
+            store.save(g)
+            image = os.path.join(directory, 'graph{0}.png'.format(size))
+            draws = [timed(lambda: draw_communities(g, layout='multilevel', max_nodes=args.draw_nodes, output=image,
+                                                    store=store)) for _ in range(2)]
+            store.close()
+            print('{0:8} {1:8} {2:>9} {3:10.2f}s {4:10.2f}s {5:10.2f}s'.format(
+                len(g), g.number_of_edges(), '{0:.2f}s'.format(spring) if spring is not None else '-', multilevel,
+                draws[0], draws[1]))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+import argparse
+import concurrent.futures
+import random
+import time
+from threading import Lock
+
+import networkx as nx
+
+from reponetwork.GraphBuffer import GraphBuffer, GraphWriter
+
+
+def synthetic_repos(repos: int, users: int, contributors: int, seed: int):
+    rng = random.Random(seed)
+    population = ['user{0}'.format(i) for i in range(users)]
+    return [('org{0}/project{0}'.format(i),
+             rng.sample(population, min(users, max(1, int(rng.paretovariate(1.1) * contributors / 5)))))
+            for i in range(repos)]
+
+
+def ingest_locked(repos: list, workers: int) -> nx.Graph:
+    g = nx.Graph()
+    graph_lock = Lock()
+
+    def link_user(repo_id: str, user_id: str, **attr):
+        with graph_lock:
+            if user_id not in g:
+                g.add_node(user_id, bipartite=1)
+            if (user_id, repo_id) not in g.edges:
+                g.add_edge(user_id, repo_id, **attr)
+
+    def import_repo(repo):
+        repo_id, users = repo
+        with graph_lock:
+            g.add_node(repo_id, bipartite=0, language='?', weight=0, date='2020-01-01T00:00:00')
+        for user in users:
+            link_user(repo_id, user, relation='contributor')
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+        for worker in concurrent.futures.as_completed(executor.submit(import_repo, x) for x in repos):
+            worker.result()
+    return g
+
+
+def ingest_buffered(repos: list, workers: int) -> nx.Graph:
+    g = nx.Graph()
+    writer = GraphWriter(g)
+
+    def import_repo(repo):
+        repo_id, users = repo
+        buffer = GraphBuffer(repo_id)
+        buffer.add_repo(bipartite=0, language='?', weight=0, date='2020-01-01T00:00:00')
+        for user in users:
+            buffer.link_user(repo_id, user, relation='contributor')
+        return [buffer]
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+        for worker in concurrent.futures.as_completed(executor.submit(import_repo, x) for x in repos):
+            writer.merge(worker.result())
+    return g
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure the graph ingestion rate of the crawler workers.')
+    parser.add_argument('--repos', type=int, default=5000)
+    parser.add_argument('--users', type=int, default=100000)
+    parser.add_argument('--contributors', type=int, default=200)
+    parser.add_argument('--workers', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    repos = synthetic_repos(args.repos, args.users, args.contributors, args.seed)
+    print('{0} repositories with {1} memberships.'.format(len(repos), sum(len(u) for _, u in repos)))
+    graphs = []
+    for name, ingest in (('locked', ingest_locked), ('buffered', ingest_buffered)):
+        start = time.perf_counter()
+        g = ingest(repos, args.workers)
+        elapsed = time.perf_counter() - start
+        graphs.append(g)
+        print('{0:9} {1:8.2f}s {2:12.0f} edges/s'.format(name, elapsed, g.number_of_edges() / elapsed))
+    print('Same graph: {0}'.format({frozenset(e) for e in graphs[0].edges} == {frozenset(e) for e in graphs[1].edges}))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+import argparse
+import gc
+import random
+import time
+import tracemalloc
+from datetime import datetime, timedelta, timezone
+
+import networkx as nx
+
+from benchmarks.graph_storage import same_graph
+from reponetwork.CompactGraph import CompactGraph
+
+START = datetime(2010, 1, 1, tzinfo=timezone.utc)
+
+
+def synthetic_crawl(repos: int, users: int, edges: int, seed: int):
+    # Yields the nodes and edges of each repository with the attributes and the fresh strings of a real crawl.
+    rng = random.Random(seed)
+    languages = ['Python', 'Java', 'C', 'Go', 'Rust', 'JavaScript', '?']
+    per_repo = edges / repos
+
+    def date() -> str:
+        return (START + timedelta(seconds=rng.randrange(400000000))).isoformat()
+
+    for i in range(repos):
+        repo_id = 'org{0}/project{1}'.format(rng.randrange(repos // 4 + 1), i)
+        nodes = [(repo_id, {'bipartite': 0, 'language': rng.choice(languages), 'weight': rng.randrange(5000),
+                            'date': date()})]
+        links = []
+        for k in range(max(1, int(rng.expovariate(1 / per_repo)))):
+            # Few users contribute to many repositories.
+            user = 'user{0}'.format(int(users * rng.random() ** 3))
+            nodes.append((user, {'bipartite': 1}))
+            if k == 0:
+                links.append((user, repo_id, {'relation': 'owner', 'date': date()}))
+            elif rng.random() < 0.1:
+                links.append((user, repo_id, {'relation': 'fork', 'fork_source': 'user{0}/project{1}'.format(k, i),
+                                              'date': date()}))
+            else:
+                links.append((user, repo_id, {'relation': 'contributor'}))
+        yield nodes, links
+
+
+def build(graph_class, args):
+    g = graph_class()
+    for nodes, links in synthetic_crawl(args.repos, args.users, args.edges, args.seed):
+        g.add_nodes_from(nodes)
+        g.add_edges_from(links)
+    return g
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare the memory used by networkx and compact graphs.')
+    parser.add_argument('--repos', type=int, default=100000)
+    parser.add_argument('--users', type=int, default=500000)
+    parser.add_argument('--edges', type=int, default=1000000, help='Approximate number of edges.')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    graphs = {}
+    for name, graph_class in (('networkx', nx.Graph), ('compact', CompactGraph)):
+        gc.collect()
+        tracemalloc.start()
+        start = time.perf_counter()
+        g = build(graph_class, args)
+        elapsed = time.perf_counter() - start
+        memory, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        start = time.perf_counter()
+        components = sum(1 for _ in (g.connected_components() if name == 'compact' else nx.connected_components(g)))
+        analysis = time.perf_counter() - start
+        print('{0:8} {1:8} nodes {2:8} edges {3:8.1f} MB {4:7.2f}s build {5:6.2f}s for {6} components'.format(
+            name, g.number_of_nodes(), g.number_of_edges(), memory / 1024 / 1024, elapsed, analysis, components))
+        graphs[name] = g
+    print('Same graph: {0}'.format(same_graph(graphs['networkx'], graphs['compact'].to_networkx())))
+
+
+if __name__ == '__main__':
+    main()
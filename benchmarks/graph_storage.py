@@ -0,0 +1,96 @@
+import argparse
+import os
+import random
+import tempfile
+import time
+
+import networkx as nx
+
+from reponetwork.DeltaGraph import DeltaGraph
+from reponetwork.GraphStore import GraphStore
+
+
+def crawl_batches(repos: int, users: int, batches: int, seed: int):
+    # Yields the nodes and edges of each crawl batch with the attributes written by the crawlers.
+    rng = random.Random(seed)
+    languages = ['Python', 'Java', 'C', 'Go', 'Rust', '?']
+    per_batch = max(1, repos // batches)
+    for start in range(0, repos, per_batch):
+        nodes = []
+        edges = []
+        for i in range(start, min(repos, start + per_batch)):
+            repo_id = 'org{0}/project{0}'.format(i)
+            nodes.append((repo_id, {'bipartite': 0, 'language': rng.choice(languages),
+                                    'weight': rng.randrange(1000), 'date': '2020-01-01T00:00:00+00:00'}))
+            for _ in range(rng.randrange(1, 20)):
+                user = 'user{0}'.format(rng.randrange(users))
+                nodes.append((user, {'bipartite': 1}))
+                edges.append((user, repo_id, {'relation': 'contributor'}))
+            if i and rng.random() < 0.2:
+                parent = 'org{0}/project{0}'.format(rng.randrange(i))
+                edges.append(('user{0}'.format(rng.randrange(users)), parent,
+                              {'relation': 'fork', 'fork_source': repo_id, 'date': '2021-01-01T00:00:00+00:00'}))
+        yield nodes, edges
+
+
+def same_graph(g1: nx.Graph, g2: nx.Graph) -> bool:
+    return dict(g1.nodes(data=True)) == dict(g2.nodes(data=True)) and \
+        all(g2.has_edge(u, v) and g2.edges[u, v] == d for u, v, d in g1.edges(data=True)) and \
+        g1.number_of_edges() == g2.number_of_edges()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare the native graph storage with GEXF.')
+    parser.add_argument('--repos', type=int, default=20000)
+    parser.add_argument('--users', type=int, default=100000)
+    parser.add_argument('--batches', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        gexf_path = os.path.join(directory, 'graph.gexf')
+        store_path = os.path.join(directory, 'graph.db')
+        store = GraphStore(store_path)
+        g = DeltaGraph()
+        gexf_time = 0.0
+        store_time = 0.0
+        for nodes, edges in crawl_batches(args.repos, args.users, args.batches, args.seed):
+            g.add_nodes_from(nodes)
+            g.add_edges_from(edges)
+            start = time.perf_counter()
+            nx.write_gexf(g, gexf_path)
+            gexf_time += time.perf_counter() - start
+            start = time.perf_counter()
+            store.save(g)
+            store_time += time.perf_counter() - start
+        store.close()
+        print('{0} nodes, {1} edges saved after each of {2} batches.'.format(
+            g.number_of_nodes(), g.number_of_edges(), args.batches))
+        print('{0:7} {1:>10} {2:>10} {3:>10}'.format('format', 'saves', 'load', 'size'))
+
+        start = time.perf_counter()
+        loaded = nx.read_gexf(gexf_path)
+        gexf_load = time.perf_counter() - start
+        print('{0:7} {1:9.2f}s {2:9.2f}s {3:8.1f}MB'.format(
+            'gexf', gexf_time, gexf_load, os.path.getsize(gexf_path) / 1024 / 1024))
+
+        start = time.perf_counter()
+        store = GraphStore(store_path)
+        loaded = store.load()
+        store.close()
+        store_load = time.perf_counter() - start
+        print('{0:7} {1:9.2f}s {2:9.2f}s {3:8.1f}MB'.format(
+            'native', store_time, store_load, os.path.getsize(store_path) / 1024 / 1024))
+        print('Round trip of the native format: {0}'.format('identical' if same_graph(g, loaded) else 'DIFFERENT'))
+
+        # The GEXF reader adds labels and edge ids, the native format keeps them out of the way.
+        store_path = os.path.join(directory, 'from_gexf.db')
+        store = GraphStore(store_path)
+        store.save(nx.read_gexf(gexf_path))
+        loaded = store.load(nx.Graph)
+        store.close()
+        print('Round trip from GEXF: {0}'.format('identical' if same_graph(g, loaded) else 'DIFFERENT'))
+
+
+if __name__ == '__main__':
+    main()
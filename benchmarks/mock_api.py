@@ -0,0 +1,518 @@
+import abc
+import argparse
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs, urlencode, unquote
+
+
+class Ecosystem:
+    def __init__(self, repos: int = 100, users: int = 500, contributors: int = 20, fork_ratio: float = 0.3,
+                 fork_depth: int = 2, commits: int = 30, languages=('Python', 'Java', 'C', 'Go', 'Ruby'),
+                 contributor_shape: float = 1.1, seed: int = 0):
+        assert repos > 0 and users > 0
+        assert contributor_shape > 0
+
+        rng = random.Random(seed)
+        start = datetime(2015, 1, 1, tzinfo=timezone.utc)
+        self.users = ['user{0}'.format(i) for i in range(users)]
+        self.repos = {}
+        self.names = []
+        self.contributors = {}
+        self.forks = {}
+        self.commits = {}
+        self.roots = []
+
+        def add_repo(name: str, owner: str, parent: str = None):
+            created = start + timedelta(days=rng.randrange(0, 1500))
+            self.repos[name] = {
+                'id': len(self.repos) + 1,
+                'name': name.split('/')[1],
+                'full_name': name,
+                'owner': owner,
+                'fork': parent is not None,
+                'parent': parent,
+                'language': rng.choice(languages) if rng.random() > 0.05 else None,
+                'watchers_count': int(rng.paretovariate(1.2)) - 1,
+                'created_at': created,
+                'updated_at': created + timedelta(days=rng.randrange(0, 300)),
+                'pushed_at': created + timedelta(days=rng.randrange(0, 300)),
+            }
+            # Heavy-tailed contributor counts, as found in real ecosystems. Lower shapes give heavier tails.
+            count = min(users, max(1, int(rng.paretovariate(contributor_shape) * contributors / 5)))
+            self.contributors[name] = [owner] + [x for x in rng.sample(self.users, count) if x != owner]
+            self.commits[name] = [{
+                'sha': '{0:040x}'.format(rng.getrandbits(160)),
+                'author': rng.choice(self.contributors[name]),
+                'date': created + timedelta(hours=rng.randrange(0, 20000)),
+            } for _ in range(rng.randrange(1, commits + 1))]
+            # Both APIs list the newest commits first.
+            self.commits[name].sort(key=lambda x: x['date'], reverse=True)
+            self.forks[name] = []
+            self.names.append(name)
+            if parent is not None:
+                self.forks[parent].append(name)
+
+        for i in range(repos):
+            name = 'org{0}/project{0}'.format(i)
+            add_repo(name, rng.choice(self.users))
+            self.roots.append(name)
+            level = [name]
+            for depth in range(fork_depth):
+                next_level = []
+                for parent in level:
+                    while rng.random() < fork_ratio:
+                        owner = rng.choice(self.users)
+                        fork = '{0}/{1}'.format(owner, parent.split('/')[1])
+                        if fork not in self.repos:
+                            add_repo(fork, owner, parent)
+                            next_level.append(fork)
+                level = next_level
+
+
+class MockServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, ecosystem: Ecosystem, api: str = 'github', latency: float = 0.0, quota: int = None,
+                 window: float = 3600, abuse_limit: int = None, per_token: bool = False, search_forks: bool = False,
+                 port: int = 0):
+        assert api in HANDLERS
+
+        super().__init__(('127.0.0.1', port), HANDLERS[api])
+        self.ecosystem = ecosystem
+        self.api = api
+        self.latency = latency
+        self.quota = quota
+        self.window = window
+        self.abuse_limit = abuse_limit
+        # Like the real APIs, each token can have its own quota instead of sharing a single one.
+        self.per_token = per_token
+        # The search finds the forks next to their parents, so several workers reach the same parent at once.
+        self.search_forks = search_forks
+        self.requests = 0
+        self.endpoints = {}
+        self.not_modified = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.usage = {}
+        self.lock = threading.Lock()
+        self.base_url = 'http://127.0.0.1:{0}'.format(self.server_port)
+        self._thread: threading.Thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def reset_counters(self):
+        with self.lock:
+            self.requests = 0
+            self.endpoints = {}
+            self.not_modified = 0
+            self.max_in_flight = 0
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+
+class MockHandler(BaseHTTPRequestHandler, abc.ABC):
+    protocol_version = 'HTTP/1.1'
+    server: MockServer
+    free_paths = ()
+    default_per_page = 30
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        self._handle('GET')
+
+    def do_POST(self):
+        self._handle('POST')
+
+    def _handle(self, method: str):
+        server = self.server
+        parts = urlsplit(self.path)
+        params = {k: v[-1] for k, v in parse_qs(parts.query).items()}
+        path = parts.path.rstrip('/')
+        length = int(self.headers.get('Content-Length') or 0)
+        body = json.loads(self.rfile.read(length)) if length else None
+        endpoint = '{0} {1}'.format(method, self._endpoint(path))
+
+        with server.lock:
+            server.requests += 1
+            server.endpoints[endpoint] = server.endpoints.get(endpoint, 0) + 1
+            server.in_flight += 1
+            server.max_in_flight = max(server.max_in_flight, server.in_flight)
+            in_flight = server.in_flight
+            now = time.time()
+            key = self.headers.get('Authorization') if server.per_token else None
+            window_start, used = server.usage.get(key, (now, 0))
+            if now - window_start >= server.window:
+                window_start, used = now, 0
+            exhausted = server.quota is not None and used >= server.quota
+            if not exhausted and path not in self.free_paths:
+                used += 1
+            server.usage[key] = (window_start, used)
+            remaining = server.quota - used if server.quota is not None else 5000
+            reset = int(window_start + server.window)
+        try:
+            if server.latency:
+                time.sleep(server.latency)
+            headers = self._limit_headers(server.quota or 5000, max(remaining, 0), reset)
+            if exhausted:
+                return self._exhausted(headers, reset)
+            if server.abuse_limit is not None and in_flight > server.abuse_limit:
+                headers['Retry-After'] = '1'
+                return self._send(429 if server.api == 'gitlab' else 403,
+                                  {'message': 'You have triggered an abuse detection mechanism.'}, headers)
+            status, result, links = self._route(method, path, params, body)
+            if links:
+                headers['Link'] = links
+            if method == 'GET' and status == 200:
+                # Like the real APIs, unchanged resources are answered with Not Modified to conditional requests.
+                etag = '"{0}"'.format(hashlib.sha1(json.dumps(result, sort_keys=True).encode('utf-8')).hexdigest())
+                headers['ETag'] = etag
+                if self.headers.get('If-None-Match') == etag:
+                    status = 304
+                    with server.lock:
+                        server.not_modified += 1
+            self._send(status, result, headers)
+        finally:
+            with server.lock:
+                server.in_flight -= 1
+
+    def _endpoint(self, path: str) -> str:
+        return path
+
+    @abc.abstractmethod
+    def _limit_headers(self, limit: int, remaining: int, reset: int) -> dict:
+        pass
+
+    @abc.abstractmethod
+    def _exhausted(self, headers: dict, reset: int):
+        pass
+
+    @abc.abstractmethod
+    def _route(self, method: str, path: str, params: dict, body: dict):
+        pass
+
+    def _send(self, status: int, body, headers: dict):
+        # No Content and Not Modified responses have no body.
+        data = json.dumps(body).encode('utf-8') if status not in (204, 304) else b''
+        self.send_response(status)
+        if data:
+            self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(data)))
+        for k, v in headers.items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _page(self, path: str, params: dict, items: list):
+        per_page = int(params.get('per_page', self.default_per_page))
+        page = int(params.get('page', 1))
+        chunk = items[(page - 1) * per_page:page * per_page]
+        last = max(1, (len(items) + per_page - 1) // per_page)
+        links = []
+        for rel, number in (('next', page + 1), ('last', last), ('first', 1), ('prev', page - 1)):
+            if 1 <= number <= last and number != page:
+                query = dict(params, page=number, per_page=per_page)
+                links.append('<{0}{1}?{2}>; rel="{3}"'.format(self.server.base_url, path, urlencode(query), rel))
+        return chunk, ', '.join(links) or None
+
+    @staticmethod
+    def _parse_date(value: str) -> datetime:
+        # Both APIs read the dates without time zone as UTC.
+        date = datetime.fromisoformat(value.replace('Z', '+00:00'))
+        return date if date.tzinfo is not None else date.replace(tzinfo=timezone.utc)
+
+    @staticmethod
+    def _date(value: datetime) -> str:
+        return value.strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+class GithubHandler(MockHandler):
+    free_paths = ('/rate_limit',)
+
+    def _endpoint(self, path: str) -> str:
+        endpoint = path.split('/')
+        if path.startswith('/repos/'):
+            endpoint[2:4] = ['{owner}', '{repo}']
+        elif path.startswith('/users/'):
+            endpoint[2:3] = ['{user}']
+        return '/'.join(endpoint)
+
+    def _limit_headers(self, limit: int, remaining: int, reset: int) -> dict:
+        return {'X-RateLimit-Limit': str(limit), 'X-RateLimit-Remaining': str(remaining),
+                'X-RateLimit-Reset': str(reset)}
+
+    def _exhausted(self, headers: dict, reset: int):
+        self._send(403, {'message': 'API rate limit exceeded'}, headers)
+
+    def _user(self, login: str) -> dict:
+        return {'login': login, 'id': int(login[4:]) + 1, 'type': 'User',
+                'url': '{0}/users/{1}'.format(self.server.base_url, login)}
+
+    def _repo(self, name: str, full: bool = False) -> dict:
+        ecosystem = self.server.ecosystem
+        data = ecosystem.repos[name]
+        result = {
+            'id': data['id'],
+            'name': data['name'],
+            'full_name': name,
+            'owner': self._user(data['owner']),
+            'fork': data['fork'],
+            'language': data['language'],
+            'watchers_count': data['watchers_count'],
+            'stargazers_count': data['watchers_count'],
+            'forks_count': len(ecosystem.forks[name]),
+            'created_at': self._date(data['created_at']),
+            'updated_at': self._date(data['updated_at']),
+            'pushed_at': self._date(data['pushed_at']),
+            'url': '{0}/repos/{1}'.format(self.server.base_url, name),
+        }
+        if full and data['parent']:
+            result['parent'] = self._repo(data['parent'])
+        return result
+
+    def _node(self, name: str) -> dict:
+        data = self.server.ecosystem.repos[name]
+        return {
+            'nameWithOwner': name,
+            'isFork': data['fork'],
+            'createdAt': self._date(data['created_at']),
+            'updatedAt': self._date(data['updated_at']),
+            'pushedAt': self._date(data['pushed_at']),
+            'stargazerCount': data['watchers_count'],
+            'primaryLanguage': {'name': data['language']} if data['language'] else None,
+            'owner': {'login': data['owner']},
+        }
+
+    def _graphql(self, body: dict):
+        ecosystem = self.server.ecosystem
+        variables = body.get('variables') or {}
+        result = {}
+        errors = []
+        for alias, owner, name in re.findall(r'(\w+): repository\(owner: \$(\w+), name: \$(\w+)\)', body['query']):
+            full_name = '{0}/{1}'.format(variables.get(owner), variables.get(name))
+            if full_name not in ecosystem.repos:
+                result[alias] = None
+                errors.append({'type': 'NOT_FOUND', 'path': [alias]})
+                continue
+            node = self._node(full_name)
+            parent = ecosystem.repos[full_name]['parent']
+            node['parent'] = self._node(parent) if parent else None
+            offset = int(variables.get('c' + alias[1:]) or 0)
+            forks = ecosystem.forks[full_name]
+            node['forks'] = {
+                'pageInfo': {'hasNextPage': offset + 100 < len(forks), 'endCursor': str(offset + 100)},
+                'nodes': [self._node(x) for x in forks[offset:offset + 100]],
+            }
+            result[alias] = node
+        response = {'data': result}
+        if errors:
+            response['errors'] = errors
+        return 200, response, None
+
+    def _route(self, method: str, path: str, params: dict, body: dict):
+        ecosystem = self.server.ecosystem
+        parts = path.split('/')
+        if method == 'POST' and path == '/graphql':
+            return self._graphql(body)
+        if path == '/rate_limit':
+            rate = {'limit': self.server.quota or 5000, 'remaining': 5000, 'reset': int(time.time()) + 3600}
+            return 200, {'resources': {'core': rate, 'search': rate}, 'rate': rate}, None
+        if path == '/search/repositories':
+            query = params.get('q', '')
+            names = ecosystem.names if self.server.search_forks else ecosystem.roots
+            items = [x for x in names if query.lower() in x.lower() or query == '*']
+            chunk, links = self._page(path, params, items)
+            body = {'total_count': len(items), 'incomplete_results': False,
+                    'items': [self._repo(x) for x in chunk]}
+            return 200, body, links
+        if path.startswith('/users/') and len(parts) == 3:
+            return 200, self._user(parts[2]), None
+        if path.startswith('/repos/') and len(parts) >= 4:
+            name = '/'.join(parts[2:4])
+            if name not in ecosystem.repos:
+                return 404, {'message': 'Not Found'}, None
+            if len(parts) == 4:
+                return 200, self._repo(name, full=True), None
+            if parts[4] == 'contributors':
+                items = ecosystem.contributors[name]
+                chunk, links = self._page(path, params, items)
+                return 200, [dict(self._user(x), contributions=1) for x in chunk], links
+            if parts[4] == 'forks':
+                chunk, links = self._page(path, params, ecosystem.forks[name])
+                return 200, [self._repo(x) for x in chunk], links
+            if parts[4:] == ['stats', 'contributors']:
+                weeks = {}
+                for commit in ecosystem.commits[name]:
+                    date = commit['date']
+                    week = datetime(date.year, date.month, date.day, tzinfo=timezone.utc) - \
+                        timedelta(days=(date.weekday() + 1) % 7)
+                    counts = weeks.setdefault(commit['author'], {})
+                    counts[week] = counts.get(week, 0) + 1
+                return 200, [{'author': self._user(author), 'total': sum(counts.values()),
+                              'weeks': [{'w': int(w.timestamp()), 'a': 0, 'd': 0, 'c': c}
+                                        for w, c in sorted(counts.items())]}
+                             for author, counts in weeks.items()], None
+            if parts[4] == 'commits':
+                since = params.get('since')
+                items = ecosystem.commits[name]
+                if since:
+                    since = self._parse_date(since)
+                    items = [x for x in items if x['date'] >= since]
+                chunk, links = self._page(path, params, items)
+                body = [{'sha': x['sha'], 'author': self._user(x['author']),
+                         'commit': {'author': {'name': x['author'], 'email': '{0}@example.com'.format(x['author']),
+                                               'date': self._date(x['date'])}}}
+                        for x in chunk]
+                return 200, body, links
+        return 404, {'message': 'Not Found'}, None
+
+
+class GitlabHandler(MockHandler):
+    prefix = '/api/v4'
+    default_per_page = 20
+
+    def _endpoint(self, path: str) -> str:
+        endpoint = path.split('/')
+        if path.startswith(self.prefix + '/projects/'):
+            endpoint[4:5] = ['{id}']
+        return '/'.join(endpoint)
+
+    def _limit_headers(self, limit: int, remaining: int, reset: int) -> dict:
+        return {'RateLimit-Limit': str(limit), 'RateLimit-Remaining': str(remaining), 'RateLimit-Reset': str(reset)}
+
+    def _exhausted(self, headers: dict, reset: int):
+        headers['Retry-After'] = str(max(1, int(reset - time.time())))
+        self._send(429, {'message': 'Retry later'}, headers)
+
+    def _find(self, project_id: str) -> str:
+        ecosystem = self.server.ecosystem
+        project_id = unquote(project_id)
+        if project_id.isdigit():
+            return ecosystem.names[int(project_id) - 1] if int(project_id) <= len(ecosystem.names) else None
+        return project_id if project_id in ecosystem.repos else None
+
+    def _basic(self, name: str) -> dict:
+        data = self.server.ecosystem.repos[name]
+        owner = data['owner']
+        return {
+            'id': data['id'],
+            'name': data['name'],
+            'path': data['name'],
+            'path_with_namespace': name,
+            'namespace': {'id': int(owner[4:]) + 1, 'name': owner, 'path': owner, 'kind': 'user'},
+            'star_count': data['watchers_count'],
+            'forks_count': len(self.server.ecosystem.forks[name]),
+            'created_at': self._date(data['created_at']),
+            'last_activity_at': self._date(data['updated_at']),
+        }
+
+    def _project(self, name: str) -> dict:
+        data = self.server.ecosystem.repos[name]
+        result = dict(self._basic(name), visibility='public', open_issues_count=0)
+        if data['parent']:
+            result['forked_from_project'] = self._basic(data['parent'])
+        return result
+
+    def _route(self, method: str, path: str, params: dict, body: dict):
+        ecosystem = self.server.ecosystem
+        if method == 'POST' and path == '/api/graphql':
+            variables = (body or {}).get('variables') or {}
+            paths = [x for x in variables.get('paths') or [] if x in ecosystem.repos][:50]
+            nodes = [{'fullPath': x, 'languages': [{'name': ecosystem.repos[x]['language'], 'share': 100.0}]
+                      if ecosystem.repos[x]['language'] else []} for x in paths]
+            return 200, {'data': {'projects': {'nodes': nodes}}}, None
+        if not path.startswith(self.prefix):
+            return 404, {'message': '404 Not Found'}, None
+        parts = path[len(self.prefix):].split('/')
+        if method != 'GET' or len(parts) < 2 or parts[1] != 'projects':
+            return 404, {'message': '404 Not Found'}, None
+        if len(parts) == 2:
+            query = params.get('search', '')
+            items = [x for x in ecosystem.roots if query.lower() in x.lower()]
+            chunk, links = self._page(path, params, items)
+            return 200, [self._project(x) for x in chunk], links
+        name = self._find(parts[2])
+        if name is None:
+            return 404, {'message': '404 Project Not Found'}, None
+        resource = '/'.join(parts[3:])
+        if resource == '':
+            return 200, self._project(name), None
+        if resource == 'languages':
+            language = ecosystem.repos[name]['language']
+            return 200, {language: 100.0} if language else {}, None
+        if resource == 'forks':
+            chunk, links = self._page(path, params, ecosystem.forks[name])
+            return 200, [self._project(x) for x in chunk], links
+        if resource == 'repository/contributors':
+            chunk, links = self._page(path, params, ecosystem.contributors[name])
+            return 200, [{'name': x, 'email': '{0}@example.com'.format(x), 'commits': 1} for x in chunk], links
+        if resource == 'repository/commits':
+            items = ecosystem.commits[name]
+            since = params.get('since')
+            if since:
+                since = self._parse_date(since)
+                items = [x for x in items if x['date'] >= since]
+            chunk, links = self._page(path, params, items)
+            return 200, [{'id': x['sha'], 'author_name': x['author'],
+                          'author_email': '{0}@example.com'.format(x['author']),
+                          'created_at': self._date(x['date'])} for x in chunk], links
+        return 404, {'message': '404 Not Found'}, None
+
+
+HANDLERS = {'github': GithubHandler, 'gitlab': GitlabHandler}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve a deterministic mock of the GitHub or GitLab API.')
+    parser.add_argument('--api', choices=sorted(HANDLERS), default='github')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--repos', type=int, default=100)
+    parser.add_argument('--users', type=int, default=500)
+    parser.add_argument('--contributors', type=int, default=20)
+    parser.add_argument('--contributor-shape', type=float, default=1.1,
+                        help='Shape of the Pareto distribution of the contributors per repository.')
+    parser.add_argument('--fork-ratio', type=float, default=0.3)
+    parser.add_argument('--fork-depth', type=int, default=2)
+    parser.add_argument('--latency', type=float, default=0.0, help='Simulated server latency in seconds.')
+    parser.add_argument('--quota', type=int, default=None, help='Requests allowed in each rate limit window.')
+    parser.add_argument('--window', type=float, default=3600, help='Seconds of each rate limit window.')
+    parser.add_argument('--abuse-limit', type=int, default=None,
+                        help='Answer with Retry-After when more requests than this are in flight.')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    ecosystem = Ecosystem(repos=args.repos, users=args.users, contributors=args.contributors,
+                          fork_ratio=args.fork_ratio, fork_depth=args.fork_depth,
+                          contributor_shape=args.contributor_shape, seed=args.seed)
+    server = MockServer(ecosystem, api=args.api, latency=args.latency, quota=args.quota, window=args.window,
+                        abuse_limit=args.abuse_limit, port=args.port)
+    print('Serving {0} repositories of a mock {1} API at {2}'.format(len(ecosystem.repos), args.api, server.base_url))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print('Served {0} requests: {1}'.format(server.requests, server.endpoints))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+import argparse
+import contextlib
+import io
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+import networkx as nx
+
+from benchmarks.mock_api import Ecosystem, MockServer
+from reponetwork.AsyncGithubCrawler import AsyncGithubCrawler
+from reponetwork.GithubCrawler import GithubCrawler
+from reponetwork.GitlabCrawler import GitlabCrawler
+
+
+def crawl(crawler, query: str, since: datetime) -> nx.Graph:
+    g = None
+    with contextlib.redirect_stdout(io.StringIO()):
+        for g in crawler.find(query, since=since):
+            pass
+    return g
+
+
+def committers(g: nx.Graph) -> dict:
+    return {frozenset((u, v)): d.get('date') for u, v, d in g.edges(data=True) if d.get('relation') == 'committer'}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure the committer ingestion of --since crawls on long histories.')
+    parser.add_argument('--repos', type=int, default=5)
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--commits', type=int, default=20000, help='Maximum number of commits of each repository.')
+    parser.add_argument('--since', default='2015-06-01')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    ecosystem = Ecosystem(repos=args.repos, users=args.users, fork_ratio=0.2, commits=args.commits, seed=args.seed)
+    since = datetime.fromisoformat(args.since).replace(tzinfo=timezone.utc)
+    print('Ecosystem with {0} repositories and {1} commits.'.format(
+        len(ecosystem.repos), sum(len(x) for x in ecosystem.commits.values())))
+    engines = [('threads', 'github', lambda url, mode: GithubCrawler(None, None, None, url=url, since_commits=mode)),
+               ('async', 'github', lambda url, mode: AsyncGithubCrawler(None, None, None, url=url, since_commits=mode)),
+               ('gitlab', 'gitlab', lambda url, mode: GitlabCrawler(url, 'benchmark', None, None))]
+    for name, api, make in engines:
+        expected = None
+        for mode in ('all', 'until-authors', 'none') if api == 'github' else ('all',):
+            with MockServer(ecosystem, api=api) as server:
+                crawler = make(server.base_url, mode)
+                tracemalloc.start()
+                start = time.perf_counter()
+                g = crawl(crawler, 'project', since)
+                elapsed = time.perf_counter() - start
+                _, peak = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+                requests = server.requests
+            edges = committers(g)
+            expected = expected or edges
+            dated = sum(edges.get(e) == date for e, date in expected.items())
+            print('{0:8} {1:14} {2:7.2f}s {3:6} requests {4:8.1f} MB peak {5:5} committers, {6} with the exact '
+                  'date'.format(name, mode, elapsed, requests, peak / 1024 / 1024, len(edges), dated))
+
+
+if __name__ == '__main__':
+    main()
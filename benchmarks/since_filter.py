@@ -0,0 +1,97 @@
+import argparse
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta, timezone
+
+import dateutil.parser
+import networkx as nx
+
+from benchmarks.graph_storage import same_graph
+from reponetwork import gexf
+from reponetwork.GraphStore import GraphStore
+
+
+def dated_graph(repos: int, users: int, years: int, seed: int) -> nx.Graph:
+    rng = random.Random(seed)
+    start = datetime(2024 - years, 1, 1, tzinfo=timezone.utc)
+    span = years * 365 * 24 * 3600
+
+    def date() -> str:
+        return (start + timedelta(seconds=rng.randrange(span))).isoformat()
+
+    g = nx.Graph()
+    for i in range(repos):
+        repo_id = 'org{0}/project{0}'.format(i)
+        g.add_node(repo_id, bipartite=0, language='?', weight=rng.randrange(1000), date=date())
+        for _ in range(rng.randrange(1, 20)):
+            user = 'user{0}'.format(rng.randrange(users))
+            g.add_node(user, bipartite=1)
+            g.add_edge(user, repo_id, relation='committer', date=date())
+    return g
+
+
+def filter_loaded(path: str, since: datetime) -> nx.Graph:
+    # What main did before: load everything, then parse every date twice with dateutil.
+    g = nx.read_gexf(path)
+    nodes = g.nodes(data=True)
+    edges = g.edges(data=True)
+    g.remove_edges_from([(e1, e2) for e1, e2, d in edges if 'date' in d and dateutil.parser.parse(d['date']) < since])
+    g.remove_nodes_from([n for n, d in nodes if 'date' in d and dateutil.parser.parse(d['date']) < since])
+    return g
+
+
+def load_store(path: str, since: datetime) -> nx.Graph:
+    store = GraphStore(path)
+    g = store.load(nx.Graph, since=since)
+    store.close()
+    return g
+
+
+def measure(name: str, load, path: str, since: datetime, memory: bool):
+    if memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    g = load(path, since)
+    elapsed = time.perf_counter() - start
+    peak = 0
+    if memory:
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    print('{0:10} {1:8.2f}s {2:9.1f}MB {3:8} nodes {4:8} edges'.format(
+        name, elapsed, peak / 1024 / 1024, g.number_of_nodes(), g.number_of_edges()))
+    return g
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare the ways of loading only the recent part of a graph.')
+    parser.add_argument('--repos', type=int, default=20000)
+    parser.add_argument('--users', type=int, default=100000)
+    parser.add_argument('--years', type=int, default=10)
+    parser.add_argument('--since', type=lambda s: dateutil.parser.parse(s), default='2023-01-01T00:00:00+00:00')
+    parser.add_argument('--memory', action='store_true', help='Trace the peak memory, which slows down the loads.')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    g = dated_graph(args.repos, args.users, args.years, args.seed)
+    with tempfile.TemporaryDirectory() as directory:
+        gexf_path = os.path.join(directory, 'graph.gexf')
+        store_path = os.path.join(directory, 'graph.db')
+        nx.write_gexf(g, gexf_path)
+        store = GraphStore(store_path)
+        store.save(g)
+        store.close()
+        print('{0} nodes, {1} edges, keeping those since {2}.'.format(
+            g.number_of_nodes(), g.number_of_edges(), args.since))
+        expected = measure('dateutil', filter_loaded, gexf_path, args.since, args.memory)
+        streamed = measure('iterparse', gexf.read_gexf, gexf_path, args.since, args.memory)
+        stored = measure('native', load_store, store_path, args.since, args.memory)
+        print('Same graph: iterparse {0}, native {1}'.format(
+            same_graph(expected, streamed), {n for n in expected} == {n for n in stored} and
+            {frozenset(e) for e in expected.edges} == {frozenset(e) for e in stored.edges}))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,207 @@
+import argparse
+import contextlib
+import io
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+from benchmarks.analysis_backends import synthetic_graph
+from benchmarks.crawl_engines import crawl
+from benchmarks.mock_api import Ecosystem, MockServer
+from reponetwork.AsyncGithubCrawler import AsyncGithubCrawler, aiohttp
+from reponetwork.CrawlMetrics import CrawlMetrics
+from reponetwork.GithubCrawler import GithubCrawler
+from reponetwork.GitlabCrawler import GitlabCrawler
+from reponetwork.repos import analize_graph
+
+ENGINES = ('threads', 'graphql', 'async', 'gitlab')
+BACKENDS = ('networkx', 'sparse', 'approx')
+# Timings below this number of seconds are too noisy to be compared.
+MIN_SECONDS = 0.01
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def measure(run, repeat: int, memory: bool) -> tuple:
+    # The median of the timed runs, and the peak memory of one more run, as tracing slows the runs down.
+    results = [run() for _ in range(repeat)]
+    seconds = statistics.median(seconds for seconds, _ in results)
+    peak = None
+    if memory:
+        tracemalloc.start()
+        try:
+            run()
+            peak = tracemalloc.get_traced_memory()[1] / 1024 / 1024
+        finally:
+            tracemalloc.stop()
+    return seconds, peak, results[-1][1]
+
+
+def make_crawler(engine: str, url: str, metrics: CrawlMetrics):
+    if engine == 'gitlab':
+        return GitlabCrawler(url, token='benchmark', user=None, password=None, metrics=metrics)
+    if engine == 'async':
+        return AsyncGithubCrawler(token=None, user=None, password=None, url=url, metrics=metrics)
+    return GithubCrawler(token=None, user=None, password=None, url=url, graphql=engine == 'graphql', metrics=metrics)
+
+
+def crawl_case(engine: str, ecosystem: Ecosystem, args) -> dict:
+    def run():
+        metrics = CrawlMetrics()
+        # The traced memory also includes the allocations of the server thread, the same on every commit.
+        with MockServer(ecosystem, api='gitlab' if engine == 'gitlab' else 'github', latency=args.latency,
+                        quota=args.quota, window=args.window, abuse_limit=args.abuse_limit) as server:
+            crawler = make_crawler(engine, server.base_url, metrics)
+            start = time.perf_counter()
+            g = crawl(crawler, 'project', limit=None)
+            elapsed = time.perf_counter() - start
+        return elapsed, {'requests': server.requests, 'endpoints': dict(server.endpoints), 'repos': metrics.repos,
+                         'nodes': g.number_of_nodes(), 'edges': g.number_of_edges()}
+
+    seconds, peak, result = measure(run, args.repeat, not args.no_memory)
+    return dict(result, seconds=seconds, peak_mb=peak, repos_per_second=result['repos'] / seconds)
+
+
+def analysis_case(backend: str, g, args) -> dict:
+    def run():
+        metrics = CrawlMetrics()
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            analize_graph(g, limit=args.limit, backend='networkx' if backend == 'networkx' else 'sparse',
+                          approx=args.approx if backend == 'approx' else None, metrics=metrics)
+        elapsed = time.perf_counter() - start
+        return elapsed, {name[len('analysis.'):]: total for name, (runs, total) in metrics.phases.items()}
+
+    # The stages are those of the last timed run.
+    seconds, peak, stages = measure(run, args.repeat, not args.no_memory)
+    result = {'seconds': seconds, 'peak_mb': peak, 'nodes': g.number_of_nodes(), 'edges': g.number_of_edges()}
+    result.update(('stage.' + name, value) for name, value in stages.items())
+    return result
+
+
+def compare(results: dict, baseline: dict, time_threshold: float, memory_threshold: float) -> list:
+    # Slower timings, more memory and more requests are regressions. Different graph sizes mean that the crawl or
+    # the analysis changed its result.
+    regressions = []
+    for case, new in sorted(results.items()):
+        old = baseline.get(case)
+        if old is None:
+            continue
+        for key in sorted(set(old) & set(new)):
+            before, after = old[key], new[key]
+            if not isinstance(before, (int, float)) or not isinstance(after, (int, float)):
+                continue
+            if key == 'seconds' or key.startswith('stage.'):
+                bad = max(before, after) >= MIN_SECONDS and after > before * (1 + time_threshold)
+            elif key == 'peak_mb':
+                bad = after > before * (1 + memory_threshold)
+            elif key in ('requests', 'nodes', 'edges'):
+                bad = after > before if key == 'requests' else after != before
+            else:
+                continue
+            if bad:
+                regressions.append((case, key, before, after))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run the crawl and analysis benchmarks against local mock APIs and '
+                                                 'synthetic graphs, and compare the results with a previous run.')
+    parser.add_argument('--output', help='Path of the JSON file where the results are saved.')
+    parser.add_argument('--compare', metavar='BASELINE', help='Results of a previous run to compare with.')
+    parser.add_argument('--time-threshold', type=float, default=0.25,
+                        help='Relative increase of a timing reported as a regression.')
+    parser.add_argument('--memory-threshold', type=float, default=0.1,
+                        help='Relative increase of the peak memory reported as a regression.')
+    parser.add_argument('--engines', nargs='+', choices=ENGINES, default=list(ENGINES))
+    parser.add_argument('--crawl-sizes', type=int, nargs='+', default=[20, 60],
+                        help='Number of root repositories of each mock ecosystem.')
+    parser.add_argument('--users-per-repo', type=int, default=5)
+    parser.add_argument('--contributors', type=int, default=20)
+    parser.add_argument('--contributor-shape', type=float, default=1.1)
+    parser.add_argument('--fork-ratio', type=float, default=0.3)
+    parser.add_argument('--fork-depth', type=int, default=2)
+    parser.add_argument('--latency', type=float, default=0.01, help='Simulated server latency in seconds.')
+    parser.add_argument('--quota', type=int, default=None,
+                        help='Requests allowed in each rate limit window. Use a short --window to include the '
+                             'waits for the reset.')
+    parser.add_argument('--window', type=float, default=3600)
+    parser.add_argument('--abuse-limit', type=int, default=None)
+    parser.add_argument('--backends', nargs='+', choices=BACKENDS, default=list(BACKENDS))
+    parser.add_argument('--analysis-sizes', type=int, nargs='+', default=[100, 300, 1000],
+                        help='Number of repositories of each synthetic bipartite graph.')
+    parser.add_argument('--networkx-limit', type=int, default=100,
+                        help='Skip the networkx backend on graphs with more repositories than this.')
+    parser.add_argument('--limit', type=int, default=10, help='Number of results of each analysis.')
+    parser.add_argument('--approx', type=int, default=256, help='Pivots of the approximate backend.')
+    parser.add_argument('--repeat', type=int, default=3, help='Timed runs of each case, the median is kept.')
+    parser.add_argument('--no-memory', action='store_true', help='Do not trace the peak memory of each case.')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    results = {}
+
+    def report(case: str, result: dict):
+        results[case] = result
+        print('{0:28} {1:8.3f}s {2:>9} {3}'.format(
+            case, result['seconds'], '{0:.1f}MB'.format(result['peak_mb']) if result['peak_mb'] is not None else '-',
+            ', '.join('{0} {1}'.format(k, round(v, 3) if isinstance(v, float) else v)
+                      for k, v in result.items() if k not in ('seconds', 'peak_mb', 'endpoints'))))
+
+    engines = [x for x in args.engines if x != 'async' or aiohttp is not None]
+    if len(engines) < len(args.engines):
+        print('Skipping the async engine, aiohttp is not installed.')
+    for size in args.crawl_sizes:
+        ecosystem = Ecosystem(repos=size, users=size * args.users_per_repo, contributors=args.contributors,
+                              fork_ratio=args.fork_ratio, fork_depth=args.fork_depth,
+                              contributor_shape=args.contributor_shape, seed=args.seed)
+        for engine in engines:
+            report('crawl/{0}/{1}'.format(engine, size), crawl_case(engine, ecosystem, args))
+
+    for size in args.analysis_sizes:
+        g = synthetic_graph(size, size * args.users_per_repo, args.contributors, args.seed)
+        for backend in args.backends:
+            if backend == 'networkx' and size > args.networkx_limit:
+                continue
+            report('analysis/{0}/{1}'.format(backend, size), analysis_case(backend, g, args))
+
+    run = {
+        'commit': git_commit(),
+        'date': datetime.now(timezone.utc).isoformat(),
+        'python': sys.version.split()[0],
+        'platform': platform.platform(),
+        'parameters': {k: v for k, v in vars(args).items() if k not in ('output', 'compare')},
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(run, f, indent=1)
+        print('Saved results to {0}'.format(args.output))
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if baseline['parameters'] != run['parameters']:
+            print('The baseline was run with other parameters, only the common cases are compared.')
+        regressions = compare(results, baseline['results'], args.time_threshold, args.memory_threshold)
+        print('Compared with {0} ({1}): {2} regressions'.format(
+            args.compare, (baseline.get('commit') or '?')[:10], len(regressions)))
+        for case, key, before, after in regressions:
+            print('  {0} {1}: {2:.4g} -> {3:.4g}'.format(case, key, before, after))
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
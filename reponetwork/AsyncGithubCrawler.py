@@ -0,0 +1,400 @@
+import asyncio
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+import networkx as nx
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+from reponetwork.CompactGraph import CompactGraph
+from reponetwork.CrawlCheckpoint import CrawlCheckpoint
+from reponetwork.CrawlMetrics import CrawlMetrics
+from reponetwork.ForkFrontier import ForkFrontier
+from reponetwork.dates import parse_date
+
+STATS_AUTHORS = 100
+
+
+class GithubApiError(Exception):
+    def __init__(self, status: int, url: str):
+        super().__init__('GitHub API returned {0} for {1}'.format(status, url))
+        self.status = status
+        self.url = url
+
+
+class AdaptiveLimiter:
+    def __init__(self, initial: int = 8, maximum: int = 64):
+        assert initial >= 1
+        assert maximum >= initial
+
+        self.window = float(initial)
+        self.maximum = maximum
+        self.in_flight = 0
+        self.remaining: int = None
+        self.reset: float = None
+        self.blocked_until = 0.0
+        self.paused = asyncio.Event()
+        self._changed = asyncio.Condition()
+
+    @property
+    def limit(self) -> int:
+        limit = int(self.window)
+        if self.remaining is not None:
+            # Never keep more requests in flight than the quota left in the current window.
+            limit = min(limit, max(1, self.remaining))
+        return limit
+
+    async def acquire(self):
+        while True:
+            delay = self.blocked_until - time.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+                continue
+            async with self._changed:
+                if self.in_flight < self.limit and self.blocked_until <= time.time():
+                    self.in_flight += 1
+                    return
+                await self._changed.wait()
+
+    async def release(self, status: int = None, headers=None) -> bool:
+        retry = self._update(status, headers or {})
+        async with self._changed:
+            self.in_flight -= 1
+            self._changed.notify_all()
+        return retry
+
+    def _block(self, seconds: float):
+        self.blocked_until = max(self.blocked_until, time.time() + max(seconds, 0))
+
+    def _update(self, status: int, headers) -> bool:
+        remaining = headers.get('X-RateLimit-Remaining')
+        reset = headers.get('X-RateLimit-Reset')
+        retry_after = headers.get('Retry-After')
+        if remaining is not None:
+            self.remaining = int(remaining)
+        if reset is not None:
+            self.reset = float(reset)
+
+        if status in (403, 429) and (retry_after is not None or self.remaining == 0 or status == 429):
+            # Secondary (abuse) limits answer with Retry-After: back off multiplicatively.
+            self.window = max(1.0, self.window / 2)
+            if retry_after is not None:
+                self._block(float(retry_after))
+            elif self.remaining == 0 and self.reset:
+                self._pause()
+            else:
+                self._block(60)
+            return True
+
+        if self.remaining == 0 and self.reset:
+            self._pause()
+        elif status is not None and status < 400:
+            self.window = min(self.maximum, self.window + 1 / self.window)
+        return False
+
+    def _pause(self):
+        if self.blocked_until < self.reset:
+            self._block(self.reset - time.time() + 1)
+            self.paused.set()
+
+
+def to_isoformat(value: str) -> str:
+    return datetime.fromisoformat(value.replace('Z', '+00:00')).isoformat() if value else value
+
+
+class AsyncGithubCrawler:
+    def __init__(self, token: str, user: str, password: str, url: str = None, max_workers: int = 64,
+                 max_depth: int = None, priority: str = 'depth', since_commits: str = 'all',
+                 metrics: CrawlMetrics = None):
+        assert user is None or isinstance(user, str)
+        assert password is None or isinstance(password, str)
+        assert token is None or isinstance(token, str)
+        assert url is None or isinstance(url, str)
+        assert isinstance(max_workers, int) and max_workers > 0
+        assert since_commits in ('all', 'until-authors', 'none')
+        assert metrics is None or isinstance(metrics, CrawlMetrics)
+
+        if aiohttp is None:
+            raise ImportError('The asynchronous engine requires aiohttp. Install it with: pip install aiohttp')
+
+        self.url = (url or 'https://api.github.com').rstrip('/')
+        self.headers = {'Accept': 'application/vnd.github.v3+json'}
+        self.auth = None
+        if token:
+            self.headers['Authorization'] = 'token {0}'.format(token)
+        elif user and password:
+            self.auth = aiohttp.BasicAuth(user, password)
+        self.max_workers = max_workers
+        self.max_depth = max_depth
+        self.priority = priority
+        self.frontier: ForkFrontier = None
+        self.since_commits = since_commits
+        self.per_page = 100
+        self.request_count = 0
+        self.metrics = metrics if metrics is not None else CrawlMetrics()
+
+    async def _request(self, session, limiter: AdaptiveLimiter, url: str, params: dict = None):
+        while True:
+            start = time.perf_counter()
+            await limiter.acquire()
+            self.metrics.wait('limiter', time.perf_counter() - start)
+            try:
+                start = time.perf_counter()
+                async with session.get(url, params=params) as response:
+                    self.request_count += 1
+                    status = response.status
+                    self.metrics.response('GET', url, status, time.perf_counter() - start, response.headers)
+                    data = await response.json() if status == 200 else None
+                    if status == 204:
+                        # GitHub answers the lists of empty repositories with no content, like an empty page.
+                        data = []
+                    links = {str(rel): str(link['url']) for rel, link in response.links.items()} \
+                        if status == 200 else {}
+                    retry = await limiter.release(status, response.headers)
+            except BaseException:
+                await limiter.release()
+                raise
+            if retry:
+                continue
+            if status not in (200, 204):
+                raise GithubApiError(status, url)
+            return data, links
+
+    async def _pages(self, session, limiter: AdaptiveLimiter, url: str, params: dict = None, reverse: bool = False):
+        # Yields the pages of a list one at a time, from the last one to the first when reversed.
+        rel = 'prev' if reverse else 'next'
+        data, links = await self._request(session, limiter, url, dict(params or {}, per_page=self.per_page))
+        if reverse and links.get('last'):
+            data, links = await self._request(session, limiter, links['last'])
+        while True:
+            yield data[::-1] if reverse else data
+            if not links.get(rel):
+                break
+            data, links = await self._request(session, limiter, links[rel])
+
+    async def _list(self, session, limiter: AdaptiveLimiter, url: str, params: dict = None):
+        items = []
+        async for page in self._pages(session, limiter, url, params):
+            items.extend(page)
+        return items
+
+    async def _active_authors(self, session, limiter: AdaptiveLimiter, repo_url: str, since: datetime) -> dict:
+        # Authors with commits since the date and the week of their first one, from a single request.
+        try:
+            stats, _ = await self._request(session, limiter, repo_url + '/stats/contributors')
+        except GithubApiError:
+            # Still being computed by GitHub.
+            return None
+        if not isinstance(stats, list) or len(stats) >= STATS_AUTHORS:
+            return None
+        authors = {}
+        for stat in stats:
+            for week in stat.get('weeks') or []:
+                date = datetime.fromtimestamp(week['w'], timezone.utc)
+                if stat.get('author') and week['c'] and date + timedelta(weeks=1) > since:
+                    authors[stat['author']['login']] = max(date, since)
+                    break
+        return authors
+
+    async def _committers(self, session, limiter: AdaptiveLimiter, repo_url: str, since: datetime) -> list:
+        # Returns each author with the date of its first commit since the given one, oldest first, keeping only
+        # the earliest date of each author while the pages are read.
+        since = parse_date(since)
+        authors = None
+        if self.since_commits != 'all':
+            authors = await self._active_authors(session, limiter, repo_url, since)
+        if authors is not None and self.since_commits == 'none':
+            return sorted(authors.items(), key=lambda t: t[1])
+
+        missing = set(authors) if authors is not None else None
+        earliest = {}
+        async for page in self._pages(session, limiter, repo_url + '/commits', {'since': since.isoformat()},
+                                      reverse=authors is not None):
+            for commit in page:
+                if not commit.get('author') or not commit['commit'].get('author'):
+                    continue
+                user_id = commit['author'].get('login') or commit['author'].get('email')
+                date = parse_date(commit['commit']['author']['date'])
+                if user_id not in earliest or date < earliest[user_id]:
+                    earliest[user_id] = date
+                if missing is not None:
+                    missing.discard(user_id)
+            if missing is not None and not missing:
+                # Oldest first, the list can stop as soon as every author has been seen.
+                break
+        return sorted(earliest.items(), key=lambda t: t[1])
+
+    async def _crawl(self, session, limiter: AdaptiveLimiter, query: str, limit: int, since: datetime, g: nx.Graph,
+                     state: dict, checkpoint: CrawlCheckpoint):
+        frontier: ForkFrontier = state['frontier']
+
+        def link_user(repo_id: str, user_id: str, **attr):
+            if user_id is None:
+                return
+            if user_id not in g:
+                g.add_node(user_id, bipartite=1)
+            if (user_id, repo_id) not in g.edges:
+                g.add_edge(user_id, repo_id, **attr)
+
+        def fetch(item: dict):
+            return frontier.coalesce(item['full_name'], lambda: asyncio.ensure_future(import_repo(item)))
+
+        async def import_repo(item: dict):
+            # Returns the item and the forks of the repository and of its missing parents.
+            repo = item
+            repo_id = repo.get('full_name')
+            if repo_id is None:
+                return item, []
+
+            if repo_id in g or checkpoint is not None and repo_id in checkpoint.completed:
+                return item, []
+
+            repo_url = '{0}/repos/{1}'.format(self.url, repo_id)
+            if 'updated_at' not in repo:
+                try:
+                    repo, _ = await self._request(session, limiter, repo_url)
+                except GithubApiError:
+                    return item, []
+
+            repo_forks = []
+            owner = repo.get('owner')
+            if repo.get('fork') and owner:
+                parent = repo.get('parent')
+                if parent is None:
+                    try:
+                        parent = (await self._request(session, limiter, repo_url))[0].get('parent')
+                    except GithubApiError:
+                        parent = None
+                if parent and parent.get('full_name'):
+                    # Forks of the same parent found at once share a single import of the parent.
+                    repo_forks.extend((await fetch(parent))[1])
+                    link_user(parent['full_name'], owner['login'], relation='fork', fork_source=repo_id,
+                              date=to_isoformat(repo['created_at']))
+
+            language = repo.get('language') or '?'
+            weight = repo.get('watchers_count') or 0
+            g.add_node(repo_id, bipartite=0, language=language, weight=weight, date=to_isoformat(repo['updated_at']))
+
+            try:
+                if since is None:
+                    if owner is not None:
+                        link_user(repo_id, owner['login'], relation='owner', date=to_isoformat(repo['pushed_at']))
+
+                    for user in await self._list(session, limiter, repo_url + '/contributors'):
+                        link_user(repo_id, user.get('login') or user.get('email'), relation='contributor')
+                else:
+                    for user_id, date in await self._committers(session, limiter, repo_url, since):
+                        link_user(repo_id, user_id, relation='committer', date=date.isoformat())
+
+                forks = await self._list(session, limiter, repo_url + '/forks')
+                for fork in forks:
+                    # The parent of a listed fork is the repository being imported, no need to ask for it.
+                    fork.setdefault('parent', {'full_name': repo_id})
+                repo_forks.extend(forks)
+            except GithubApiError:
+                g.remove_node(repo_id)
+            else:
+                if checkpoint is not None:
+                    # The parents imported with a fork are completed too, even if they are also queued.
+                    checkpoint.completed.add(repo_id)
+
+            return item, repo_forks
+
+        async def import_item(item: dict, depth: int):
+            _, repo_forks = await fetch(item)
+            return item, repo_forks, depth
+
+        search_url = '{0}/search/repositories'.format(self.url)
+        while not limit or state['count'] < limit:
+            if not frontier:
+                params = {'q': query, 'per_page': self.per_page, 'page': state['page'] + 1}
+                data, _ = await self._request(session, limiter, search_url, params)
+                page_repos = data.get('items', [])
+                state['page'] += 1
+                if len(page_repos) == 0:
+                    break
+                for x in page_repos:
+                    frontier.push(x, x.get('full_name'), 0, x.get('watchers_count') or 0)
+
+            workers = [import_item(x, depth) for x, depth in frontier.pop()]
+            for worker in asyncio.as_completed(workers):
+                repo, repo_forks, depth = await worker
+                print('Analyzed repo {0}.'.format(repo['full_name']))
+                self.metrics.repo()
+                frontier.done(repo['full_name'])
+                state['count'] += 1
+                for x in repo_forks:
+                    frontier.push(x, x.get('full_name'), depth + 1, x.get('watchers_count') or 0)
+                if checkpoint is not None:
+                    if checkpoint.due():
+                        save_checkpoint(checkpoint, g, state)
+
+    def find(self, query: str, limit: int = None, since: datetime = None, previous: nx.Graph = None,
+             checkpoint: CrawlCheckpoint = None):
+        assert isinstance(query, str)
+        assert limit is None or isinstance(limit, int) and limit >= 0
+        assert since is None or isinstance(since, datetime)
+        assert previous is None or isinstance(previous, (nx.Graph, CompactGraph))
+        assert checkpoint is None or isinstance(checkpoint, CrawlCheckpoint)
+
+        g = previous if previous is not None else nx.Graph()
+        self.frontier = ForkFrontier(self.max_depth, self.priority)
+        state = {'page': 0, 'count': 0, 'frontier': self.frontier}
+        if checkpoint is not None:
+            checkpoint.query = query
+            checkpoint.since = since
+        if checkpoint is not None and checkpoint.page is not None:
+            state['page'] = checkpoint.page
+            state['count'] = checkpoint.count
+            for x in checkpoint.frontier:
+                state['frontier'].push(x['data'], x['id'], x.get('depth', 0), x['data'].get('watchers_count') or 0)
+
+        loop = asyncio.new_event_loop()
+        session = None
+        crawl = None
+        try:
+            session = loop.run_until_complete(self._open_session())
+            limiter = AdaptiveLimiter(initial=min(8, self.max_workers), maximum=self.max_workers)
+            print('Finding more repositories.')
+            crawl = loop.create_task(self._crawl(session, limiter, query, limit, since, g, state, checkpoint))
+            while not crawl.done():
+                pause = loop.create_task(limiter.paused.wait())
+                loop.run_until_complete(asyncio.wait([crawl, pause], return_when=asyncio.FIRST_COMPLETED))
+                pause.cancel()
+                if limiter.paused.is_set() and not crawl.done():
+                    limiter.paused.clear()
+                    print('The GitHub rate limit was triggered. Waiting for rate limit reset...')
+                    if checkpoint is not None:
+                        save_checkpoint(checkpoint, g, state)
+                    yield g
+            try:
+                crawl.result()
+            except (aiohttp.ClientError, GithubApiError):
+                print(sys.exc_info())
+                print('Communication error with GitHub. Graph completed prematurely.')
+        finally:
+            if crawl is not None and not crawl.done():
+                crawl.cancel()
+                loop.run_until_complete(asyncio.gather(crawl, return_exceptions=True))
+            if session is not None:
+                loop.run_until_complete(session.close())
+            loop.close()
+
+        state['frontier'].print_stats()
+        if checkpoint is not None:
+            save_checkpoint(checkpoint, g, state)
+        yield g
+
+    async def _open_session(self):
+        connector = aiohttp.TCPConnector(limit=self.max_workers)
+        return aiohttp.ClientSession(headers=self.headers, auth=self.auth, connector=connector)
+
+
+def save_checkpoint(checkpoint: CrawlCheckpoint, g: nx.Graph, state: dict):
+    checkpoint.update(state['page'], state['count'],
+                      [{'id': x.get('full_name'), 'data': x, 'depth': depth} for x, depth in state['frontier'].pending()])
+    checkpoint.save(g)
@@ -0,0 +1,670 @@
+import itertools
+import weakref
+from array import array
+from datetime import datetime, timedelta, timezone
+
+import networkx as nx
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+MICROSECOND = timedelta(microseconds=1)
+MISSING = -(1 << 63)
+REMOVED = 0xFFFFFFFF
+# Formats of the dates written by the crawlers: isoformat of GitHub dates and the UTC dates returned by GitLab.
+DATE_FORMATS = (
+    lambda d: d.isoformat(),
+    lambda d: d.strftime('%Y-%m-%dT%H:%M:%S.') + '{0:03d}Z'.format(d.microsecond // 1000),
+    lambda d: d.strftime('%Y-%m-%dT%H:%M:%SZ'),
+)
+
+
+def encode_date(value) -> int:
+    # Epoch microseconds and the index of the format that gives back the same string, packed in a single integer.
+    if type(value) is not str:
+        return None
+    try:
+        date = datetime.fromisoformat(value[:-1] + '+00:00' if value.endswith('Z') else value)
+    except ValueError:
+        return None
+    if date.tzinfo is None:
+        return None
+    date = date.astimezone(timezone.utc)
+    for style, formatter in enumerate(DATE_FORMATS):
+        if formatter(date) == value:
+            return (date - EPOCH) // MICROSECOND << 2 | style
+    return None
+
+
+def decode_date(value: int) -> str:
+    return DATE_FORMATS[value & 3](EPOCH + timedelta(microseconds=value >> 2))
+
+
+class Column:
+    __slots__ = ('name', 'typecode', 'kind', 'missing', 'low', 'high')
+
+    def __init__(self, name: str, typecode: str, kind: str, missing: int, low: int = None, high: int = None):
+        assert kind in ('int', 'string', 'date')
+
+        self.name = name
+        self.typecode = typecode
+        self.kind = kind
+        self.missing = missing
+        self.low = low
+        self.high = high
+
+
+NODE_COLUMNS = (
+    Column('bipartite', 'b', 'int', -1, 0, 127),
+    Column('language', 'I', 'string', 0),
+    Column('weight', 'q', 'int', MISSING, MISSING + 1, (1 << 63) - 1),
+    Column('date', 'q', 'date', MISSING),
+)
+EDGE_COLUMNS = (
+    Column('relation', 'I', 'string', 0),
+    Column('date', 'q', 'date', MISSING),
+    Column('fork_source', 'I', 'string', 0),
+)
+
+
+class Strings:
+    __slots__ = ('index', 'values')
+
+    def __init__(self):
+        self.index = {}
+        self.values = [None]
+
+    def intern(self, value: str) -> int:
+        key = self.index.get(value)
+        if key is None:
+            key = self.index[value] = len(self.values)
+            self.values.append(value)
+        return key
+
+
+class NodeDataView:
+    __slots__ = ('graph', 'selected', 'default')
+
+    def __init__(self, graph, data=False, default=None):
+        self.graph = graph
+        self.selected = data
+        self.default = default
+
+    def __len__(self):
+        return len(self.graph)
+
+    def __contains__(self, n):
+        return n in self.graph
+
+    def __getitem__(self, n):
+        i = self.graph.ids[n]
+        if self.selected is True:
+            return self.graph.node_attributes(i)
+        return self.graph.node_attribute(i, self.selected, self.default)
+
+    def __iter__(self):
+        graph = self.graph
+        if self.selected is False:
+            return iter(graph)
+        if self.selected is True:
+            return ((n, graph.node_attributes(i)) for i, n in graph.node_items())
+        return ((n, graph.node_attribute(i, self.selected, self.default)) for i, n in graph.node_items())
+
+
+class NodeView(NodeDataView):
+    __slots__ = ()
+
+    def __init__(self, graph):
+        super().__init__(graph, True)
+
+    def __iter__(self):
+        return iter(self.graph)
+
+    def __call__(self, data=False, default=None):
+        return NodeDataView(self.graph, data, default) if data is not False else self
+
+    def data(self, data=True, default=None):
+        return NodeDataView(self.graph, data, default)
+
+
+class EdgeDataView:
+    __slots__ = ('graph', 'selected', 'default')
+
+    def __init__(self, graph, data=False, default=None):
+        self.graph = graph
+        self.selected = data
+        self.default = default
+
+    def __len__(self):
+        return self.graph.number_of_edges()
+
+    def __contains__(self, e):
+        return self.graph.has_edge(e[0], e[1])
+
+    def __getitem__(self, e):
+        return self.graph.edge_attributes(self.graph.edge_id(e[0], e[1]))
+
+    def __iter__(self):
+        graph = self.graph
+        names = graph.names
+        for e, i, j in graph.edge_items():
+            if self.selected is False:
+                yield names[i], names[j]
+            elif self.selected is True:
+                yield names[i], names[j], graph.edge_attributes(e)
+            else:
+                yield names[i], names[j], graph.edge_attribute(e, self.selected, self.default)
+
+
+class EdgeView(EdgeDataView):
+    __slots__ = ()
+
+    def __init__(self, graph):
+        super().__init__(graph)
+
+    def __call__(self, data=False, default=None):
+        return EdgeDataView(self.graph, data, default) if data is not False else self
+
+    def data(self, data=True, default=None):
+        return EdgeDataView(self.graph, data, default)
+
+
+class AdjacencyView:
+    __slots__ = ('graph',)
+
+    def __init__(self, graph):
+        self.graph = graph
+
+    def __len__(self):
+        return len(self.graph)
+
+    def __contains__(self, n):
+        return n in self.graph
+
+    def __iter__(self):
+        return iter(self.graph)
+
+    def __getitem__(self, n):
+        return list(self.graph.neighbors(n))
+
+
+class DegreeView:
+    __slots__ = ('graph',)
+
+    def __init__(self, graph):
+        self.graph = graph
+
+    def __getitem__(self, n):
+        edges = self.graph.incident[self.graph.ids[n]]
+        return len(edges) if edges is not None else 0
+
+    def __iter__(self):
+        incident = self.graph.incident
+        return ((n, len(incident[i]) if incident[i] is not None else 0) for i, n in self.graph.node_items())
+
+    def __call__(self, nbunch=None):
+        if nbunch is None:
+            return iter(self)
+        return ((n, self[n]) for n in nbunch if n in self.graph)
+
+
+class CompactGraph:
+    def __init__(self, incoming_graph_data=None):
+        # Nodes and edges are numbered in insertion order and their attributes are stored in typed arrays. Languages,
+        # relations and fork sources are interned, dates are epoch integers and each node keeps the array of the
+        # numbers of its edges. Attributes that do not fit the arrays are kept in dictionaries.
+        self.ids = {}
+        self.names = []
+        self.strings = Strings()
+        self.node_data = {c.name: array(c.typecode) for c in NODE_COLUMNS}
+        self.node_extra = {}
+        self.incident = []
+        self.source = array('I')
+        self.target = array('I')
+        self.edge_data = {c.name: array(c.typecode) for c in EDGE_COLUMNS}
+        self.edge_extra = {}
+        self.size = 0
+        # New nodes and edges are found from the numbers in the cursors, updated nodes are logged while there are
+        # consumers, from the oldest of their cursors.
+        self.updated = array('I')
+        self.updated_offset = 0
+        self.removals = 0
+        self.consumers = weakref.WeakKeyDictionary()
+        if incoming_graph_data is not None:
+            self.update(incoming_graph_data)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __contains__(self, n):
+        try:
+            return n in self.ids
+        except TypeError:
+            return False
+
+    def __iter__(self):
+        return iter(self.ids)
+
+    @property
+    def nodes(self) -> NodeView:
+        return NodeView(self)
+
+    @property
+    def edges(self) -> EdgeView:
+        return EdgeView(self)
+
+    @property
+    def adj(self) -> AdjacencyView:
+        return AdjacencyView(self)
+
+    @property
+    def degree(self) -> DegreeView:
+        return DegreeView(self)
+
+    def number_of_nodes(self) -> int:
+        return len(self.ids)
+
+    def number_of_edges(self) -> int:
+        return self.size
+
+    def node_items(self):
+        return ((i, n) for i, n in enumerate(self.names) if n is not None)
+
+    def edge_items(self):
+        # Same order as networkx: the edges of each node in insertion order, from the node added first.
+        incident = self.incident
+        source = self.source
+        target = self.target
+        seen = bytearray(len(self.names))
+        for i, _ in self.node_items():
+            for e in incident[i] or ():
+                j = source[e] ^ target[e] ^ i
+                if not seen[j]:
+                    yield e, i, j
+            seen[i] = 1
+
+    def has_node(self, n) -> bool:
+        return n in self
+
+    def edge_id(self, u, v) -> int:
+        ids = self.ids
+        if u not in ids or v not in ids:
+            raise KeyError((u, v))
+        e = self._find_edge(ids[u], ids[v])
+        if e is None:
+            raise KeyError((u, v))
+        return e
+
+    def has_edge(self, u, v) -> bool:
+        ids = self.ids
+        if u not in ids or v not in ids:
+            return False
+        return self._find_edge(ids[u], ids[v]) is not None
+
+    def _find_edge(self, i: int, j: int) -> int:
+        # Scan the shortest of both arrays of edges: users usually have a few.
+        a = self.incident[i]
+        b = self.incident[j]
+        if a is None or b is None:
+            return None
+        if len(b) < len(a):
+            i, j, a = j, i, b
+        source = self.source
+        target = self.target
+        for e in a:
+            if source[e] ^ target[e] ^ i == j:
+                return e
+        return None
+
+    def neighbors(self, n):
+        i = self.ids[n]
+        names = self.names
+        source = self.source
+        target = self.target
+        return (names[source[e] ^ target[e] ^ i] for e in self.incident[i] or ())
+
+    def _decode(self, column: Column, value):
+        if value == column.missing:
+            return None
+        if column.kind == 'string':
+            return self.strings.values[value]
+        if column.kind == 'date':
+            return decode_date(value)
+        return value
+
+    def _encode(self, column: Column, value):
+        if column.kind == 'string':
+            return self.strings.intern(value) if type(value) is str else None
+        if column.kind == 'date':
+            return encode_date(value)
+        return value if type(value) is int and column.low <= value <= column.high else None
+
+    def _attributes(self, columns: tuple, data: dict, extra: dict, i: int) -> dict:
+        attr = {}
+        for column in columns:
+            value = self._decode(column, data[column.name][i])
+            if value is not None:
+                attr[column.name] = value
+        more = extra.get(i)
+        if more:
+            attr.update(more)
+        return attr
+
+    def _attribute(self, columns: dict, data: dict, extra: dict, i: int, key, default):
+        column = columns.get(key)
+        if column is not None:
+            value = self._decode(column, data[key][i])
+            if value is not None:
+                return value
+        return extra.get(i, {}).get(key, default)
+
+    def _set_attributes(self, columns: dict, data: dict, extra: dict, i: int, attr: dict):
+        more = extra.get(i)
+        for key, value in attr.items():
+            if more is not None:
+                more.pop(key, None)
+            column = columns.get(key)
+            if column is not None:
+                encoded = self._encode(column, value)
+                if encoded is not None:
+                    data[key][i] = encoded
+                    continue
+                data[key][i] = column.missing
+            # Values that do not fit the arrays are kept as they are.
+            if more is None:
+                more = extra[i] = {}
+            more[key] = value
+
+    def node_attributes(self, i: int) -> dict:
+        # A copy: attributes are changed with add_node.
+        return self._attributes(NODE_COLUMNS, self.node_data, self.node_extra, i)
+
+    def edge_attributes(self, e: int) -> dict:
+        return self._attributes(EDGE_COLUMNS, self.edge_data, self.edge_extra, e)
+
+    def node_attribute(self, i: int, key, default=None):
+        return self._attribute(NODE_INDEX, self.node_data, self.node_extra, i, key, default)
+
+    def edge_attribute(self, e: int, key, default=None):
+        return self._attribute(EDGE_INDEX, self.edge_data, self.edge_extra, e, key, default)
+
+    def _node(self, n) -> int:
+        i = self.ids.get(n)
+        if i is None:
+            i = self.ids[n] = len(self.names)
+            self.names.append(n)
+            self.incident.append(None)
+            for column in NODE_COLUMNS:
+                self.node_data[column.name].append(column.missing)
+        return i
+
+    def add_node(self, node_for_adding, **attr):
+        if node_for_adding is None:
+            raise ValueError('None cannot be a node')
+        is_new = node_for_adding not in self.ids
+        i = self._node(node_for_adding)
+        if attr:
+            self._set_attributes(NODE_INDEX, self.node_data, self.node_extra, i, attr)
+            if not is_new and self.consumers:
+                self.updated.append(i)
+
+    def add_nodes_from(self, nodes_for_adding, **attr):
+        ids = self.ids
+        for n in nodes_for_adding:
+            data = attr
+            if type(n) is tuple and len(n) == 2 and type(n[1]) is dict:
+                # A (node, attribute dict) pair, as accepted by networkx. It cannot be a node, as it is not hashable.
+                n, data = n
+                data = dict(attr, **data) if attr else data
+            if n is None:
+                raise ValueError('None cannot be a node')
+            i = ids.get(n)
+            is_new = i is None
+            if is_new:
+                i = self._node(n)
+            if data:
+                self._set_attributes(NODE_INDEX, self.node_data, self.node_extra, i, data)
+                if not is_new and self.consumers:
+                    self.updated.append(i)
+
+    def add_edge(self, u_of_edge, v_of_edge, **attr):
+        self._add_edge(u_of_edge, v_of_edge, attr)
+
+    def _add_edge(self, u, v, attr: dict):
+        if u is None or v is None:
+            raise ValueError('None cannot be a node')
+        ids = self.ids
+        i = ids.get(u)
+        if i is None:
+            i = self._node(u)
+        j = ids.get(v)
+        if j is None:
+            j = self._node(v)
+        e = self._find_edge(i, j)
+        if e is None:
+            e = len(self.source)
+            self.source.append(i)
+            self.target.append(j)
+            for column in EDGE_COLUMNS:
+                self.edge_data[column.name].append(column.missing)
+            incident = self.incident
+            for k in (i, j) if i != j else (i,):
+                edges = incident[k]
+                if edges is None:
+                    edges = incident[k] = array('I')
+                edges.append(e)
+            self.size += 1
+        if attr:
+            self._set_attributes(EDGE_INDEX, self.edge_data, self.edge_extra, e, attr)
+
+    def add_edges_from(self, ebunch_to_add, **attr):
+        for e in ebunch_to_add:
+            if len(e) == 3:
+                u, v, data = e
+                self._add_edge(u, v, dict(attr, **data) if attr else data)
+            elif len(e) == 2:
+                self._add_edge(e[0], e[1], attr)
+            else:
+                raise nx.NetworkXError('Edge tuple {0} must be a 2-tuple or 3-tuple.'.format(e))
+
+    def remove_node(self, n):
+        if n not in self.ids:
+            raise nx.NetworkXError('The node {0} is not in the graph.'.format(n))
+        self.remove_nodes_from((n,))
+
+    def remove_nodes_from(self, nodes):
+        nodes = [n for n in nodes if n in self]
+        # Repeated nodes are removed once.
+        removed = [self.ids.pop(n) for n in nodes if n in self.ids]
+        if not removed:
+            return
+        incident = self.incident
+        self._remove_edges({e for i in removed for e in incident[i] or ()})
+        for i in removed:
+            self.names[i] = None
+            incident[i] = None
+            self.node_extra.pop(i, None)
+        self.removals += 1
+        self._compact()
+
+    def remove_edge(self, u, v):
+        if not self.has_edge(u, v):
+            raise nx.NetworkXError('The edge {0}-{1} is not in the graph.'.format(u, v))
+        self._remove_edges({self.edge_id(u, v)})
+        self.removals += 1
+        self._compact()
+
+    def remove_edges_from(self, ebunch):
+        edges = {self.edge_id(e[0], e[1]) for e in ebunch if self.has_edge(e[0], e[1])}
+        if edges:
+            self._remove_edges(edges)
+            self.removals += 1
+            self._compact()
+
+    def _remove_edges(self, edges: set):
+        # The edges of each neighbour are filtered once for all the removed edges, instead of once for each one.
+        source = self.source
+        target = self.target
+        incident = self.incident
+        touched = set()
+        for e in edges:
+            touched.add(source[e])
+            touched.add(target[e])
+            source[e] = target[e] = REMOVED
+            self.edge_extra.pop(e, None)
+        self.size -= len(edges)
+        for i in touched:
+            if incident[i] is not None:
+                kept = array('I', (e for e in incident[i] if source[e] != REMOVED))
+                incident[i] = kept if kept else None
+
+    def _compact(self):
+        # Removed nodes and edges keep their numbers until they are the majority, then the arrays are copied without
+        # them. The removal already invalidated the cursors, so the consumers do not see the new numbers.
+        if len(self.source) - self.size <= self.size and len(self.names) - len(self.ids) <= len(self.ids):
+            return
+        h = self.subgraph(self.ids)
+        self.ids = h.ids
+        self.names = h.names
+        self.incident = h.incident
+        self.source = h.source
+        self.target = h.target
+        self.node_data = h.node_data
+        self.node_extra = h.node_extra
+        self.edge_data = h.edge_data
+        self.edge_extra = h.edge_extra
+        self.size = h.size
+        self.updated_offset += len(self.updated)
+        self.updated = array('I')
+
+    def update(self, g):
+        self.add_nodes_from(g.nodes(data=True))
+        self.add_edges_from(g.edges(data=True))
+
+    def cursor(self, consumer=None) -> tuple:
+        cursor = len(self.names), self.updated_offset + len(self.updated), len(self.source), self.removals
+        if consumer is not None:
+            self.consumers[consumer] = cursor
+            self._trim()
+        return cursor
+
+    def release(self, consumer):
+        self.consumers.pop(consumer, None)
+        self._trim()
+
+    def _trim(self):
+        updated = min((x[1] for x in self.consumers.values()), default=self.updated_offset + len(self.updated))
+        del self.updated[:updated - self.updated_offset]
+        self.updated_offset = updated
+
+    def delta(self, cursor: tuple):
+        # Same format as DeltaGraph.delta: the nodes added or updated and the edges added since the cursor.
+        nodes, updated, edges, removals = cursor
+        if removals != self.removals or updated < self.updated_offset:
+            return None
+        names = self.names
+        source = self.source
+        target = self.target
+        return [names[i] for i in itertools.chain(range(nodes, len(names)),
+                                                  self.updated[updated - self.updated_offset:])], \
+            [(names[source[e]], names[target[e]]) for e in range(edges, len(source))]
+
+    def subgraph(self, nodes) -> 'CompactGraph':
+        # The arrays are copied without decoding the attributes. Both graphs share the interned strings.
+        ids = self.ids
+        kept = sorted({ids[n] for n in nodes if n in ids})
+        position = {i: k for k, i in enumerate(kept)}
+        h = CompactGraph()
+        h.strings = self.strings
+        for k, i in enumerate(kept):
+            h.ids[self.names[i]] = k
+            h.names.append(self.names[i])
+            if i in self.node_extra:
+                h.node_extra[k] = dict(self.node_extra[i])
+        for name, values in self.node_data.items():
+            h.node_data[name] = array(values.typecode, (values[i] for i in kept))
+
+        renumbered = {}
+        source = self.source
+        target = self.target
+        for e in range(len(source)):
+            if source[e] in position and target[e] in position:
+                renumbered[e] = len(h.source)
+                h.source.append(position[source[e]])
+                h.target.append(position[target[e]])
+                if e in self.edge_extra:
+                    h.edge_extra[renumbered[e]] = dict(self.edge_extra[e])
+        for name, values in self.edge_data.items():
+            h.edge_data[name] = array(values.typecode, (values[e] for e in renumbered))
+        for i in kept:
+            edges = array('I', (renumbered[e] for e in self.incident[i] or () if e in renumbered))
+            h.incident.append(edges if edges else None)
+        h.size = len(h.source)
+        return h
+
+    def connected_components(self):
+        names = self.names
+        incident = self.incident
+        source = self.source
+        target = self.target
+        seen = bytearray(len(names))
+        for root, n in self.node_items():
+            if seen[root]:
+                continue
+            seen[root] = 1
+            component = [root]
+            for i in component:
+                for e in incident[i] or ():
+                    j = source[e] ^ target[e] ^ i
+                    if not seen[j]:
+                        seen[j] = 1
+                        component.append(j)
+            yield {names[i] for i in component}
+
+    def bridges(self):
+        # Iterative Tarjan: an edge is a bridge when no back edge below it reaches above its parent.
+        names = self.names
+        incident = self.incident
+        source = self.source
+        target = self.target
+        order = array('q', [-1]) * len(names)
+        low = array('q', [0]) * len(names)
+        found = set()
+        counter = 0
+        for root, _ in self.node_items():
+            if order[root] != -1:
+                continue
+            order[root] = low[root] = counter
+            counter += 1
+            stack = [(root, -1, iter(incident[root] or ()))]
+            while stack:
+                i, via, edges = stack[-1]
+                for e in edges:
+                    if e == via:
+                        continue
+                    j = source[e] ^ target[e] ^ i
+                    if order[j] == -1:
+                        order[j] = low[j] = counter
+                        counter += 1
+                        stack.append((j, e, iter(incident[j] or ())))
+                        break
+                    if order[j] < low[i]:
+                        low[i] = order[j]
+                else:
+                    stack.pop()
+                    if stack:
+                        parent = stack[-1][0]
+                        if low[i] < low[parent]:
+                            low[parent] = low[i]
+                        if low[i] > order[parent]:
+                            found.add(via)
+        # Reported in the order of the edges, like networkx.
+        return [(names[i], names[j]) for e, i, j in self.edge_items() if e in found]
+
+    def to_networkx(self, graph_class=nx.Graph) -> nx.Graph:
+        g = graph_class()
+        g.add_nodes_from(self.nodes(data=True))
+        g.add_edges_from(self.edges(data=True))
+        return g
+
+
+NODE_INDEX = {c.name: c for c in NODE_COLUMNS}
+EDGE_INDEX = {c.name: c for c in EDGE_COLUMNS}
@@ -0,0 +1,97 @@
+import json
+import os
+import tempfile
+import time
+from datetime import datetime
+
+import dateutil.parser
+import networkx as nx
+
+from reponetwork.CompactGraph import CompactGraph
+
+
+class CrawlCheckpoint:
+    def __init__(self, path: str, interval: float = 60, save_graph=None):
+        assert isinstance(path, str)
+        assert interval is None or interval >= 0
+        assert save_graph is None or callable(save_graph)
+
+        self.path = path
+        self.interval = interval
+        # When the graph is already persisted elsewhere, like the output of the crawl, the checkpoint saves it through
+        # this function and only keeps the crawl state.
+        self.save_graph = save_graph
+        self.query: str = None
+        self.since: datetime = None
+        self.page: int = None
+        self.count = 0
+        self.frontier = []
+        self.completed = set()
+        # Fork links waiting for a parent repository that was not merged yet.
+        self.deferred = {}
+        self.graph: nx.Graph = None
+        self._last_save = time.time()
+
+    @staticmethod
+    def load(path: str, interval: float = 60, save_graph=None):
+        checkpoint = CrawlCheckpoint(path, interval, save_graph)
+        with open(path, 'r', encoding='utf-8') as f:
+            state = json.load(f)
+        checkpoint.query = state.get('query')
+        checkpoint.since = dateutil.parser.parse(state['since']) if state.get('since') else None
+        checkpoint.page = state.get('page')
+        checkpoint.count = state.get('count', 0)
+        checkpoint.frontier = state.get('frontier', [])
+        checkpoint.completed = set(state.get('completed', []))
+        checkpoint.deferred = state.get('deferred', {})
+        checkpoint.graph = nx.node_link_graph(state['graph']) if state.get('graph') else None
+        if checkpoint.graph is not None:
+            checkpoint.rollback(checkpoint.graph)
+        return checkpoint
+
+    def rollback(self, g: nx.Graph):
+        # Repositories that were being imported when the checkpoint was written are incomplete. Every repository
+        # merged into the graph, including the parents imported with a fork, is in completed.
+        partial = [x['id'] for x in self.frontier if x['id'] not in self.completed and x['id'] in g]
+        if partial:
+            g.remove_nodes_from(partial)
+            g.remove_nodes_from([n for n, d in g.nodes(data=True) if d.get('bipartite') == 1 and g.degree[n] == 0])
+
+    def due(self) -> bool:
+        return self.interval is not None and time.time() - self._last_save >= self.interval
+
+    def update(self, page: int, count: int, frontier: list, deferred: dict = None):
+        self.page = page
+        self.count = count
+        self.frontier = frontier
+        self.deferred = deferred if deferred is not None else {}
+
+    def save(self, g: nx.Graph):
+        if self.save_graph is not None:
+            # Saved first, so that the crawl state never refers to repositories missing in the saved graph.
+            self.save_graph(g)
+            g = None
+        elif isinstance(g, CompactGraph):
+            g = g.to_networkx()
+        state = {
+            'query': self.query,
+            'since': self.since.isoformat() if self.since else None,
+            'page': self.page,
+            'count': self.count,
+            'frontier': self.frontier,
+            'completed': sorted(self.completed),
+            'deferred': self.deferred,
+            'graph': nx.node_link_data(g) if g is not None else None,
+        }
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp_path = tempfile.mkstemp(prefix='.checkpoint-', dir=directory)
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(state, f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        self._last_save = time.time()
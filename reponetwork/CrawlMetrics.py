@@ -0,0 +1,332 @@
+import json
+import os
+import re
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from threading import Lock
+from urllib.parse import urlsplit
+
+# Upper bounds in seconds of the latency buckets, the default ones of the Prometheus clients.
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, float('inf'))
+# The remaining quota of each resource is written at most once per this number of seconds.
+QUOTA_SAMPLE_INTERVAL = 1.0
+# Lock acquisitions that wait longer than this number of seconds are counted as contended.
+CONTENDED = 0.001
+# The path segments that follow these ones are identifiers, replaced by placeholders in the endpoint names.
+PATH_PARAMETERS = {'repos': (':owner', ':repo'), 'users': (':user',), 'orgs': (':org',), 'projects': (':id',),
+                   'groups': (':id',)}
+API_PREFIXES = (('api', 'v3'), ('api', 'v4'))
+SHA = re.compile('[0-9a-f]{40}')
+
+
+def endpoint(url: str) -> str:
+    # The path of the request with the identifiers replaced, so that requests to any repository are counted together.
+    parts = [p for p in urlsplit(url).path.split('/') if p]
+    if tuple(parts[:2]) in API_PREFIXES:
+        parts = parts[2:]
+    if parts and parts[0] in PATH_PARAMETERS:
+        names = PATH_PARAMETERS[parts[0]]
+        parts[1:1 + len(names)] = names[:len(parts) - 1]
+    parts = [':id' if p.isdigit() else ':sha' if SHA.fullmatch(p) else p for p in parts]
+    return '/' + '/'.join(parts)
+
+
+class Histogram:
+    __slots__ = ('counts', 'total')
+
+    def __init__(self):
+        self.counts = [0] * len(LATENCY_BUCKETS)
+        self.total = 0.0
+
+    @property
+    def count(self) -> int:
+        return sum(self.counts)
+
+    def observe(self, seconds: float):
+        self.counts[bisect_left(LATENCY_BUCKETS, seconds)] += 1
+        self.total += seconds
+
+    def quantile(self, q: float) -> float:
+        # The upper bound of the bucket that holds the quantile.
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(LATENCY_BUCKETS, self.counts):
+            seen += count
+            if seen and seen >= rank:
+                return bound
+        return 0.0
+
+    def to_dict(self) -> dict:
+        return {'count': self.count, 'sum': round(self.total, 6), 'buckets': list(self.counts)}
+
+
+class Stopwatch:
+    __slots__ = ('metrics', 'prefix', 'last')
+
+    def __init__(self, metrics: 'CrawlMetrics', prefix: str):
+        self.metrics = metrics
+        self.prefix = prefix
+        self.last = time.perf_counter()
+
+    def lap(self, name: str):
+        # Records the time since the previous lap as a phase.
+        now = time.perf_counter()
+        self.metrics.record_phase(self.prefix + name, now - self.last)
+        self.last = now
+
+
+class CrawlMetrics:
+    def __init__(self, path: str = None, interval: float = 10):
+        assert path is None or isinstance(path, str)
+        assert interval > 0
+
+        # Paths ending in .prom are rewritten with the Prometheus text format, any other one gets JSON lines.
+        self.path = path
+        self.prometheus = path is not None and path.endswith('.prom')
+        self.interval = interval
+        self.started = time.time()
+        self.requests = {}
+        self.statuses = {}
+        self.quota = {}
+        self.repos = 0
+        self.waits = {}
+        self.holds = {}
+        self.contended = {}
+        self.phases = {}
+        self._lock = Lock()
+        self._file = None
+        if path is not None:
+            directory = os.path.dirname(os.path.abspath(path))
+            os.makedirs(directory, exist_ok=True)
+            if not self.prometheus:
+                self._file = open(path, 'a')
+        self._flushed = (self.started, 0)
+
+    def hook(self, response, *args, **kwargs):
+        # Response hook of requests sessions. The elapsed time goes from sending the request to parsing the headers.
+        self.response(response.request.method, response.url, response.status_code,
+                      response.elapsed.total_seconds(), response.headers)
+
+    def response(self, method: str, url: str, status: int, seconds: float, headers=None):
+        name = '{0} {1}'.format(method.upper(), endpoint(url))
+        event = None
+        with self._lock:
+            histogram = self.requests.get(name)
+            if histogram is None:
+                histogram = self.requests[name] = Histogram()
+                self.statuses[name] = {}
+            histogram.observe(seconds)
+            statuses = self.statuses[name]
+            statuses[status] = statuses.get(status, 0) + 1
+            if headers is not None:
+                event = self._update_quota(headers)
+        if event is not None:
+            self._write(event)
+        self._maybe_flush()
+
+    def _update_quota(self, headers) -> dict:
+        # GitHub sends the X-RateLimit headers and GitLab the RateLimit ones. The quota used is the sum of the
+        # decreases of the lowest remaining value of each window, as concurrent responses arrive out of order.
+        remaining = headers.get('X-RateLimit-Remaining') or headers.get('RateLimit-Remaining')
+        if remaining is None:
+            return None
+        resource = headers.get('X-RateLimit-Resource') or 'default'
+        limit = headers.get('X-RateLimit-Limit') or headers.get('RateLimit-Limit')
+        reset = headers.get('X-RateLimit-Reset') or headers.get('RateLimit-Reset')
+        remaining = int(remaining)
+        now = time.time()
+        state = self.quota.get(resource)
+        if state is None:
+            state = self.quota[resource] = {'remaining': remaining, 'limit': None, 'reset': None, 'used': 0,
+                                            'lowest': remaining, 'sampled': 0.0}
+        if reset != state['reset']:
+            state['lowest'] = remaining
+        elif remaining < state['lowest']:
+            state['used'] += state['lowest'] - remaining
+            state['lowest'] = remaining
+        state.update(remaining=remaining, limit=int(limit) if limit else None, reset=reset)
+        if now - state['sampled'] < QUOTA_SAMPLE_INTERVAL:
+            return None
+        state['sampled'] = now
+        return {'type': 'quota', 'time': now, 'resource': resource, 'remaining': remaining, 'limit': state['limit'],
+                'reset': reset}
+
+    def repo(self):
+        with self._lock:
+            self.repos += 1
+        self._maybe_flush()
+
+    def wait(self, name: str, seconds: float):
+        with self._lock:
+            self._observe(self.waits, name, seconds)
+            if seconds > CONTENDED:
+                self.contended[name] = self.contended.get(name, 0) + 1
+
+    @contextmanager
+    def locked(self, lock, name: str):
+        # Acquires the lock, recording the time spent waiting for it and holding it.
+        start = time.perf_counter()
+        with lock:
+            acquired = time.perf_counter()
+            self.wait('lock:' + name, acquired - start)
+            try:
+                yield
+            finally:
+                held = time.perf_counter() - acquired
+                with self._lock:
+                    self._observe(self.holds, 'lock:' + name, held)
+
+    def record_phase(self, name: str, seconds: float):
+        with self._lock:
+            runs, total = self.phases.get(name, (0, 0.0))
+            self.phases[name] = (runs + 1, total + seconds)
+        self._write({'type': 'phase', 'time': time.time(), 'phase': name, 'seconds': round(seconds, 6)})
+
+    @contextmanager
+    def phase(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record_phase(name, time.perf_counter() - start)
+
+    def stopwatch(self, prefix: str = '') -> Stopwatch:
+        return Stopwatch(self, prefix)
+
+    @staticmethod
+    def _observe(histograms: dict, name: str, seconds: float):
+        histogram = histograms.get(name)
+        if histogram is None:
+            histogram = histograms[name] = Histogram()
+        histogram.observe(seconds)
+
+    def _write(self, event: dict):
+        if self._file is None:
+            return
+        line = json.dumps(event)
+        with self._lock:
+            self._file.write(line + '\n')
+
+    def _maybe_flush(self):
+        if self.path is not None and time.time() - self._flushed[0] >= self.interval:
+            self.flush()
+
+    def snapshot(self) -> dict:
+        now = time.time()
+        with self._lock:
+            last, last_repos = self._flushed
+            return {
+                'type': 'snapshot',
+                'time': now,
+                'elapsed': round(now - self.started, 3),
+                'repos': self.repos,
+                'repos_per_second': self.repos / max(now - self.started, 1e-9),
+                'recent_repos_per_second': (self.repos - last_repos) / max(now - last, 1e-9),
+                'requests': {k: h.to_dict() for k, h in self.requests.items()},
+                'statuses': {k: {str(s): n for s, n in v.items()} for k, v in self.statuses.items()},
+                'quota': {k: {x: v[x] for x in ('remaining', 'limit', 'reset', 'used')} for k, v in self.quota.items()},
+                'waits': {k: h.to_dict() for k, h in self.waits.items()},
+                'contended': dict(self.contended),
+                'holds': {k: h.to_dict() for k, h in self.holds.items()},
+                'phases': {k: {'runs': runs, 'seconds': round(total, 6)} for k, (runs, total) in self.phases.items()},
+            }
+
+    def flush(self):
+        snapshot = self.snapshot()
+        with self._lock:
+            self._flushed = (snapshot['time'], snapshot['repos'])
+        if self.prometheus:
+            # Written to a temporary file first, so that the scrapers never read a partial file.
+            temporary = self.path + '.tmp'
+            with open(temporary, 'w') as f:
+                f.write(self.to_prometheus(snapshot))
+            os.replace(temporary, self.path)
+        elif self._file is not None:
+            self._write(snapshot)
+            self._file.flush()
+
+    def to_prometheus(self, snapshot: dict = None) -> str:
+        snapshot = snapshot or self.snapshot()
+        lines = []
+
+        def label(value) -> str:
+            return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+        def histogram(metric: str, key: str, values: dict, description: str):
+            lines.append('# HELP {0} {1}'.format(metric, description))
+            lines.append('# TYPE {0} histogram'.format(metric))
+            for name, h in sorted(values.items()):
+                total = 0
+                for bound, count in zip(LATENCY_BUCKETS, h['buckets']):
+                    total += count
+                    lines.append('{0}_bucket{{{1}="{2}",le="{3}"}} {4}'.format(
+                        metric, key, label(name), '+Inf' if bound == float('inf') else '{0:g}'.format(bound), total))
+                lines.append('{0}_sum{{{1}="{2}"}} {3}'.format(metric, key, label(name), h['sum']))
+                lines.append('{0}_count{{{1}="{2}"}} {3}'.format(metric, key, label(name), h['count']))
+
+        def series(metric: str, kind: str, values: list, description: str):
+            lines.append('# HELP {0} {1}'.format(metric, description))
+            lines.append('# TYPE {0} {1}'.format(metric, kind))
+            for labels, value in values:
+                labels = ','.join('{0}="{1}"'.format(k, label(v)) for k, v in labels)
+                lines.append('{0}{1} {2}'.format(metric, '{' + labels + '}' if labels else '', value))
+
+        histogram('reponet_request_seconds', 'endpoint', snapshot['requests'], 'Latency of the API requests.')
+        series('reponet_responses_total', 'counter',
+               [((('endpoint', k), ('status', s)), n) for k, v in sorted(snapshot['statuses'].items())
+                for s, n in sorted(v.items())], 'API responses by endpoint and status.')
+        series('reponet_rate_limit_remaining', 'gauge',
+               [((('resource', k),), v['remaining']) for k, v in sorted(snapshot['quota'].items())],
+               'Requests left in the current rate limit window.')
+        series('reponet_rate_limit_used_total', 'counter',
+               [((('resource', k),), v['used']) for k, v in sorted(snapshot['quota'].items())],
+               'Requests counted against the rate limit during the crawl.')
+        series('reponet_repos_total', 'counter', [((), snapshot['repos'])], 'Repositories imported.')
+        series('reponet_repos_per_second', 'gauge', [((), round(snapshot['recent_repos_per_second'], 6))],
+               'Repositories imported per second since the previous snapshot.')
+        histogram('reponet_wait_seconds', 'kind', snapshot['waits'],
+                  'Time spent waiting for locks, the rate limit and the request limiter.')
+        series('reponet_contended_total', 'counter',
+               [((('kind', k),), n) for k, n in sorted(snapshot['contended'].items())],
+               'Waits longer than {0:g} seconds.'.format(CONTENDED))
+        histogram('reponet_lock_held_seconds', 'lock', snapshot['holds'], 'Time the locks are held.')
+        series('reponet_phase_seconds_total', 'counter',
+               [((('phase', k),), v['seconds']) for k, v in sorted(snapshot['phases'].items())],
+               'Time spent in each phase of the crawl and the analysis.')
+        series('reponet_phase_runs_total', 'counter',
+               [((('phase', k),), v['runs']) for k, v in sorted(snapshot['phases'].items())],
+               'Runs of each phase of the crawl and the analysis.')
+        return '\n'.join(lines) + '\n'
+
+    def print_summary(self):
+        s = self.snapshot()
+
+        def bound(seconds: float) -> str:
+            return '>{0:g}s'.format(LATENCY_BUCKETS[-2]) if seconds == float('inf') else '<={0:g}ms'.format(seconds * 1000)
+
+        print('Crawl profile after {0:.1f}s:'.format(s['elapsed']))
+        print('Repositories: {0} ({1:.2f}/s)'.format(s['repos'], s['repos_per_second']))
+        print('Requests: {0}'.format(sum(h.count for h in self.requests.values())))
+        for name, h in sorted(self.requests.items(), key=lambda t: -t[1].total):
+            errors = sum(n for status, n in self.statuses[name].items() if status >= 400)
+            print('  {0}: {1} requests, {2:.2f}s, mean {3:.0f}ms, p50 {4}, p95 {5}, errors {6}'.format(
+                name, h.count, h.total, h.total / h.count * 1000, bound(h.quantile(0.5)), bound(h.quantile(0.95)),
+                errors))
+        for resource, q in sorted(s['quota'].items()):
+            print('Rate limit {0}: {1} of {2} remaining, {3} used ({4:.1f}/min)'.format(
+                resource, q['remaining'], q['limit'], q['used'], q['used'] * 60 / max(s['elapsed'], 1e-9)))
+        for name, h in sorted(self.waits.items()):
+            held = self.holds.get(name)
+            print('Waits for {0}: {1}, {2} contended, {3:.3f}s waiting{4}'.format(
+                name, h.count, self.contended.get(name, 0), h.total,
+                ', {0:.3f}s held'.format(held.total) if held else ''))
+        for name, (runs, total) in sorted(self.phases.items(), key=lambda t: -t[1][1]):
+            print('Phase {0}: {1:.3f}s{2}'.format(name, total, ' in {0} runs'.format(runs) if runs > 1 else ''))
+
+    def close(self):
+        if self.path is not None:
+            self.flush()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
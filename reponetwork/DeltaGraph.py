@@ -0,0 +1,114 @@
+import weakref
+
+import networkx as nx
+
+
+class DeltaGraph(nx.Graph):
+    def __init__(self, incoming_graph_data=None, **attr):
+        # Logs of the nodes added or updated and the edges added. Each consumer keeps its own cursor, and the logs are
+        # only kept while there are consumers, from the oldest of their cursors.
+        self.node_log = []
+        self.edge_log = []
+        self.node_offset = 0
+        self.edge_offset = 0
+        self.removals = 0
+        self.consumers = weakref.WeakKeyDictionary()
+        super().__init__(incoming_graph_data, **attr)
+
+    def cursor(self, consumer=None) -> tuple:
+        cursor = self.node_offset + len(self.node_log), self.edge_offset + len(self.edge_log), self.removals
+        if consumer is not None:
+            self.consumers[consumer] = cursor
+            self._trim()
+        return cursor
+
+    def release(self, consumer):
+        self.consumers.pop(consumer, None)
+        self._trim()
+
+    def _trim(self):
+        cursors = list(self.consumers.values())
+        nodes = min((x[0] for x in cursors), default=self.node_offset + len(self.node_log))
+        edges = min((x[1] for x in cursors), default=self.edge_offset + len(self.edge_log))
+        del self.node_log[:nodes - self.node_offset]
+        del self.edge_log[:edges - self.edge_offset]
+        self.node_offset = nodes
+        self.edge_offset = edges
+
+    def delta(self, cursor: tuple):
+        nodes, edges, removals = cursor
+        if removals != self.removals or nodes < self.node_offset or edges < self.edge_offset:
+            return None
+        return self.node_log[nodes - self.node_offset:], self.edge_log[edges - self.edge_offset:]
+
+    def add_node(self, node_for_adding, **attr):
+        super().add_node(node_for_adding, **attr)
+        if self.consumers:
+            self.node_log.append(node_for_adding)
+
+    def add_nodes_from(self, nodes_for_adding, **attr):
+        if not self.consumers:
+            super().add_nodes_from(nodes_for_adding, **attr)
+            return
+        nodes_for_adding = list(nodes_for_adding)
+        super().add_nodes_from(nodes_for_adding, **attr)
+        for n in nodes_for_adding:
+            try:
+                hash(n)
+            except TypeError:
+                # A (node, attribute dict) pair, as accepted by networkx.
+                n = n[0]
+            self.node_log.append(n)
+
+    def add_edge(self, u_of_edge, v_of_edge, **attr):
+        if not self.consumers:
+            super().add_edge(u_of_edge, v_of_edge, **attr)
+            return
+        is_new = not self.has_edge(u_of_edge, v_of_edge)
+        if is_new:
+            self.node_log.extend(n for n in (u_of_edge, v_of_edge) if n not in self._node)
+        super().add_edge(u_of_edge, v_of_edge, **attr)
+        if is_new:
+            self.edge_log.append((u_of_edge, v_of_edge))
+
+    def add_edges_from(self, ebunch_to_add, **attr):
+        if not self.consumers:
+            super().add_edges_from(ebunch_to_add, **attr)
+            return
+        ebunch_to_add = list(ebunch_to_add)
+        new_edges = {}
+        new_nodes = {}
+        for e in ebunch_to_add:
+            u, v = e[0], e[1]
+            if not self.has_edge(u, v):
+                new_edges.setdefault(frozenset((u, v)), (u, v))
+                for n in (u, v):
+                    if n not in self._node:
+                        new_nodes[n] = None
+        super().add_edges_from(ebunch_to_add, **attr)
+        self.node_log.extend(new_nodes)
+        self.edge_log.extend(new_edges.values())
+
+    def remove_node(self, n):
+        super().remove_node(n)
+        self.removals += 1
+
+    def remove_nodes_from(self, nodes):
+        super().remove_nodes_from(nodes)
+        self.removals += 1
+
+    def remove_edge(self, u, v):
+        super().remove_edge(u, v)
+        self.removals += 1
+
+    def remove_edges_from(self, ebunch):
+        super().remove_edges_from(ebunch)
+        self.removals += 1
+
+    def clear(self):
+        super().clear()
+        self.removals += 1
+
+    def clear_edges(self):
+        super().clear_edges()
+        self.removals += 1
@@ -0,0 +1,211 @@
+import concurrent.futures
+import os
+import socket
+import sys
+import time
+from datetime import datetime
+from threading import Lock
+
+import networkx as nx
+from github import Repository, RateLimitExceededException, GithubException
+
+from reponetwork.CompactGraph import CompactGraph
+from reponetwork.CrawlCheckpoint import CrawlCheckpoint
+from reponetwork.GithubCrawler import GithubCrawler, wait_for_reset
+from reponetwork.GraphBuffer import GraphBuffer, GraphWriter
+from reponetwork.WorkQueue import WorkQueue
+from reponetwork.dates import parse_date
+
+SEARCH_AHEAD = 200
+
+
+class CrawlCoordinator:
+    def __init__(self, crawler: GithubCrawler, queue: WorkQueue, interval: float = 60, poll: float = 1):
+        assert isinstance(crawler, GithubCrawler)
+        assert isinstance(queue, WorkQueue)
+        assert interval >= 0
+        assert poll > 0
+
+        self.crawler = crawler
+        self.queue = queue
+        self.interval = interval
+        self.poll = poll
+
+    def find(self, query: str, limit: int = None, since: datetime = None, previous: nx.Graph = None,
+             checkpoint: CrawlCheckpoint = None):
+        assert query is None or isinstance(query, str)
+        assert limit is None or isinstance(limit, int) and limit >= 0
+        assert since is None or isinstance(since, datetime)
+        assert previous is None or isinstance(previous, (nx.Graph, CompactGraph))
+
+        if checkpoint is not None:
+            print('The crawl progress is kept in the queue {0}, the checkpoint is not used.'.format(self.queue.path))
+
+        g = previous if previous is not None else nx.Graph()
+        writer = GraphWriter(g)
+        queue = self.queue
+        client = self.crawler.client
+        queue.set('query', query)
+        queue.set('since', since.isoformat() if since else None)
+        queue.set('finished', False)
+        queue.skip([n for n, d in g.nodes(data=True) if d.get('bipartite') == 0])
+        start = queue.counts()['done']
+        repos = client.search_repositories(query) if query else client.get_repos(since=since)
+        page = queue.get('page', 0)
+        searched = queue.get('searched', False)
+        paused = 0
+        seq = 0
+        last_yield = time.time()
+
+        def merge() -> bool:
+            nonlocal seq
+            rows = queue.results(seq)
+            for seq, buffers in rows:
+                buffers = [GraphBuffer.load(x) for x in buffers]
+                writer.merge(buffers)
+                for buffer in buffers:
+                    if buffer.repo is not None:
+                        print('Analyzed repo {0}.'.format(buffer.repo_id))
+            return bool(rows)
+
+        print('Coordinating the crawl through {0}.'.format(queue.path))
+        while True:
+            counts = queue.counts()
+            if limit and counts['done'] - start >= limit:
+                break
+            queued = counts['pending'] + counts['claimed'] + counts['done'] - start
+            if not searched and counts['pending'] < SEARCH_AHEAD and (not limit or queued < limit) \
+                    and time.time() >= paused:
+                # The workers crawl the forks, the coordinator only feeds them with the search results.
+                try:
+                    page_repos = repos.get_page(page)
+                    page += 1
+                    if page_repos:
+                        queue.push([(x.full_name, x._rawData) for x in page_repos if x.full_name])
+                    else:
+                        searched = True
+                except RateLimitExceededException:
+                    paused = client.rate_limiting_resettime
+                    print('The GitHub rate limit was triggered, the search continues after the reset.')
+                except GithubException:
+                    searched = True
+                    print(sys.exc_info())
+                    print('Communication error with GitHub. The search completed prematurely.')
+                queue.set('page', page)
+                queue.set('searched', searched)
+
+            if merge():
+                if time.time() - last_yield >= self.interval:
+                    yield g
+                    queue.acknowledge(seq)
+                    last_yield = time.time()
+            elif searched and not counts['pending'] and not counts['claimed']:
+                break
+            else:
+                time.sleep(self.poll)
+
+        # Let the workers finish the repositories they have claimed.
+        queue.set('finished', True)
+        deadline = time.time() + queue.lease
+        while queue.counts()['claimed'] and time.time() < deadline:
+            if not merge():
+                time.sleep(self.poll)
+        merge()
+        dropped = writer.flush()
+        if dropped:
+            print('Dropped {0} links to repositories that were not imported.'.format(dropped))
+        yield g
+        queue.acknowledge(seq)
+
+
+class CrawlWorker:
+    def __init__(self, crawler: GithubCrawler, queue: WorkQueue, name: str = None, batch: int = 20,
+                 max_workers: int = 20, poll: float = 1):
+        assert isinstance(crawler, GithubCrawler)
+        assert isinstance(queue, WorkQueue)
+        assert name is None or isinstance(name, str)
+        assert batch > 0
+        assert max_workers > 0
+        assert poll > 0
+
+        self.crawler = crawler
+        self.queue = queue
+        self.name = name or '{0}-{1}'.format(socket.gethostname(), os.getpid())
+        self.batch = batch
+        self.max_workers = max_workers
+        self.poll = poll
+
+    def make_repo(self, task_id: str, data: dict) -> Repository:
+        if data is None:
+            # Repositories reserved while importing a fork are queued by name only.
+            data = {'full_name': task_id,
+                    'url': '{0}/repos/{1}'.format(self.crawler.client.requester.base_url, task_id)}
+        return self.crawler.make_repo(data)
+
+    def run(self):
+        crawler = self.crawler
+        queue = self.queue
+        name = self.name
+        lock = Lock()
+        print('Worker {0} waiting for repositories in {1}.'.format(name, queue.path))
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while True:
+                tasks = queue.claim(name, self.batch)
+                if not tasks:
+                    if queue.get('finished'):
+                        break
+                    time.sleep(self.poll)
+                    continue
+
+                since = queue.get('since')
+                since = parse_date(since) if since else None
+                own = {task_id for task_id, _ in tasks}
+                started = set()
+                reserved = set()
+                completed = set()
+
+                def claim(repo_id: str) -> bool:
+                    with crawler.metrics.locked(lock, 'claims'):
+                        if repo_id in started:
+                            return False
+                        started.add(repo_id)
+                    if repo_id in own:
+                        return True
+                    if queue.reserve(repo_id, name):
+                        with crawler.metrics.locked(lock, 'claims'):
+                            reserved.add(repo_id)
+                        return True
+                    return False
+
+                def release(repo_id: str):
+                    with crawler.metrics.locked(lock, 'claims'):
+                        started.discard(repo_id)
+
+                items = [self.make_repo(task_id, data) for task_id, data in tasks]
+                error = None
+                try:
+                    if crawler.use_graphql:
+                        crawler.prefetch(items)
+                    workers = (executor.submit(crawler.import_repo, item, since, claim, release) for item in items)
+                    for worker in concurrent.futures.as_completed(workers):
+                        try:
+                            repo, repo_forks, buffers = worker.result()
+                        except RateLimitExceededException as e:
+                            error = e
+                            continue
+                        ids = [x.repo_id for x in buffers]
+                        queue.complete(ids, name, [x.dump() for x in buffers],
+                                       [(x.full_name, x._rawData) for x in repo_forks if x.full_name])
+                        completed.update(ids)
+                        crawler.metrics.repo()
+                except RateLimitExceededException as e:
+                    error = e
+
+                if error is not None:
+                    # Another worker, or this one after the reset, imports the rest.
+                    queue.release(list((own | reserved) - completed), name)
+                    wait_for_reset(crawler.client, crawler.metrics)
+                else:
+                    # The repositories that could not be imported are not retried, as in a local crawl.
+                    queue.complete(list((own | reserved) - completed), name, [], [])
+        print('Worker {0} finished.'.format(name))
@@ -0,0 +1,102 @@
+import heapq
+import itertools
+from threading import Lock
+
+BATCH = 100
+
+
+class ForkFrontier:
+    def __init__(self, max_depth: int = None, priority: str = 'depth'):
+        assert max_depth is None or isinstance(max_depth, int) and max_depth >= 0
+        assert priority in ('depth', 'stars')
+
+        self.max_depth = max_depth
+        self.priority = priority
+        self.heap = []
+        self.order = itertools.count()
+        self.known = set()
+        self.active = {}
+        self.claimed = set()
+        self.in_flight = {}
+        self.duplicates = 0
+        self.pruned = 0
+        self.lock = Lock()
+
+    def __len__(self):
+        return len(self.heap)
+
+    def push(self, item, repo_id: str, depth: int = 0, weight: int = 0) -> bool:
+        with self.lock:
+            if repo_id is None:
+                return False
+            if self.max_depth is not None and depth > self.max_depth:
+                self.pruned += 1
+                return False
+            if repo_id in self.known:
+                return False
+            self.known.add(repo_id)
+            key = (depth, -weight) if self.priority == 'depth' else (-weight, depth)
+            heapq.heappush(self.heap, (key, next(self.order), repo_id, item, depth, weight))
+            return True
+
+    def pop(self, count: int = BATCH) -> list:
+        # The popped repositories stay active until they are done, to be saved in checkpoints or retried.
+        with self.lock:
+            batch = []
+            while self.heap and len(batch) < count:
+                _, _, repo_id, item, depth, weight = heapq.heappop(self.heap)
+                self.active[repo_id] = (item, depth, weight)
+                batch.append((item, depth))
+            return batch
+
+    def done(self, repo_id: str):
+        with self.lock:
+            self.active.pop(repo_id, None)
+
+    def retry(self):
+        # After an interruption, the unfinished repositories are imported again from scratch.
+        with self.lock:
+            active = self.active
+            self.active = {}
+            self.claimed.clear()
+            self.known.difference_update(active)
+        for repo_id, (item, depth, weight) in active.items():
+            self.push(item, repo_id, depth, weight)
+
+    def pending(self) -> list:
+        with self.lock:
+            return [(item, depth) for item, depth, _ in self.active.values()] + \
+                [(item, depth) for _, _, _, item, depth, _ in sorted(self.heap, key=lambda x: x[:2])]
+
+    def claim(self, repo_id: str) -> bool:
+        # A repository reached from several forks at once is imported by the first one only.
+        with self.lock:
+            if repo_id in self.claimed:
+                self.duplicates += 1
+                return False
+            self.claimed.add(repo_id)
+            return True
+
+    def release(self, repo_id: str):
+        with self.lock:
+            self.claimed.discard(repo_id)
+
+    def coalesce(self, repo_id: str, start):
+        # Imports of a repository already in flight wait for its future instead of fetching it again.
+        with self.lock:
+            future = self.in_flight.get(repo_id)
+            if future is not None:
+                if not future.done():
+                    self.duplicates += 1
+                return future
+            future = self.in_flight[repo_id] = start()
+        future.add_done_callback(lambda _: self._landed(repo_id))
+        return future
+
+    def _landed(self, repo_id: str):
+        with self.lock:
+            self.in_flight.pop(repo_id, None)
+
+    def print_stats(self):
+        print('Fork frontier: {0} duplicate fetches avoided, {1} forks beyond the maximum depth.'.format(
+            self.duplicates, self.pruned))
@@ -2,129 +2,423 @@ import concurrent.futures
 import sys
 import time
 import dateutil
-from datetime import datetime
+from datetime import datetime, timedelta
 from threading import Lock
 from urllib.error import HTTPError
 
 import networkx as nx
 from github import Github, Repository, NamedUser, Commit, PaginatedList, RateLimitExceededException, GithubException
+from github.Requester import Requester, HTTPRequestsConnectionClass, HTTPSRequestsConnectionClass
 
+from reponetwork.CompactGraph import CompactGraph
+from reponetwork.CrawlCheckpoint import CrawlCheckpoint
+from reponetwork.CrawlMetrics import CrawlMetrics
+from reponetwork.ForkFrontier import ForkFrontier
+from reponetwork.GraphBuffer import GraphBuffer, GraphWriter
+from reponetwork.ResponseCache import ResponseCache, mount_cache
+from reponetwork.dates import parse_date
 
-def wait_for_reset(client: Github):
+GRAPHQL_BATCH = 25
+STATS_AUTHORS = 100
+GRAPHQL_REPO_FIELDS = '''
+nameWithOwner isFork createdAt updatedAt pushedAt stargazerCount
+primaryLanguage { name }
+owner { login }
+'''
+GRAPHQL_FORKS = '''
+forks(first: 100, after: $%s) {
+  pageInfo { hasNextPage endCursor }
+  nodes { ''' + GRAPHQL_REPO_FIELDS + ''' }
+}
+'''
+GRAPHQL_REPO = '''
+r%(i)d: repository(owner: $o%(i)d, name: $n%(i)d) {
+''' + GRAPHQL_REPO_FIELDS + '''
+  parent { ''' + GRAPHQL_REPO_FIELDS + ''' }
+  ''' + GRAPHQL_FORKS % 'c%(i)d' + '''
+}
+'''
+
+
+def wait_for_reset(client: Github, metrics: CrawlMetrics = None):
     available, _ = client.rate_limiting
     timestamp = client.rate_limiting_resettime
     if timestamp and available == 0:
         print('Waiting for rate limit reset...')
-        t = timestamp - time.time()
+        start = time.time()
+        t = timestamp - start
         while t > 0:
             mins, secs = divmod(t, 60)
             time_format = 'Remaining {:02.0f}:{:02.0f}'.format(mins, secs)
             print(time_format, end='\r')
             time.sleep(1)
             t = timestamp - time.time()
+        if metrics is not None:
+            metrics.wait('rate_limit', time.time() - start)
+
+
+def connection_classes(cache: ResponseCache = None, metrics: CrawlMetrics = None):
+    def setup(connection):
+        if cache is not None:
+            mount_cache(connection.session, cache, max_retries=connection.retry,
+                        pool_connections=connection.pool_size, pool_maxsize=connection.pool_size)
+        if metrics is not None:
+            connection.session.hooks['response'].append(metrics.hook)
+
+    class HTTPConnection(HTTPRequestsConnectionClass):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            setup(self)
+
+    class HTTPSConnection(HTTPSRequestsConnectionClass):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            setup(self)
+
+    return HTTPConnection, HTTPSConnection
 
 
 class GithubCrawler:
-    def __init__(self, token: str, user: str, password: str):
+    def __init__(self, token: str, user: str, password: str, cache: ResponseCache = None, url: str = None,
+                 graphql: bool = False, max_depth: int = None, priority: str = 'depth', since_commits: str = 'all',
+                 metrics: CrawlMetrics = None):
         assert user is None or isinstance(user, str)
         assert password is None or isinstance(password, str)
         assert token is None or isinstance(token, str)
+        assert cache is None or isinstance(cache, ResponseCache)
+        assert url is None or isinstance(url, str)
+        assert since_commits in ('all', 'until-authors', 'none')
+        assert metrics is None or isinstance(metrics, CrawlMetrics)
+
+        self.cache = cache
+        self.metrics = metrics if metrics is not None else CrawlMetrics()
+        options = dict(login_or_token=token or user, password=password, retry=5, per_page=100)
+        if url:
+            options['base_url'] = url.rstrip('/')
+        # The connections of the client mount the cache and report the responses to the metrics.
+        Requester.injectConnectionClasses(*connection_classes(cache, self.metrics))
+        try:
+            self.client = Github(**options)
+        finally:
+            Requester.resetConnectionClasses()
+        self.use_graphql = graphql
+        self.max_depth = max_depth
+        self.priority = priority
+        self.frontier: ForkFrontier = None
+        self.since_commits = since_commits
+        self.prefetched = {}
+
+    def save_repo(self, repo: Repository) -> dict:
+        return {'id': repo.full_name, 'data': repo._rawData}
+
+    def restore_repo(self, state: dict) -> Repository:
+        return self.make_repo(state['data'])
+
+    def repo_weight(self, repo: Repository) -> int:
+        # Read from the payload, the attribute would fetch incomplete repositories.
+        return repo._rawData.get('watchers_count') or 0
+
+    def make_repo(self, data: dict) -> Repository:
+        # Incomplete objects fetch the attributes missing in the payload when they are used.
+        return Repository.Repository(self.client.requester, {}, data, completed=False)
+
+    def graphql_to_raw(self, node: dict) -> dict:
+        full_name = node['nameWithOwner']
+        data = {
+            'full_name': full_name,
+            'name': full_name.split('/', 1)[1],
+            'fork': node['isFork'],
+            'owner': {'login': node['owner']['login']} if node.get('owner') else None,
+            'language': (node.get('primaryLanguage') or {}).get('name'),
+            'watchers_count': node.get('stargazerCount'),
+            'stargazers_count': node.get('stargazerCount'),
+            'created_at': node.get('createdAt'),
+            'updated_at': node.get('updatedAt'),
+            'pushed_at': node.get('pushedAt'),
+            'url': '{0}/repos/{1}'.format(self.client.requester.base_url, full_name),
+        }
+        if node.get('parent'):
+            data['parent'] = self.graphql_to_raw(node['parent'])
+        return data
+
+    def graphql(self, query: str, variables: dict) -> dict:
+        _, data = self.client.requester.requestJsonAndCheck(
+            'POST', self.client.requester.graphql_url, input={'query': query, 'variables': variables})
+        # Missing repositories are reported as errors, the rest of the batch is still valid.
+        return data.get('data') or {}
+
+    def prefetch(self, repos: list):
+        names = [x.full_name for x in repos if x.full_name and x.full_name not in self.prefetched]
+        for i in range(0, len(names), GRAPHQL_BATCH):
+            batch = names[i:i + GRAPHQL_BATCH]
+            variables = {}
+            for j, name in enumerate(batch):
+                variables['o{0}'.format(j)], variables['n{0}'.format(j)] = name.split('/', 1)
+                variables['c{0}'.format(j)] = None
+            query = 'query({0}) {{ {1} }}'.format(
+                ', '.join('$o{0}: String!, $n{0}: String!, $c{0}: String'.format(j) for j in range(len(batch))),
+                ''.join(GRAPHQL_REPO % {'i': j} for j in range(len(batch))))
+            try:
+                data = self.graphql(query, variables)
+            except RateLimitExceededException:
+                raise
+            except GithubException:
+                # The REST API imports the batch instead.
+                print('GraphQL query failed, the batch is fetched from the REST API.')
+                continue
+
+            pending = {}
+            for j, name in enumerate(batch):
+                node = data.get('r{0}'.format(j))
+                if not node:
+                    continue
+                repo = self.graphql_to_raw(node)
+                forks = self.graphql_forks(repo, node['forks'])
+                self.prefetched[name] = {'repo': repo, 'forks': forks}
+                if node['forks']['pageInfo']['hasNextPage']:
+                    pending[name] = node['forks']['pageInfo']['endCursor']
+            self.prefetch_forks(pending)
+
+    def prefetch_forks(self, pending: dict):
+        while pending:
+            batch = list(pending.items())[:GRAPHQL_BATCH]
+            variables = {}
+            for j, (name, cursor) in enumerate(batch):
+                variables['o{0}'.format(j)], variables['n{0}'.format(j)] = name.split('/', 1)
+                variables['c{0}'.format(j)] = cursor
+            query = 'query({0}) {{ {1} }}'.format(
+                ', '.join('$o{0}: String!, $n{0}: String!, $c{0}: String'.format(j) for j in range(len(batch))),
+                ''.join('f{0}: repository(owner: $o{0}, name: $n{0}) {{ {1} }}'.format(
+                    j, GRAPHQL_FORKS % 'c{0}'.format(j)) for j in range(len(batch))))
+            try:
+                data = self.graphql(query, variables)
+            except RateLimitExceededException:
+                raise
+            except GithubException:
+                data = {}
+            for j, (name, _) in enumerate(batch):
+                del pending[name]
+                node = data.get('f{0}'.format(j))
+                if not node:
+                    # The fork list could not be completed, let the REST API build it.
+                    self.prefetched[name]['forks'] = None
+                    continue
+                prefetched = self.prefetched[name]
+                prefetched['forks'].extend(self.graphql_forks(prefetched['repo'], node['forks']))
+                if node['forks']['pageInfo']['hasNextPage']:
+                    pending[name] = node['forks']['pageInfo']['endCursor']
+
+    def graphql_forks(self, repo: dict, forks: dict) -> list:
+        parent = {'full_name': repo['full_name'], 'url': repo['url']}
+        return [dict(self.graphql_to_raw(x), parent=parent) for x in forks['nodes']]
+
+    def import_repo(self, item: Repository, since: datetime, claim, release):
+        # Returns the item, the forks and the buffers of the repository and of its missing parents.
+        # The missing parents are walked in a loop, so deep fork chains do not grow the stack.
+        repo_id = item.full_name
+        if repo_id is None or not claim(repo_id):
+            self.prefetched.pop(repo_id, None)
+            return item, [], []
+
+        parent, repo_forks, buffer = self.import_one(item, since, release)
+        buffers = [buffer] if buffer is not None else []
+        while parent is not None and parent.full_name is not None:
+            if not claim(parent.full_name):
+                self.prefetched.pop(parent.full_name, None)
+                break
+            parent, forks, buffer = self.import_one(parent, since, release)
+            repo_forks.extend(forks)
+            if buffer is not None:
+                buffers.append(buffer)
+        buffers.reverse()
+        return item, repo_forks, buffers
+
+    def import_one(self, repo: Repository, since: datetime, release):
+        # Returns the parent still to import, the forks and the buffer of the repository.
+        repo_id = repo.full_name
+        prefetched = self.prefetched.pop(repo_id, None)
+        if prefetched is not None:
+            repo = self.make_repo(prefetched['repo'])
+
+        parent = None
+        buffer = GraphBuffer(repo_id)
+        if repo.fork and repo.parent and repo.parent.full_name and repo.owner:
+            parent = repo.parent
+            buffer.link_user(parent.full_name, repo.owner.login, relation='fork', fork_source=repo_id, date=repo.created_at.isoformat())
+
+        language = repo.language or '?'
+        weight = repo.watchers_count or 0
+        buffer.add_repo(bipartite=0, language=language, weight=weight, date=repo.updated_at.isoformat())
+
+        repo_forks = []
+        try:
+            if since is None:
+                if repo.owner is not None:
+                    buffer.link_user(repo_id, repo.owner.login, relation='owner', date=repo.pushed_at.isoformat())
 
-        self.client = Github(login_or_token=token or user, password=password, retry=5, per_page=100)
+                contributors = repo.get_contributors()
+                for user in contributors:
+                    buffer.link_user(repo_id, user.login or user.email, relation='contributor')
+            else:
+                for user_id, date in self.committers(repo, since):
+                    buffer.link_user(repo_id, user_id, relation="committer", date=date.isoformat())
 
-    def find(self, query: str, limit: int = None, since: datetime = None, previous: nx.Graph = None):
+            if prefetched is not None and prefetched['forks'] is not None:
+                repo_forks = [self.make_repo(x) for x in prefetched['forks']]
+            else:
+                repo_forks = list(repo.get_forks())
+        except RateLimitExceededException:
+            release(repo_id)
+            raise
+        except GithubException:
+            release(repo_id)
+            return parent, [], None
+        except Exception:
+            raise
+
+        return parent, repo_forks, buffer
+
+    def active_authors(self, repo: Repository, since: datetime) -> dict:
+        # Authors with commits since the date and the week of their first one, from a single request.
+        stats = repo.get_stats_contributors()
+        if stats is None or len(stats) >= STATS_AUTHORS:
+            # Still being computed by GitHub, or limited to the top contributors.
+            return None
+        since = parse_date(since)
+        authors = {}
+        for stat in stats:
+            for week in stat.weeks:
+                if stat.author is not None and week.c and week.w + timedelta(weeks=1) > since:
+                    authors[stat.author.login] = max(week.w, since)
+                    break
+        return authors
+
+    def committers(self, repo: Repository, since: datetime) -> list:
+        # Returns each author with the date of its first commit since the given one, oldest first. Only the
+        # earliest date of each author is kept, so the memory does not grow with the length of the history.
+        authors = self.active_authors(repo, since) if self.since_commits != 'all' else None
+        if authors is not None and self.since_commits == 'none':
+            return sorted(authors.items(), key=lambda t: t[1])
+
+        missing = set(authors) if authors is not None else None
+        earliest = {}
+        for page in self.pages(repo.get_commits(since=since), reverse=authors is not None):
+            for commit in page:
+                if not commit.author or not commit.commit.author:
+                    continue
+                user_id = commit.author.login or commit.author.email
+                date: datetime = commit.commit.author.date
+                if user_id not in earliest or date < earliest[user_id]:
+                    earliest[user_id] = date
+                if missing is not None:
+                    missing.discard(user_id)
+            if missing is not None and not missing:
+                # Oldest first, the list can stop as soon as every author has been seen.
+                break
+        return sorted(earliest.items(), key=lambda t: t[1])
+
+    def pages(self, items: PaginatedList, reverse: bool = False):
+        # Yields the pages one at a time, from the last one to the first when reversed. Iterating the
+        # PaginatedList would keep every item it has fetched.
+        per_page = self.client.per_page
+        if reverse:
+            for page in range((items.totalCount - 1) // per_page, -1, -1):
+                yield items.get_page(page)[::-1]
+            return
+        page = 0
+        while True:
+            data = items.get_page(page)
+            yield data
+            if len(data) < per_page:
+                break
+            page += 1
+
+    def find(self, query: str, limit: int = None, since: datetime = None, previous: nx.Graph = None,
+             checkpoint: CrawlCheckpoint = None):
         assert query is None or isinstance(query, str)
         assert limit is None or isinstance(limit, int) and limit >= 0
         assert since is None or isinstance(since, datetime)
-        assert previous is None or isinstance(previous, nx.Graph)
+        assert previous is None or isinstance(previous, (nx.Graph, CompactGraph))
+        assert checkpoint is None or isinstance(checkpoint, CrawlCheckpoint)
 
-        g = previous or nx.Graph()
+        g = previous if previous is not None else nx.Graph()
         graph_lock = Lock()
+        writer = GraphWriter(g)
+        frontier = self.frontier = ForkFrontier(self.max_depth, self.priority)
         completed = False
         repos: PaginatedList = self.client.search_repositories(query) if query else self.client.get_repos(since=since)
-        page = 1
-        page_repos = []
+        page = 0
         count = 0
+        if checkpoint is not None:
+            checkpoint.query = query
+            checkpoint.since = since
+            if checkpoint.page is not None:
+                page = checkpoint.page
+                count = checkpoint.count
+                for x in checkpoint.frontier:
+                    item = self.restore_repo(x)
+                    frontier.push(item, x['id'], x.get('depth', 0), self.repo_weight(item))
+            writer.deferred = checkpoint.deferred
+
+        def save_checkpoint():
+            with self.metrics.locked(graph_lock, 'graph'):
+                checkpoint.update(page, count, [dict(self.save_repo(x), depth=depth) for x, depth in frontier.pending()],
+                                  writer.deferred)
+                checkpoint.save(g)
+
+        def claim(repo_id: str) -> bool:
+            with self.metrics.locked(graph_lock, 'graph'):
+                if repo_id in g or checkpoint is not None and repo_id in checkpoint.completed:
+                    return False
+            return frontier.claim(repo_id)
+
         while not completed:
-            wait_for_reset(self.client)
-
-            def link_user(repo_id: str, user_id: str, **attr):
-                if user_id is None:
-                    return
-                with graph_lock:
-                    if user_id not in g:
-                        g.add_node(user_id, bipartite=1)
-                    if (user_id, repo_id) not in g.edges:
-                        g.add_edge(user_id, repo_id, **attr)
-
-            def import_repo(repo: Repository):
-                repo_id = repo.full_name
-                if repo_id is None:
-                    return repo, []
-
-                with graph_lock:
-                    if repo_id in g:
-                        return repo, []
-
-                if repo.fork and repo.parent and repo.parent.full_name and repo.owner:
-                    import_repo(repo.parent)
-                    link_user(repo.parent.full_name, repo.owner.login, relation='fork', fork_source=repo_id, date=repo.created_at.isoformat())
-
-                language = repo.language or '?'
-                weight = repo.watchers_count or 0
-                with graph_lock:
-                    g.add_node(repo_id, bipartite=0, language=language, weight=weight, date=repo.updated_at.isoformat())
-
-                repo_forks = []
-                try:
-                    if since is None:
-                        if repo.owner is not None:
-                            link_user(repo_id, repo.owner.login, relation='owner', date=repo.pushed_at.isoformat())
-
-                        contributors = repo.get_contributors()
-                        for user in contributors:
-                            link_user(repo_id, user.login or user.email, relation='contributor')
-                    else:
-                        commits = [x for x in repo.get_commits(since=since) if x.author and x.commit.author]
-                        commits = sorted(commits, key=lambda x: x.commit.author.date)
-                        for commit in commits:
-                            date: datetime = commit.commit.author.date
-                            link_user(repo_id, commit.author.login or commit.author.email, relation="committer", date=date.isoformat())
-
-                    repo_forks = list(repo.get_forks())
-                except RateLimitExceededException:
-                    with graph_lock:
-                        g.remove_node(repo_id)
-                    raise
-                except GithubException:
-                    with graph_lock:
-                        g.remove_node(repo_id)
-                except Exception:
-                    raise
-
-                return repo, repo_forks
+            wait_for_reset(self.client, self.metrics)
+
+            frontier.retry()
 
             try:
                 print('Finding more repositories.')
                 with concurrent.futures.ThreadPoolExecutor(max_workers=20) as executor:
                     while not limit or count < limit:
-                        if not page_repos:
+                        if not frontier:
                             page_repos = repos.get_page(page)
                             page += 1
                             if len(page_repos) == 0:
                                 break
+                            for x in page_repos:
+                                frontier.push(x, x.full_name, 0, self.repo_weight(x))
 
-                        workers = (executor.submit(import_repo, worker) for worker in page_repos)
+                        batch = frontier.pop()
+                        if self.use_graphql:
+                            self.prefetch([x for x, _ in batch if x.full_name not in g])
+                        workers = {executor.submit(self.import_repo, x, since, claim, frontier.release): depth
+                                   for x, depth in batch}
 
+                        error = None
                         for worker in concurrent.futures.as_completed(workers):
                             repo: Repository
                             repo_forks: [Repository]
-                            repo, repo_forks = worker.result()
-                            if repo is not None:
-                                print('Analyzed repo {0}.'.format(repo.full_name or '?'))
-                                page_repos.remove(repo)
-                                count += 1
-                                page_repos.extend(repo_forks)
+                            try:
+                                repo, repo_forks, buffers = worker.result()
+                            except RateLimitExceededException as e:
+                                # Keep merging the repositories that were completed before the limit was hit.
+                                error = e
+                                continue
+                            with self.metrics.locked(graph_lock, 'graph'):
+                                writer.merge(buffers)
+                            print('Analyzed repo {0}.'.format(repo.full_name))
+                            self.metrics.repo()
+                            frontier.done(repo.full_name)
+                            count += 1
+                            for x in repo_forks:
+                                frontier.push(x, x.full_name, workers[worker] + 1, self.repo_weight(x))
+                            if checkpoint is not None:
+                                checkpoint.completed.update(x.repo_id for x in buffers if x.repo is not None)
+                                if checkpoint.due():
+                                    save_checkpoint()
+                        if error is not None:
+                            raise error
                 completed = True
 
             except HTTPError:
@@ -140,4 +434,12 @@ class GithubCrawler:
                 print(sys.exc_info())
                 print('Communication error with GitHub. Graph completed prematurely.')
 
-            yield g
\ No newline at end of file
+            frontier.print_stats()
+            if completed:
+                with self.metrics.locked(graph_lock, 'graph'):
+                    dropped = writer.flush()
+                if dropped:
+                    print('Dropped {0} links to repositories that were not imported.'.format(dropped))
+            if checkpoint is not None:
+                save_checkpoint()
+            yield g
@@ -1,38 +1,121 @@
 import concurrent.futures
 import sys
 from datetime import datetime
-import dateutil
 from threading import Lock
 from urllib.error import HTTPError
 
 import networkx as nx
 from gitlab import Gitlab, GitlabGetError, GitlabListError, GitlabError
+from gitlab.v4.objects import Project
+
+from reponetwork.CompactGraph import CompactGraph
+from reponetwork.CrawlCheckpoint import CrawlCheckpoint
+from reponetwork.CrawlMetrics import CrawlMetrics
+from reponetwork.ForkFrontier import ForkFrontier
+from reponetwork.GraphBuffer import GraphBuffer, GraphWriter
+from reponetwork.ResponseCache import ResponseCache, mount_cache
+from reponetwork.dates import parse_date
+
+REPO_ATTRIBUTES = ('path_with_namespace', 'namespace', 'star_count', 'created_at', 'last_activity_at')
+GRAPHQL_BATCH = 50
+LANGUAGES_QUERY = '''
+query($paths: [String!]) {
+  projects(fullPaths: $paths, first: 50) {
+    nodes { fullPath languages { name share } }
+  }
+}
+'''
 
 
 class GitlabCrawler:
-    def __init__(self, url: str, token: str, user: str, password: str):
+    def __init__(self, url: str, token: str, user: str, password: str, cache: ResponseCache = None,
+                 max_depth: int = None, priority: str = 'depth', metrics: CrawlMetrics = None):
         assert url is None or isinstance(url, str)
         assert user is None or isinstance(user, str)
         assert password is None or isinstance(password, str)
         assert token is None or isinstance(token, str)
+        assert cache is None or isinstance(cache, ResponseCache)
+        assert metrics is None or isinstance(metrics, CrawlMetrics)
 
         url = url or 'https://gitlab.com/'
+        self.cache = cache
+        self.metrics = metrics if metrics is not None else CrawlMetrics()
         if token:
             self.client = Gitlab(url, private_token=token)
         else:
             self.client = Gitlab(url, email=user, password=password)
-            if user and password:
-                self.client.auth()
+        if cache is not None:
+            mount_cache(self.client.session, cache)
+        self.client.session.hooks['response'].append(self.metrics.hook)
+        if not token and user and password:
+            self.client.auth()
+        self.graphql = True
+        self.languages = {}
+        self.max_depth = max_depth
+        self.priority = priority
+        self.frontier: ForkFrontier = None
+
+    def save_repo(self, repo: Project) -> dict:
+        return {'id': repo.path_with_namespace, 'data': repo.attributes}
+
+    def restore_repo(self, state: dict) -> Project:
+        return Project(self.client.projects, state['data'])
 
-    def find(self, query: str, limit: int = None, since: datetime = None, previous: nx.Graph = None):
+    def repo_weight(self, repo: Project) -> int:
+        return repo.attributes.get('star_count') or 0
+
+    def complete_repo(self, repo: Project) -> Project:
+        if all(x in repo.attributes for x in REPO_ATTRIBUTES):
+            return repo
+        return self.client.projects.get(repo.attributes.get('id') or repo.path_with_namespace)
+
+    def fork_repo(self, parent: Project, fork) -> Project:
+        attributes = dict(fork.attributes)
+        if not attributes.get('forked_from_project'):
+            attributes['forked_from_project'] = {'id': parent.id, 'path_with_namespace': parent.path_with_namespace}
+        return Project(self.client.projects, attributes)
+
+    def prefetch_languages(self, repos: list):
+        paths = [x.path_with_namespace for x in repos if x.path_with_namespace not in self.languages]
+        for i in range(0, len(paths) if self.graphql else 0, GRAPHQL_BATCH):
+            batch = paths[i:i + GRAPHQL_BATCH]
+            try:
+                result = self.client.http_post(self.client.url.rstrip('/') + '/api/graphql',
+                                               post_data={'query': LANGUAGES_QUERY, 'variables': {'paths': batch}})
+                nodes = result['data']['projects']['nodes']
+            except (GitlabError, KeyError, TypeError):
+                self.graphql = False
+                return
+            for node in nodes:
+                languages = node.get('languages') or []
+                self.languages[node['fullPath']] = max(languages, key=lambda t: t['share'])['name'] \
+                    if len(languages) > 0 else '?'
+
+    def repo_language(self, repo: Project) -> str:
+        language = self.languages.get(repo.path_with_namespace)
+        if language is None:
+            languages = repo.languages()
+            language = sorted(languages.items(), key=lambda t: t[1], reverse=True)[0][0] \
+                if len(languages) > 0 else '?'
+            self.languages[repo.path_with_namespace] = language
+        return language
+
+    def find(self, query: str, limit: int = None, since: datetime = None, previous: nx.Graph = None,
+             checkpoint: CrawlCheckpoint = None):
         assert query is None or isinstance(query, str)
         assert limit is None or isinstance(limit, int) and limit >= 0
         assert since is None or isinstance(since, datetime)
-        assert previous is None or isinstance(previous, nx.Graph)
+        assert previous is None or isinstance(previous, (nx.Graph, CompactGraph))
+        assert checkpoint is None or isinstance(checkpoint, CrawlCheckpoint)
 
-        g = previous or nx.Graph()
+        g = previous if previous is not None else nx.Graph()
+        if checkpoint is not None:
+            checkpoint.query = query
+            checkpoint.since = since
         since = since.isoformat() if since else None
         graph_lock = Lock()
+        writer = GraphWriter(g)
+        frontier = self.frontier = ForkFrontier(self.max_depth, self.priority)
         completed = False
         query_params = dict()
         if since:
@@ -41,100 +124,141 @@ class GitlabCrawler:
             query_params['search'] = query
         repos = self.client.projects
         page = 1
-        page_repos = []
         count = 0
-        while not completed:
-            obey_rate_limit = True
+        if checkpoint is not None and checkpoint.page is not None:
+            page = checkpoint.page
+            count = checkpoint.count
+            for x in checkpoint.frontier:
+                item = self.restore_repo(x)
+                frontier.push(item, x['id'], x.get('depth', 0), self.repo_weight(item))
+            writer.deferred = checkpoint.deferred
 
-            def link_user(repo_id: str, user_id: str, **attr):
-                if user_id is None:
-                    return
-                with graph_lock:
-                    if user_id not in g:
-                        g.add_node(user_id, bipartite=1)
-                    if (user_id, repo_id) not in g.edges:
-                        g.add_edge(user_id, repo_id, **attr)
-
-            def import_repo(repo):
-                repo_id = repo.path_with_namespace
-                if repo_id is None:
-                    return repo, []
-
-                with graph_lock:
-                    if repo_id in g:
-                        return repo, []
-
-                if 'forked_from_project' in repo.attributes:
-                    d = repo.attributes['forked_from_project']
-                    if d:
-                        parent_id = d['path_with_namespace']
-                        parent = repos.get(parent_id)
-                        import_repo(parent)
-                        link_user(parent_id, repo.namespace['name'], relation='fork', fork_source=repo_id, date=repo.created_at)
-
-                languages = repo.languages() if hasattr(repo, 'languages') else []
-                language = sorted(languages.items(), key=lambda t: t[1], reverse=True)[0][0] \
-                    if len(languages) > 0 else '?'
-                weight = repo.star_count or 0
-                with graph_lock:
-                    g.add_node(repo_id, bipartite=0, language=language, weight=weight, date=repo.last_activity_at)
-
-                repo_forks = []
-                try:
-                    if since is None:
-                        if repo.namespace is not None:
-                            link_user(repo_id, repo.namespace['name'], relation='owner', date=repo.created_at)
-
-                        contributors = repo.repository_contributors(all=True, obey_rate_limit=False)
-                        for user in contributors:
-                            user_id = user.get('name')
-                            if not user_id or user_id.lower() == 'unknown':
-                                user_id = user['email']
-                            link_user(repo_id, user_id, relation='contributor')
-                    else:
-                        commits = repo.commits.list(all=True, since=since, obey_rate_limit=False)
-                        commits = sorted(commits, key=lambda x: dateutil.parser.parse(x.created_at))
-                        for commit in commits:
-                            user_id = commit.author_name
-                            if not user_id or user_id.lower() == 'unknown':
-                                user_id = commit.author_email
-                            date = commit.created_at
-                            link_user(repo_id, user_id, relation="committer", date=date)
-
-                    repo_forks = [self.client.projects.get(fork.id) for fork in repo.forks.list(all=True, obey_rate_limit=False)]
-                except GitlabError:
-                    with graph_lock:
-                        g.remove_node(repo_id)
-                    error: GitlabError
-                    _, error, _ = sys.exc_info()
-                    if error.response_code == 429:
-                        raise
-                except Exception:
+        def save_checkpoint():
+            with self.metrics.locked(graph_lock, 'graph'):
+                checkpoint.update(page, count, [dict(self.save_repo(x), depth=depth) for x, depth in frontier.pending()],
+                                  writer.deferred)
+                checkpoint.save(g)
+
+        def claim(repo_id: str) -> bool:
+            with self.metrics.locked(graph_lock, 'graph'):
+                if repo_id in g or checkpoint is not None and repo_id in checkpoint.completed:
+                    return False
+            return frontier.claim(repo_id)
+
+        def import_one(repo_id: str, item: Project):
+            # Returns the parent still to import, the forks and the buffer of the repository.
+            repo = self.complete_repo(item)
+            parent_id = None
+            buffer = GraphBuffer(repo_id)
+            d = repo.attributes.get('forked_from_project')
+            if d:
+                parent_id = d['path_with_namespace']
+                buffer.link_user(parent_id, repo.namespace['name'], relation='fork', fork_source=repo_id, date=repo.created_at)
+
+            language = self.repo_language(repo)
+            weight = repo.star_count or 0
+            buffer.add_repo(bipartite=0, language=language, weight=weight, date=repo.last_activity_at)
+
+            repo_forks = []
+            try:
+                if since is None:
+                    if repo.namespace is not None:
+                        buffer.link_user(repo_id, repo.namespace['name'], relation='owner', date=repo.created_at)
+
+                    contributors = repo.repository_contributors(all=True, obey_rate_limit=False)
+                    for user in contributors:
+                        user_id = user.get('name')
+                        if not user_id or user_id.lower() == 'unknown':
+                            user_id = user['email']
+                        buffer.link_user(repo_id, user_id, relation='contributor')
+                else:
+                    # The pages are read one at a time and only the first commit of each author is kept.
+                    earliest = {}
+                    for commit in repo.commits.list(iterator=True, since=since, per_page=100,
+                                                        obey_rate_limit=False):
+                        user_id = commit.author_name
+                        if not user_id or user_id.lower() == 'unknown':
+                            user_id = commit.author_email
+                        date = parse_date(commit.created_at)
+                        if user_id not in earliest or date < earliest[user_id][0]:
+                            earliest[user_id] = (date, commit.created_at)
+                    for user_id, (_, date) in sorted(earliest.items(), key=lambda t: t[1][0]):
+                        buffer.link_user(repo_id, user_id, relation="committer", date=date)
+
+                repo_forks = [self.fork_repo(repo, fork) for fork in repo.forks.list(all=True, obey_rate_limit=False)]
+            except GitlabError:
+                frontier.release(repo_id)
+                error: GitlabError
+                _, error, _ = sys.exc_info()
+                if error.response_code == 429:
                     raise
+                return parent_id, [], None
+            except Exception:
+                raise
+
+            return parent_id, repo_forks, buffer
+
+        def import_repo(item):
+            # The missing parents are walked in a loop, so deep fork chains do not grow the stack.
+            repo_id = item.path_with_namespace
+            if repo_id is None or not claim(repo_id):
+                return item, [], []
+
+            parent_id, repo_forks, buffer = import_one(repo_id, item)
+            buffers = [buffer] if buffer is not None else []
+            while parent_id is not None and claim(parent_id):
+                parent_id, forks, buffer = import_one(parent_id, repos.get(parent_id))
+                repo_forks.extend(forks)
+                if buffer is not None:
+                    buffers.append(buffer)
+            buffers.reverse()
+            return item, repo_forks, buffers
+
+        while not completed:
+            obey_rate_limit = True
 
-                return repo, repo_forks
+            frontier.retry()
 
             try:
                 print('Finding more repositories.')
                 with concurrent.futures.ThreadPoolExecutor(max_workers=20) as executor:
                     while not limit or count < limit:
-                        if not page_repos:
+                        if not frontier:
                             page_repos = repos.list(page=page, per_page=30, obey_rate_limit=obey_rate_limit,
                                                     query_parameters=query_params)
                             obey_rate_limit = False
                             page += 1
                             if len(page_repos) == 0:
                                 break
+                            for x in page_repos:
+                                frontier.push(x, x.path_with_namespace, 0, self.repo_weight(x))
 
-                        workers = (executor.submit(import_repo, worker) for worker in page_repos)
+                        batch = frontier.pop()
+                        self.prefetch_languages([x for x, _ in batch])
+                        workers = {executor.submit(import_repo, x): depth for x, depth in batch}
 
+                        error = None
                         for worker in concurrent.futures.as_completed(workers):
-                            repo, repo_forks = worker.result()
-                            if repo is not None:
-                                print('Analyzed repo {0}.'.format(repo.path_with_namespace or '?'))
-                                page_repos.remove(repo)
-                                count += 1
-                                page_repos.extend(repo_forks)
+                            try:
+                                repo, repo_forks, buffers = worker.result()
+                            except GitlabError as e:
+                                # Keep merging the repositories that were completed before the limit was hit.
+                                error = e
+                                continue
+                            with self.metrics.locked(graph_lock, 'graph'):
+                                writer.merge(buffers)
+                            print('Analyzed repo {0}.'.format(repo.path_with_namespace))
+                            self.metrics.repo()
+                            frontier.done(repo.path_with_namespace)
+                            count += 1
+                            for x in repo_forks:
+                                frontier.push(x, x.path_with_namespace, workers[worker] + 1, self.repo_weight(x))
+                            if checkpoint is not None:
+                                checkpoint.completed.update(x.repo_id for x in buffers if x.repo is not None)
+                                if checkpoint.due():
+                                    save_checkpoint()
+                        if error is not None:
+                            raise error
                 completed = True
 
             except HTTPError:
@@ -148,4 +272,12 @@ class GitlabCrawler:
                 if error.response_code == 429:
                     print('The GitLab rate limit was triggered. Please try again later. ')
 
-            yield g
\ No newline at end of file
+            frontier.print_stats()
+            if completed:
+                with self.metrics.locked(graph_lock, 'graph'):
+                    dropped = writer.flush()
+                if dropped:
+                    print('Dropped {0} links to repositories that were not imported.'.format(dropped))
+            if checkpoint is not None:
+                save_checkpoint()
+            yield g
@@ -0,0 +1,71 @@
+import networkx as nx
+
+from reponetwork.CompactGraph import CompactGraph
+
+
+class GraphBuffer:
+    __slots__ = ('repo_id', 'repo', 'links')
+
+    def __init__(self, repo_id: str):
+        self.repo_id = repo_id
+        self.repo: dict = None
+        self.links = {}
+
+    def add_repo(self, **attr):
+        self.repo = attr
+
+    def link_user(self, repo_id: str, user_id: str, **attr):
+        if user_id is None:
+            return
+        users = self.links.get(repo_id)
+        if users is None:
+            users = self.links[repo_id] = {}
+        if user_id not in users:
+            users[user_id] = attr
+
+    def dump(self) -> dict:
+        return {'repo_id': self.repo_id, 'repo': self.repo, 'links': self.links}
+
+    @staticmethod
+    def load(state: dict) -> 'GraphBuffer':
+        buffer = GraphBuffer(state['repo_id'])
+        buffer.repo = state['repo']
+        buffer.links = state['links']
+        return buffer
+
+
+class GraphWriter:
+    def __init__(self, g: nx.Graph):
+        assert isinstance(g, (nx.Graph, CompactGraph))
+
+        self.g = g
+        # Links to repositories not merged yet, by repository.
+        self.deferred = {}
+
+    def merge(self, buffers: list):
+        g = self.g
+        for buffer in buffers:
+            if buffer.repo is not None:
+                g.add_node(buffer.repo_id, **buffer.repo)
+                for user_id, attr in self.deferred.pop(buffer.repo_id, {}).items():
+                    buffer.link_user(buffer.repo_id, user_id, **attr)
+            for repo_id, users in buffer.links.items():
+                if repo_id not in g:
+                    # The repository is still being imported by another worker.
+                    deferred = self.deferred.setdefault(repo_id, {})
+                    for user_id, attr in users.items():
+                        deferred.setdefault(user_id, attr)
+                    continue
+                linked = set(g.adj[repo_id])
+                g.add_nodes_from((u for u in users if u not in g), bipartite=1)
+                if linked:
+                    g.add_edges_from((u, repo_id, d) for u, d in users.items() if u not in linked)
+                else:
+                    g.add_edges_from((u, repo_id, d) for u, d in users.items())
+
+    def flush(self) -> int:
+        # At the end of the crawl, the links to the repositories that were never merged, because their import failed
+        # or the crawl was limited, are dropped.
+        dropped = sum(len(x) for x in self.deferred.values())
+        self.deferred.clear()
+        return dropped
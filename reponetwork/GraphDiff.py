@@ -0,0 +1,131 @@
+import collections
+import hashlib
+import itertools
+import json
+
+import networkx as nx
+
+from reponetwork.CompactGraph import CompactGraph
+from reponetwork.GraphStore import GEXF_NODE_ATTRIBUTES
+
+# Attributes compared by the structural fingerprints, with the defaults of the matchers of analize_graph.
+NODE_MATCH = (('bipartite', 0), ('language', '?'))
+EDGE_MATCH = ('relation', 'contributor')
+WL_ITERATIONS = 2
+
+
+def digest(data: bytes) -> bytes:
+    return hashlib.blake2b(data, digest_size=8).digest()
+
+
+def wl_hashes(nodes: dict, edges: list, iterations: int = WL_ITERATIONS) -> dict:
+    # Weisfeiler-Lehman subtree hashes: each node starts from the digest of its compared attributes and at each
+    # iteration adds the sorted labels of its neighbours with the relation of the edges to them. Equal hashes mean
+    # equal neighbourhoods up to that many hops. Labels are bytes, joined without any formatting.
+    attributes = {n: tuple(d.get(k, default) for k, default in NODE_MATCH) for n, d in nodes.items()}
+    initial = {a: digest(repr(a).encode()) for a in set(attributes.values())}
+    labels = {n: initial[a] for n, a in attributes.items()}
+    relations = {r: digest(repr(r).encode()) for r in {r for u, v, r in edges}}
+    edges = [(u, v, relations[r]) for u, v, r in edges]
+    for _ in range(iterations):
+        neighbours = {n: [] for n in labels}
+        for u, v, r in edges:
+            neighbours[u].append(r + labels[v])
+            neighbours[v].append(r + labels[u])
+        labels = {n: digest(label + b''.join(sorted(neighbours[n]))) for n, label in labels.items()}
+    return labels
+
+
+def fingerprint(hashes: dict) -> str:
+    # Isomorphic graphs with the same attributes have the same multiset of hashes.
+    return hashlib.blake2b(b''.join(sorted(hashes.values())), digest_size=16).hexdigest()
+
+
+class GraphDiff:
+    def __init__(self, old: nx.Graph, new: nx.Graph, iterations: int = WL_ITERATIONS):
+        assert isinstance(old, (nx.Graph, CompactGraph))
+        assert isinstance(new, (nx.Graph, CompactGraph))
+        assert isinstance(iterations, int) and iterations >= 0
+
+        old_nodes = dict(old.nodes(data=True))
+        new_nodes = dict(new.nodes(data=True))
+        old_edges = list(old.edges(data=EDGE_MATCH[0], default=EDGE_MATCH[1]))
+        new_edges = list(new.edges(data=EDGE_MATCH[0], default=EDGE_MATCH[1]))
+        old_hashes = wl_hashes(old_nodes, old_edges, iterations)
+        new_hashes = wl_hashes(new_nodes, new_edges, iterations)
+        self.fingerprints = (fingerprint(old_hashes), fingerprint(new_hashes))
+        self.similar = self.fingerprints[0] == self.fingerprints[1]
+
+        old_repos = {n for n, d in old_nodes.items() if d.get('bipartite') == 0}
+        new_repos = {n for n, d in new_nodes.items() if d.get('bipartite') == 0}
+        self.repos = (sorted(old_repos.difference(new_nodes)), sorted(new_repos.difference(old_nodes)))
+        self.users = (sorted(n for n in old_nodes if n not in new_nodes and n not in old_repos),
+                      sorted(n for n in new_nodes if n not in old_nodes and n not in new_repos))
+
+        common = [n for n in new_nodes if n in old_nodes]
+        self.languages = {n: (old_nodes[n].get('language'), new_nodes[n].get('language')) for n in common
+                          if n in new_repos and old_nodes[n].get('language') != new_nodes[n].get('language')}
+        # The attributes generated by the GEXF reader are not compared: only one of the snapshots may come from GEXF.
+        self.attributes = collections.Counter(k for n in common if old_nodes[n] != new_nodes[n]
+                                              for k in set(old_nodes[n]) | set(new_nodes[n])
+                                              if k not in GEXF_NODE_ATTRIBUTES and
+                                              old_nodes[n].get(k) != new_nodes[n].get(k))
+        # Nodes in both graphs whose neighbourhood changed, up to the number of iterations of the hashes.
+        self.neighbourhoods = sum(1 for n in common if old_hashes[n] != new_hashes[n])
+
+        def memberships(edges: list, repos: set) -> dict:
+            # The repository first, whatever the direction in which the edge was added.
+            return {(v, u) if v in repos else (u, v): r for u, v, r in edges}
+
+        old_edges = memberships(old_edges, old_repos)
+        new_edges = memberships(new_edges, new_repos)
+        self.memberships = (sorted((e + (r,) for e, r in old_edges.items() if e not in new_edges), key=str),
+                            sorted((e + (r,) for e, r in new_edges.items() if e not in old_edges), key=str))
+        self.relations = {e: (old_edges[e], r) for e, r in new_edges.items() if e in old_edges and old_edges[e] != r}
+
+        def ranks(g: nx.Graph, repos: set) -> dict:
+            # The degree centrality ranking of the repositories, the first one reported by analize_graph.
+            degree = g.degree
+            return {n: i + 1 for i, n in enumerate(sorted(repos, key=lambda n: (-degree[n], str(n))))}
+
+        self.ranks = (ranks(old, old_repos), ranks(new, new_repos))
+
+    def rank_changes(self, limit: int) -> list:
+        # The repositories in the top of either ranking whose rank changed, the largest changes first.
+        old, new = self.ranks
+        top = {n for ranking in self.ranks for n, rank in ranking.items() if rank <= limit}
+        changes = [(n, old.get(n), new.get(n)) for n in top if old.get(n) != new.get(n)]
+        return sorted(changes, key=lambda t: (-abs((t[1] or len(old) + 1) - (t[2] or len(new) + 1)), str(t[0])))
+
+    def print_summary(self, limit: int):
+        print('Fingerprints: {0} -> {1}'.format(*self.fingerprints))
+        print('Repositories removed: {0}, added: {1}'.format(len(self.repos[0]), len(self.repos[1])))
+        print('Users removed: {0}, added: {1}'.format(len(self.users[0]), len(self.users[1])))
+        print('Memberships removed: {0}, added: {1}, with a new relation: {2}'.format(
+            len(self.memberships[0]), len(self.memberships[1]), len(self.relations)))
+        print('Nodes with a changed neighbourhood: {0}'.format(self.neighbourhoods))
+        print('Changed attributes: {0}'.format(dict(self.attributes)))
+        if limit:
+            print('Added projects: \n{0}'.format(self.repos[1][:limit]))
+            print('Removed projects: \n{0}'.format(self.repos[0][:limit]))
+            print('Language shifts: \n{0}'.format(list(itertools.islice(self.languages.items(), limit))))
+            print('Rank changes of the most popular projects: \n{0}'.format(self.rank_changes(limit)[:limit]))
+
+    def to_dict(self, limit: int = 10) -> dict:
+        return {
+            'fingerprints': {'old': self.fingerprints[0], 'new': self.fingerprints[1], 'similar': self.similar},
+            'repos': {'removed': self.repos[0], 'added': self.repos[1]},
+            'users': {'removed': self.users[0], 'added': self.users[1]},
+            'memberships': {'removed': [list(e) for e in self.memberships[0]],
+                            'added': [list(e) for e in self.memberships[1]],
+                            'relations': [[repo, user, old, new] for (repo, user), (old, new) in self.relations.items()]},
+            'languages': [[n, old, new] for n, (old, new) in self.languages.items()],
+            'attributes': dict(self.attributes),
+            'neighbourhoods': self.neighbourhoods,
+            'ranks': [[n, old, new] for n, old, new in self.rank_changes(limit)],
+        }
+
+    def write(self, path: str, limit: int = 10):
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(limit), f, indent=1, default=str)
+
@@ -0,0 +1,248 @@
+import math
+
+import networkx as nx
+
+from reponetwork.CompactGraph import CompactGraph, REMOVED
+
+try:
+    import numpy as np
+    import scipy.sparse as sp
+except ImportError:
+    np = None
+    sp = None
+
+BLOCK_CELLS = 1 << 22
+# Coarsening stops at this number of nodes or when a level does not remove a tenth of the nodes.
+COARSEST = 50
+# No cluster grows over this fraction of the graph.
+MAX_CLUSTER = 1 / COARSEST
+MATCHING_ROUNDS = 3
+# Below this number of nodes the repulsive forces are computed between every pair of nodes.
+EXACT_REPULSION = 1000
+GRID = 16
+# Cached layouts covering less than this fraction of the graph are computed again from scratch.
+MIN_REUSE = 0.5
+
+
+class GraphLayout:
+    def __init__(self, g: nx.Graph, positions: dict = None, iterations: int = 50, seed: int = 0):
+        assert isinstance(g, (nx.Graph, CompactGraph))
+        assert positions is None or isinstance(positions, dict)
+        assert isinstance(iterations, int) and iterations > 0
+
+        if sp is None:
+            raise ImportError('The multilevel layout requires numpy and scipy. '
+                              'Install them with: pip install reponetwork[sparse]')
+
+        self.nodes = list(g)
+        self.index = {n: i for i, n in enumerate(self.nodes)}
+        self.iterations = iterations
+        self.rng = np.random.default_rng(seed)
+        self.adjacency = self._adjacency(g)
+        # levels[i] maps the nodes of graphs[i] to the clusters that are the nodes of graphs[i + 1].
+        self.levels = []
+        self.graphs = [(self.adjacency, np.ones(len(self.nodes)))]
+        self._coarsen()
+
+        self.reused = 0
+        if positions:
+            known = np.fromiter((n in positions for n in self.nodes), dtype=bool, count=len(self.nodes))
+            self.reused = int(known.sum())
+        if self.reused and self.reused >= MIN_REUSE * len(self.nodes):
+            self.positions = self._extend(positions, known)
+        else:
+            self.reused = 0
+            self.positions = self._layout()
+
+    def _adjacency(self, g: nx.Graph):
+        n = len(self.nodes)
+        if isinstance(g, CompactGraph):
+            # The edge arrays are read as they are, without creating a python object per edge.
+            position = np.full(len(g.names), -1, dtype=np.int64)
+            position[[g.ids[v] for v in self.nodes]] = np.arange(n)
+            source = np.frombuffer(g.source, dtype=np.uint32)
+            target = np.frombuffer(g.target, dtype=np.uint32)
+            alive = source != REMOVED
+            rows = position[source[alive]]
+            cols = position[target[alive]]
+        else:
+            index = self.index
+            ends = np.fromiter((index[v] for e in g.edges() for v in e), dtype=np.int64,
+                               count=2 * g.number_of_edges())
+            rows = ends[0::2]
+            cols = ends[1::2]
+        a = sp.coo_matrix((np.ones(len(rows)), (rows, cols)), shape=(n, n)).tocsr()
+        a = a + a.T
+        a.setdiag(0)
+        a.eliminate_zeros()
+        a.data[:] = 1
+        return a
+
+    @staticmethod
+    def _attach(parent, mass, nodes, targets, limit: float):
+        # The lightest nodes join their target cluster first, until it reaches the limit.
+        if not len(nodes):
+            return
+        cluster = np.bincount(parent, weights=mass, minlength=len(parent))
+        order = np.lexsort((mass[nodes], targets))
+        nodes = nodes[order]
+        targets = targets[order]
+        total = np.cumsum(mass[nodes])
+        first = np.r_[0, np.flatnonzero(targets[1:] != targets[:-1]) + 1]
+        before = np.repeat(total[first] - mass[nodes[first]], np.diff(np.r_[first, len(nodes)]))
+        joins = cluster[targets] + total - before <= limit
+        parent[nodes[joins]] = targets[joins]
+
+    def _clusters(self, a, mass, limit: float) -> 'np.ndarray':
+        # Nodes with a single neighbour join it, like the users of a single repository, and the rest are paired by a
+        # few rounds of heavy edge matching that prefers light clusters. The nodes left alone, usually around hubs,
+        # join the cluster of a matched neighbour. No cluster grows over the mass limit.
+        n = a.shape[0]
+        nodes = np.arange(n)
+        degree = np.diff(a.indptr)
+        rows = np.repeat(nodes, degree)
+        has_edges = np.flatnonzero(degree > 0)
+        parent = nodes.copy()
+
+        leaves = np.flatnonzero(degree == 1)
+        targets = a.indices[a.indptr[leaves]]
+        joins = (degree[targets] != 1) | (targets < leaves)
+        self._attach(parent, mass, leaves[joins], targets[joins], limit)
+
+        free = parent == nodes
+        weight = a.data / (mass[rows] * mass[a.indices])
+        for _ in range(MATCHING_ROUNDS):
+            score = np.where(free[rows] & free[a.indices] & (mass[rows] + mass[a.indices] <= limit), weight, -1)
+            last = np.lexsort((score, rows))[a.indptr[has_edges + 1] - 1]
+            chosen = score[last] > 0
+            best = nodes.copy()
+            best[has_edges[chosen]] = a.indices[last[chosen]]
+            pairs = np.flatnonzero((best[best] == nodes) & (best > nodes))
+            if not len(pairs):
+                break
+            parent[best[pairs]] = pairs
+            free[pairs] = False
+            free[best[pairs]] = False
+        parent = parent[parent]
+
+        alone = free & (np.bincount(parent, minlength=n) == 1)
+        score = np.where(alone[rows] & ~free[a.indices], weight, -1)
+        last = np.lexsort((score, rows))[a.indptr[has_edges + 1] - 1]
+        chosen = score[last] > 0
+        self._attach(parent, mass, has_edges[chosen], parent[a.indices[last[chosen]]], limit)
+        return np.unique(parent, return_inverse=True)[1]
+
+    def _coarsen(self):
+        a, mass = self.graphs[0]
+        limit = max(2.0, len(self.nodes) * MAX_CLUSTER)
+        while a.shape[0] > COARSEST:
+            cluster = self._clusters(a, mass, limit)
+            m = int(cluster.max()) + 1
+            if m > 0.9 * a.shape[0]:
+                break
+            p = sp.csr_matrix((np.ones(len(cluster)), (np.arange(len(cluster)), cluster)), shape=(len(cluster), m))
+            a = (p.T @ a @ p).tocsr()
+            a.setdiag(0)
+            a.eliminate_zeros()
+            mass = np.bincount(cluster, weights=mass, minlength=m)
+            self.levels.append(cluster)
+            self.graphs.append((a, mass))
+
+    def _repulsion(self, pos, mass, k: float):
+        n = len(pos)
+        if n <= EXACT_REPULSION:
+            centers = pos
+            weights = mass
+        else:
+            # One level of Barnes-Hut: the far nodes are replaced by the centres of mass of the cells of a grid.
+            low = pos.min(axis=0)
+            size = np.maximum(pos.max(axis=0) - low, 1e-9)
+            cell = np.minimum(((pos - low) / size * GRID).astype(np.int64), GRID - 1)
+            cell = cell[:, 0] * GRID + cell[:, 1]
+            weights = np.bincount(cell, weights=mass, minlength=GRID * GRID)
+            occupied = weights > 0
+            centers = np.stack([np.bincount(cell, weights=mass * pos[:, 0], minlength=GRID * GRID),
+                                np.bincount(cell, weights=mass * pos[:, 1], minlength=GRID * GRID)], axis=1)
+            weights = weights[occupied]
+            centers = centers[occupied] / weights[:, None]
+        # Single precision is enough for forces that are limited by the temperature, and twice as fast.
+        pos = pos.astype(np.float32)
+        centers = centers.astype(np.float32)
+        weights = (k * k * weights).astype(np.float32)
+        disp = np.empty(pos.shape)
+        block = max(1, BLOCK_CELLS // len(centers))
+        for start in range(0, n, block):
+            dx = pos[start:start + block, 0, None] - centers[None, :, 0]
+            dy = pos[start:start + block, 1, None] - centers[None, :, 1]
+            strength = weights / (dx * dx + dy * dy + np.float32(1e-12))
+            disp[start:start + block, 0] = (dx * strength).sum(axis=1)
+            disp[start:start + block, 1] = (dy * strength).sum(axis=1)
+        return disp
+
+    def _forces(self, a, mass, pos, iterations: int, temperature: float):
+        # Fruchterman-Reingold on the unit square, with the displacement limited by a decreasing temperature.
+        n = len(pos)
+        k = math.sqrt(1.0 / n)
+        edges = sp.triu(a).tocoo()
+        rows, cols, weights = edges.row, edges.col, edges.data
+        for t in np.linspace(temperature, temperature / 10, iterations):
+            disp = self._repulsion(pos, mass, k)
+            delta = pos[rows] - pos[cols]
+            force = delta * (np.sqrt((delta ** 2).sum(axis=1)) * weights / k)[:, None]
+            for axis in (0, 1):
+                disp[:, axis] -= np.bincount(rows, weights=force[:, axis], minlength=n)
+                disp[:, axis] += np.bincount(cols, weights=force[:, axis], minlength=n)
+            length = np.sqrt((disp ** 2).sum(axis=1)) + 1e-12
+            pos += disp * (np.minimum(length, t) / length)[:, None]
+        return pos
+
+    def _layout(self):
+        # The coarsest graph is laid out from random positions, then each level starts from the positions of its
+        # clusters and only needs a few iterations to refine them.
+        a, mass = self.graphs[-1]
+        if a.shape[0] == 0:
+            return np.zeros((0, 2))
+        pos = self.rng.random((a.shape[0], 2))
+        pos = self._forces(a, mass, pos, self.iterations, 0.1)
+        for cluster, (a, mass) in zip(reversed(self.levels), reversed(self.graphs[:-1])):
+            k = math.sqrt(1.0 / a.shape[0])
+            pos = pos[cluster] + self.rng.normal(scale=k / 4, size=(len(cluster), 2))
+            pos = self._forces(a, mass, pos, max(1, self.iterations // 5), k)
+        return pos
+
+    def _extend(self, positions: dict, known):
+        # The new nodes are placed at the centre of their known neighbours and the whole graph is refined a little.
+        pos = np.array([positions.get(n, (0.0, 0.0)) for n in self.nodes], dtype=np.float64)
+        if known.all():
+            return pos
+        missing = np.flatnonzero(~known)
+        a = self.adjacency[missing][:, np.flatnonzero(known)]
+        count = np.asarray(a.sum(axis=1)).ravel()
+        k = math.sqrt(1.0 / len(self.nodes))
+        placed = (a @ pos[known]) / np.maximum(count, 1)[:, None]
+        lonely = count == 0
+        placed[lonely] = pos[known].min(axis=0) + self.rng.random((int(lonely.sum()), 2)) * np.ptp(pos[known], axis=0)
+        pos[missing] = placed + self.rng.normal(scale=k / 4, size=(len(missing), 2))
+        a, mass = self.graphs[0]
+        return self._forces(a, mass, pos, max(1, self.iterations // 5), k)
+
+    def to_dict(self) -> dict:
+        return {n: (float(x), float(y)) for n, (x, y) in zip(self.nodes, self.positions)}
+
+    def communities(self, max_nodes: int) -> tuple:
+        # The clusters of the finest level with at most max_nodes of them, or of the coarsest level: the cluster of
+        # each node, the centre and number of nodes of each cluster, and the segments between connected clusters with
+        # their number of edges.
+        assert isinstance(max_nodes, int) and max_nodes > 0
+
+        label = np.arange(len(self.nodes))
+        level = 0
+        while level < len(self.levels) and self.graphs[level][0].shape[0] > max_nodes:
+            label = self.levels[level][label]
+            level += 1
+        a, sizes = self.graphs[level]
+        centers = np.stack([np.bincount(label, weights=self.positions[:, axis], minlength=len(sizes))
+                            for axis in (0, 1)], axis=1) / np.maximum(sizes, 1)[:, None]
+        edges = sp.triu(a, k=1).tocoo()
+        segments = np.stack([centers[edges.row], centers[edges.col]], axis=1)
+        return label, centers, sizes, segments, edges.data
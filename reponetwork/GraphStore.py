@@ -0,0 +1,202 @@
+import json
+import os
+import sqlite3
+from datetime import datetime
+
+import networkx as nx
+
+from reponetwork.CompactGraph import CompactGraph
+from reponetwork.DeltaGraph import DeltaGraph
+from reponetwork.dates import to_timestamp
+
+SQLITE_HEADER = b'SQLite format 3\x00'
+NODE_ATTRIBUTES = ('bipartite', 'language', 'weight', 'date')
+EDGE_ATTRIBUTES = ('relation', 'date', 'fork_source')
+# Attributes added by the GEXF reader that the GEXF writer generates again.
+GEXF_NODE_ATTRIBUTES = ('label',)
+GEXF_EDGE_ATTRIBUTES = ('id',)
+
+
+class GraphStore:
+    def __init__(self, path: str, mmap_size: int = 1024 * 1024 * 1024):
+        assert isinstance(path, str)
+        assert mmap_size >= 0
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self._db = sqlite3.connect(path, isolation_level=None)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA synchronous=NORMAL')
+        self._db.execute('PRAGMA mmap_size={0}'.format(int(mmap_size)))
+        # Node names, languages, relations and fork sources repeat a lot: they are interned in the strings table.
+        self._db.execute('CREATE TABLE IF NOT EXISTS strings (id INTEGER PRIMARY KEY, value)')
+        # The dates are also stored as timestamps, indexed to load only the recent part of the graph.
+        self._db.execute('CREATE TABLE IF NOT EXISTS nodes (id INTEGER PRIMARY KEY, bipartite, language INTEGER, '
+                         'weight, date TEXT, extra TEXT, time REAL)')
+        self._db.execute('CREATE TABLE IF NOT EXISTS edges (source INTEGER, target INTEGER, relation INTEGER, '
+                         'date TEXT, fork_source INTEGER, extra TEXT, time REAL)')
+        # Positions of the last drawing, reused by the next one.
+        self._db.execute('CREATE TABLE IF NOT EXISTS layout (id INTEGER PRIMARY KEY, x REAL, y REAL)')
+        self._migrate()
+        self._db.execute('CREATE INDEX IF NOT EXISTS nodes_time ON nodes (time)')
+        self._db.execute('CREATE INDEX IF NOT EXISTS edges_time ON edges (time)')
+        self._strings: dict = None
+        self._graph: DeltaGraph = None
+        self._cursor: tuple = None
+
+    def _migrate(self):
+        # Stores written before the dates were indexed lack the time column: it is added and filled from the dates.
+        for table in ('nodes', 'edges'):
+            columns = [x[1] for x in self._db.execute('PRAGMA table_info({0})'.format(table))]
+            if 'time' in columns:
+                continue
+            self._db.create_function('to_timestamp', 1, to_timestamp, deterministic=True)
+            try:
+                self._db.execute('BEGIN')
+                self._db.execute('ALTER TABLE {0} ADD COLUMN time REAL'.format(table))
+                self._db.execute('UPDATE {0} SET time = to_timestamp(date) WHERE date IS NOT NULL'.format(table))
+                self._db.execute('COMMIT')
+            except BaseException:
+                self._db.execute('ROLLBACK')
+                raise
+
+    @staticmethod
+    def is_store(path: str) -> bool:
+        try:
+            with open(path, 'rb') as f:
+                return f.read(len(SQLITE_HEADER)) == SQLITE_HEADER
+        except OSError:
+            return False
+
+    def _intern(self, value, new_strings: list):
+        if value is None:
+            return None
+        key = self._strings.get(value)
+        if key is None:
+            key = self._strings[value] = len(self._strings) + 1
+            new_strings.append((key, value))
+        return key
+
+    @staticmethod
+    def _extra(data: dict, known: tuple, generated: tuple, generated_value=None):
+        extra = {k: v for k, v in data.items()
+                 if k not in known and not (k in generated and (generated_value is None or v == generated_value))}
+        return json.dumps(extra) if extra else None
+
+    def _node_row(self, n, data: dict, new_strings: list) -> tuple:
+        return (self._intern(n, new_strings), data.get('bipartite'),
+                self._intern(data.get('language'), new_strings), data.get('weight'), data.get('date'),
+                self._extra(data, NODE_ATTRIBUTES, GEXF_NODE_ATTRIBUTES, n), to_timestamp(data.get('date')))
+
+    def _edge_row(self, u, v, data: dict, new_strings: list) -> tuple:
+        return (self._intern(u, new_strings), self._intern(v, new_strings),
+                self._intern(data.get('relation'), new_strings), data.get('date'),
+                self._intern(data.get('fork_source'), new_strings),
+                self._extra(data, EDGE_ATTRIBUTES, GEXF_EDGE_ATTRIBUTES), to_timestamp(data.get('date')))
+
+    def save(self, g: nx.Graph):
+        assert isinstance(g, (nx.Graph, CompactGraph))
+
+        delta = g.delta(self._cursor) if isinstance(g, (DeltaGraph, CompactGraph)) and g is self._graph else None
+        self._graph = None
+        if self._strings is None:
+            self._strings = {value: key for key, value in self._db.execute('SELECT id, value FROM strings')}
+        try:
+            self._db.execute('BEGIN')
+            new_strings = []
+            if delta is None:
+                # A different graph or a removal: rewrite everything. The layout refers to the old string ids.
+                for table in ('layout', 'edges', 'nodes', 'strings'):
+                    self._db.execute('DELETE FROM {0}'.format(table))
+                self._strings = {}
+                nodes = g.nodes(data=True)
+                edges = g.edges(data=True)
+            else:
+                node_data = g.nodes
+                edge_data = g.edges
+                nodes = ((n, node_data[n]) for n in dict.fromkeys(delta[0]) if n in node_data)
+                edges = ((u, v, edge_data[u, v]) for u, v in delta[1] if g.has_edge(u, v))
+            node_rows = [self._node_row(n, d, new_strings) for n, d in nodes]
+            edge_rows = [self._edge_row(u, v, d, new_strings) for u, v, d in edges]
+            self._db.executemany('INSERT INTO strings VALUES (?, ?)', new_strings)
+            self._db.executemany('INSERT OR REPLACE INTO nodes VALUES (?, ?, ?, ?, ?, ?, ?)', node_rows)
+            self._db.executemany('INSERT INTO edges VALUES (?, ?, ?, ?, ?, ?, ?)', edge_rows)
+            self._db.execute('COMMIT')
+        except BaseException:
+            self._db.execute('ROLLBACK')
+            self._strings = None
+            raise
+
+        if isinstance(g, (DeltaGraph, CompactGraph)):
+            self._graph = g
+            self._cursor = g.cursor(self)
+
+    def load(self, graph_class=DeltaGraph, since: datetime = None) -> nx.Graph:
+        condition = ''
+        parameters = ()
+        if since is not None:
+            condition = ' WHERE time IS NULL OR time >= ?'
+            parameters = (to_timestamp(since),)
+        kept = set()
+
+        def nodes():
+            for n, bipartite, language, weight, date, extra in self._db.execute(
+                    'SELECT name.value, bipartite, language.value, weight, date, extra FROM nodes '
+                    'JOIN strings name ON name.id = nodes.id '
+                    'LEFT JOIN strings language ON language.id = nodes.language' + condition, parameters):
+                data = json.loads(extra) if extra else {}
+                for k, v in zip(NODE_ATTRIBUTES, (bipartite, language, weight, date)):
+                    if v is not None:
+                        data[k] = v
+                if since is not None:
+                    kept.add(n)
+                yield n, data
+
+        def edges():
+            for u, v, relation, date, fork_source, extra in self._db.execute(
+                    'SELECT source.value, target.value, relation.value, date, fork_source.value, extra FROM edges '
+                    'JOIN strings source ON source.id = edges.source '
+                    'JOIN strings target ON target.id = edges.target '
+                    'LEFT JOIN strings relation ON relation.id = edges.relation '
+                    'LEFT JOIN strings fork_source ON fork_source.id = edges.fork_source' + condition, parameters):
+                if since is not None and (u not in kept or v not in kept):
+                    # Edges of dropped nodes are dropped too.
+                    continue
+                data = json.loads(extra) if extra else {}
+                for k, value in zip(EDGE_ATTRIBUTES, (relation, date, fork_source)):
+                    if value is not None:
+                        data[k] = value
+                yield u, v, data
+
+        g = graph_class()
+        g.add_nodes_from(nodes())
+        g.add_edges_from(edges())
+        if isinstance(g, (DeltaGraph, CompactGraph)) and since is None:
+            # The graph is already stored: the next save only appends what is added from now on.
+            self._graph = g
+            self._cursor = g.cursor(self)
+        return g
+
+    def save_layout(self, positions: dict):
+        assert isinstance(positions, dict)
+
+        if self._strings is None:
+            self._strings = {value: key for key, value in self._db.execute('SELECT id, value FROM strings')}
+        # Only the nodes already saved have an id. The others are placed from their neighbours by the next drawing.
+        rows = [(self._strings[n], x, y) for n, (x, y) in positions.items() if n in self._strings]
+        try:
+            self._db.execute('BEGIN')
+            self._db.execute('DELETE FROM layout')
+            self._db.executemany('INSERT INTO layout VALUES (?, ?, ?)', rows)
+            self._db.execute('COMMIT')
+        except BaseException:
+            self._db.execute('ROLLBACK')
+            raise
+
+    def load_layout(self) -> dict:
+        return {n: (x, y) for n, x, y in self._db.execute(
+            'SELECT name.value, x, y FROM layout JOIN strings name ON name.id = layout.id')}
+
+    def close(self):
+        self._db.close()
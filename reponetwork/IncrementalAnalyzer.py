@@ -0,0 +1,232 @@
+import collections
+import heapq
+import itertools
+
+import networkx as nx
+
+from reponetwork.CompactGraph import CompactGraph
+from reponetwork.DeltaGraph import DeltaGraph
+
+
+class CountIndex:
+    def __init__(self):
+        self.count = {}
+        self.buckets = {}
+
+    def __len__(self):
+        return len(self.count)
+
+    def set(self, key, value: int):
+        old = self.count.get(key)
+        if old == value:
+            return
+        if old is not None:
+            self._discard(key, old)
+        self.count[key] = value
+        self.buckets.setdefault(value, set()).add(key)
+
+    def increment(self, key):
+        self.set(key, self.count.get(key, 0) + 1)
+
+    def discard(self, key):
+        old = self.count.pop(key, None)
+        if old is not None:
+            self._discard(key, old)
+
+    def _discard(self, key, value: int):
+        bucket = self.buckets[value]
+        bucket.discard(key)
+        if not bucket:
+            del self.buckets[value]
+
+    def top(self, limit: int) -> list:
+        # There are few distinct counts compared to the number of keys, so sorting them is cheap.
+        result = []
+        for value in sorted(self.buckets, reverse=True):
+            result.extend(itertools.islice(self.buckets[value], limit - len(result)))
+            if len(result) >= limit:
+                break
+        return result
+
+
+class WeightIndex:
+    def __init__(self):
+        # The heap keeps the outdated entries of the keys that changed or left. They are skipped while reading the top
+        # and dropped when they outnumber the keys, so each update costs a push instead of a scan of every key.
+        self.weight = {}
+        self.heap = []
+        self.order = itertools.count()
+
+    def __len__(self):
+        return len(self.weight)
+
+    def __contains__(self, key):
+        return key in self.weight
+
+    def set(self, key, weight):
+        if key in self.weight and self.weight[key] == weight:
+            return
+        self.weight[key] = weight
+        heapq.heappush(self.heap, (-weight, next(self.order), key))
+        self._compact()
+
+    def discard(self, key):
+        if self.weight.pop(key, None) is not None:
+            self._compact()
+
+    def _compact(self):
+        if len(self.heap) > 2 * len(self.weight) + 64:
+            self.heap = [(-weight, next(self.order), key) for key, weight in self.weight.items()]
+            heapq.heapify(self.heap)
+
+    def top(self, limit: int) -> list:
+        heap = self.heap
+        result = []
+        kept = []
+        while heap and len(result) < limit:
+            entry = heapq.heappop(heap)
+            weight, _, key = entry
+            if key in self.weight and self.weight[key] == -weight and key not in result:
+                result.append(key)
+                kept.append(entry)
+        for entry in kept:
+            heapq.heappush(heap, entry)
+        return result
+
+
+class IncrementalAnalyzer:
+    def __init__(self, growth: float = 1.0):
+        assert growth > 0
+
+        self.growth = growth
+        self.g: nx.Graph = None
+        self.cursor: tuple = None
+        self.analyzed_edges = 0
+        self._reset()
+
+    def _reset(self):
+        self.parent = {}
+        self.size = {}
+        self.components = 0
+        self.largest = 0
+        self.kind = {}
+        self.language = {}
+        self.languages = collections.Counter()
+        self.repo_degrees = CountIndex()
+        self.user_degrees = CountIndex()
+        self.forks = CountIndex()
+        self.risked = WeightIndex()
+        self.edges = 0
+
+    def update(self, g: nx.Graph):
+        assert isinstance(g, (nx.Graph, CompactGraph))
+
+        delta = g.delta(self.cursor) if isinstance(g, (DeltaGraph, CompactGraph)) and g is self.g else None
+        if delta is None:
+            # Union-find cannot split components: start over when something was removed or the graph changed.
+            self._reset()
+            self.g = g
+            touched, edges = g, g.edges()
+        else:
+            touched, edges = delta
+            touched = set(touched)
+            touched.update(n for e in edges for n in e)
+        if isinstance(g, (DeltaGraph, CompactGraph)):
+            self.cursor = g.cursor(self)
+
+        nodes = g.nodes
+        for n in touched:
+            if n in nodes:
+                self._add_node(n, nodes[n])
+        for u, v in edges:
+            self.edges += 1
+            self._union(u, v)
+            if g.edges[u, v].get('relation') == 'fork':
+                self.forks.increment(u if self.kind[u] == 0 else v)
+        for n in touched:
+            if n in nodes:
+                self._update_degree(n)
+
+    @property
+    def pending(self) -> bool:
+        return self.edges != self.analyzed_edges
+
+    def due(self) -> bool:
+        # The full analysis runs each time the graph grows by the given ratio, so its total cost stays linear.
+        return self.edges - self.analyzed_edges >= self.growth * max(self.analyzed_edges, 1)
+
+    def mark_analyzed(self):
+        self.analyzed_edges = self.edges
+
+    def _add_node(self, n, data: dict):
+        if n not in self.parent:
+            self.parent[n] = n
+            self.size[n] = 1
+            self.components += 1
+            self.largest = max(self.largest, 1)
+
+        kind = 0 if data.get('bipartite') == 0 else 1
+        old = self.kind.get(n)
+        if old != kind:
+            if old == 0:
+                self.repo_degrees.discard(n)
+                self.risked.discard(n)
+            elif old == 1:
+                self.user_degrees.discard(n)
+            self.kind[n] = kind
+
+        language = data.get('language') if kind == 0 else None
+        old = self.language.pop(n, None)
+        if old is not None:
+            self.languages[old] -= 1
+            if not self.languages[old]:
+                del self.languages[old]
+        if language is not None:
+            self.language[n] = language
+            self.languages[language] += 1
+
+    def _find(self, n):
+        parent = self.parent
+        while parent[n] != n:
+            parent[n] = parent[parent[n]]
+            n = parent[n]
+        return n
+
+    def _union(self, u, v):
+        u = self._find(u)
+        v = self._find(v)
+        if u == v:
+            return
+        if self.size[u] < self.size[v]:
+            u, v = v, u
+        self.parent[v] = u
+        self.size[u] += self.size.pop(v)
+        self.components -= 1
+        self.largest = max(self.largest, self.size[u])
+
+    def _update_degree(self, n):
+        degree = self.g.degree[n]
+        if self.kind[n] == 0:
+            self.repo_degrees.set(n, degree)
+            if degree <= 1:
+                self.risked.set(n, self.g.nodes[n].get('weight', 0))
+            else:
+                self.risked.discard(n)
+        else:
+            self.user_degrees.set(n, degree)
+
+    def print_stats(self, limit: int = 3):
+        assert isinstance(limit, int)
+
+        print('Incremental graph analysis:')
+        print('Repositories: {0}'.format(len(self.repo_degrees)))
+        print('Users: {0}'.format(len(self.user_degrees)))
+        print('Connected components: \n{0}'.format(self.components))
+        print('Largest component: \n{0}'.format(self.largest))
+        print('Languages: \n{0}'.format(set(self.languages)))
+        print('Number of risked projects: \n{0}'.format(len(self.risked)))
+        if limit:
+            print('Most risked projects: \n{0}'.format(self.risked.top(limit)))
+            print('Most forked projects: \n{0}'.format(self.forks.top(limit)))
+            print('Most popular projects: \n{0}'.format(self.repo_degrees.top(limit)))
+            print('Most active users: \n{0}'.format(self.user_degrees.top(limit)))
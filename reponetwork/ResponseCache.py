@@ -0,0 +1,198 @@
+import hashlib
+import json
+import os
+import sqlite3
+import time
+import zlib
+from threading import Lock
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+
+RATE_LIMIT_HEADERS = ('X-RateLimit-Limit', 'X-RateLimit-Remaining', 'X-RateLimit-Reset', 'X-RateLimit-Used',
+                      'RateLimit-Limit', 'RateLimit-Remaining', 'RateLimit-Reset', 'Retry-After', 'Date')
+# Fresh hits do not reach the server, so they do not report its quota: these headers would be stale.
+QUOTA_HEADERS = ('X-RateLimit-Limit', 'X-RateLimit-Remaining', 'X-RateLimit-Reset', 'X-RateLimit-Used',
+                 'X-RateLimit-Resource', 'RateLimit-Limit', 'RateLimit-Remaining', 'RateLimit-Reset',
+                 'RateLimit-Observed', 'Retry-After')
+
+
+class ResponseCache:
+    def __init__(self, path: str, ttl: float = 24 * 3600, max_size: int = 512 * 1024 * 1024):
+        assert isinstance(path, str)
+        assert ttl is None or ttl >= 0
+        assert max_size is None or max_size > 0
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.ttl = ttl
+        self.max_size = max_size
+        self.hits = 0
+        self.revalidations = 0
+        self.misses = 0
+        self._lock = Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('CREATE TABLE IF NOT EXISTS responses ('
+                         'key TEXT PRIMARY KEY, url TEXT, etag TEXT, last_modified TEXT, status INTEGER, '
+                         'headers TEXT, body BLOB, size INTEGER, stored_at REAL, accessed_at REAL)')
+        self._db.execute('CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed_at)')
+
+    @staticmethod
+    def make_key(method: str, url: str, headers=None) -> str:
+        parts = urlsplit(url)
+        query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+        url = urlunsplit((parts.scheme, parts.netloc.lower(), parts.path, query, ''))
+        auth = ''
+        if headers:
+            auth = headers.get('Authorization') or headers.get('PRIVATE-TOKEN') or ''
+        digest = hashlib.sha1(auth.encode('utf-8')).hexdigest() if auth else ''
+        return '{0} {1} {2}'.format(method.upper(), url, digest)
+
+    def get(self, key: str):
+        with self._lock:
+            row = self._db.execute('SELECT url, etag, last_modified, status, headers, body, stored_at '
+                                   'FROM responses WHERE key = ?', (key,)).fetchone()
+            if row is None:
+                return None
+            self._db.execute('UPDATE responses SET accessed_at = ? WHERE key = ?', (time.time(), key))
+        url, etag, last_modified, status, headers, body, stored_at = row
+        return {
+            'url': url,
+            'etag': etag,
+            'last_modified': last_modified,
+            'status': status,
+            'headers': json.loads(headers),
+            'body': zlib.decompress(body),
+            'stored_at': stored_at,
+        }
+
+    def put(self, key: str, url: str, status: int, headers: dict, body: bytes):
+        blob = zlib.compress(body or b'')
+        now = time.time()
+        with self._lock:
+            self._db.execute('INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                             (key, url, headers.get('ETag'), headers.get('Last-Modified'), status,
+                              json.dumps(dict(headers)), blob, len(blob), now, now))
+            self._evict()
+
+    def touch(self, key: str, headers: dict = None):
+        now = time.time()
+        with self._lock:
+            if headers:
+                row = self._db.execute('SELECT headers FROM responses WHERE key = ?', (key,)).fetchone()
+                if row:
+                    stored = json.loads(row[0])
+                    stored.update({k: v for k, v in headers.items() if k in RATE_LIMIT_HEADERS})
+                    self._db.execute('UPDATE responses SET headers = ? WHERE key = ?', (json.dumps(stored), key))
+            self._db.execute('UPDATE responses SET stored_at = ?, accessed_at = ? WHERE key = ?', (now, now, key))
+
+    def is_fresh(self, entry: dict) -> bool:
+        return self.ttl is not None and time.time() - entry['stored_at'] < self.ttl
+
+    def size(self) -> int:
+        with self._lock:
+            return self._db.execute('SELECT COALESCE(SUM(size), 0) FROM responses').fetchone()[0]
+
+    def clear(self):
+        with self._lock:
+            self._db.execute('DELETE FROM responses')
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def count(self, outcome: str):
+        # The adapters of up to a thread per connection count their outcomes concurrently.
+        assert outcome in ('hits', 'revalidations', 'misses')
+        with self._lock:
+            setattr(self, outcome, getattr(self, outcome) + 1)
+
+    def stats(self) -> dict:
+        requests_count = self.hits + self.revalidations + self.misses
+        return {
+            'hits': self.hits,
+            'revalidations': self.revalidations,
+            'misses': self.misses,
+            'hit_rate': (self.hits + self.revalidations) / requests_count if requests_count else 0.0,
+        }
+
+    def _evict(self):
+        if self.max_size is None:
+            return
+        total = self._db.execute('SELECT COALESCE(SUM(size), 0) FROM responses').fetchone()[0]
+        if total <= self.max_size:
+            return
+        rows = self._db.execute('SELECT key, size FROM responses ORDER BY accessed_at').fetchall()
+        evicted = []
+        for key, size in rows:
+            if total <= self.max_size:
+                break
+            evicted.append((key,))
+            total -= size
+        self._db.executemany('DELETE FROM responses WHERE key = ?', evicted)
+
+
+class CachingAdapter(HTTPAdapter):
+    def __init__(self, cache: ResponseCache, **kwargs):
+        assert isinstance(cache, ResponseCache)
+
+        super().__init__(**kwargs)
+        self.cache = cache
+
+    def send(self, request: requests.PreparedRequest, **kwargs):
+        # The rate limit status is free and only useful when it is current.
+        if request.method.upper() != 'GET' or kwargs.get('stream') or urlsplit(request.url).path.endswith('/rate_limit'):
+            return super().send(request, **kwargs)
+
+        key = ResponseCache.make_key(request.method, request.url, request.headers)
+        entry = self.cache.get(key)
+        if entry is not None and self.cache.is_fresh(entry):
+            self.cache.count('hits')
+            response = self._build_response(request, entry)
+            for header in QUOTA_HEADERS:
+                response.headers.pop(header, None)
+            return response
+
+        if entry is not None:
+            if entry['etag']:
+                request.headers['If-None-Match'] = entry['etag']
+            if entry['last_modified']:
+                request.headers['If-Modified-Since'] = entry['last_modified']
+
+        response = super().send(request, **kwargs)
+        if response.status_code == 304 and entry is not None:
+            self.cache.count('revalidations')
+            self.cache.touch(key, response.headers)
+            entry['headers'].update({k: v for k, v in response.headers.items() if k in RATE_LIMIT_HEADERS})
+            return self._build_response(request, entry)
+
+        self.cache.count('misses')
+        if response.status_code == 200:
+            self.cache.put(key, request.url, response.status_code, response.headers, response.content)
+        return response
+
+    def _build_response(self, request: requests.PreparedRequest, entry: dict) -> requests.Response:
+        response = requests.Response()
+        response.status_code = entry['status']
+        response.headers = CaseInsensitiveDict(entry['headers'])
+        response.headers.pop('Content-Encoding', None)
+        response.headers['Content-Length'] = str(len(entry['body']))
+        response._content = entry['body']
+        response._content_consumed = True
+        response.url = request.url
+        response.request = request
+        response.reason = 'OK'
+        response.encoding = requests.utils.get_encoding_from_headers(response.headers)
+        response.connection = self
+        return response
+
+
+def mount_cache(session: requests.Session, cache: ResponseCache, **kwargs):
+    adapter = CachingAdapter(cache, **kwargs)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return adapter
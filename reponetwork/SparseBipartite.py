@@ -0,0 +1,325 @@
+import statistics
+
+import networkx as nx
+
+from reponetwork.CompactGraph import CompactGraph, REMOVED
+
+try:
+    import numpy as np
+    import scipy.sparse as sp
+    from scipy.sparse import csgraph
+except ImportError:
+    np = None
+    sp = None
+    csgraph = None
+
+BLOCK_CELLS = 1 << 24
+MIN_PIVOTS = 32
+
+
+class SparseBipartite:
+    def __init__(self, g: nx.Graph, repos: set = None):
+        assert isinstance(g, (nx.Graph, CompactGraph))
+
+        if sp is None:
+            raise ImportError('The sparse analysis backend requires numpy and scipy. '
+                              'Install them with: pip install reponetwork[sparse]')
+
+        if repos is None:
+            repos = {n for n, d in g.nodes(data=True) if d.get('bipartite') == 0}
+        self.repos = [n for n in g if n in repos]
+        self.users = [n for n in g if n not in repos]
+        self.nodes = self.repos + self.users
+        self.index = {n: i for i, n in enumerate(self.nodes)}
+        self.n_repos = len(self.repos)
+        self.n_users = len(self.users)
+
+        if isinstance(g, CompactGraph):
+            rows, cols = self._compact_edges(g)
+        else:
+            rows, cols = self._edges(g)
+        data = np.ones(len(rows), dtype=np.float64)
+        self.biadjacency = sp.csr_matrix((data, (rows, cols)), shape=(self.n_repos, self.n_users))
+        self.biadjacency.sum_duplicates()
+        self.biadjacency.data[:] = 1
+        self.adjacency = sp.bmat([[None, self.biadjacency], [self.biadjacency.T, None]], format='csr')
+
+    def _edges(self, g: nx.Graph) -> tuple:
+        rows = []
+        cols = []
+        index = self.index
+        n_repos = self.n_repos
+        for u, v in g.edges():
+            i, j = index[u], index[v]
+            if i < n_repos <= j:
+                rows.append(i)
+                cols.append(j - n_repos)
+            elif j < n_repos <= i:
+                rows.append(j)
+                cols.append(i - n_repos)
+        return rows, cols
+
+    def _compact_edges(self, g: CompactGraph) -> tuple:
+        # The edge arrays are read as they are, without creating a python object per edge.
+        position = np.full(len(g.names), -1, dtype=np.int64)
+        position[[g.ids[n] for n in self.nodes]] = np.arange(len(self.nodes))
+        source = np.frombuffer(g.source, dtype=np.uint32)
+        target = np.frombuffer(g.target, dtype=np.uint32)
+        alive = source != REMOVED
+        i = position[source[alive]]
+        j = position[target[alive]]
+        n_repos = self.n_repos
+        forward = (0 <= i) & (i < n_repos) & (j >= n_repos)
+        backward = (0 <= j) & (j < n_repos) & (i >= n_repos)
+        return np.concatenate([i[forward], j[backward]]), np.concatenate([j[forward], i[backward]]) - n_repos
+
+    def _to_dict(self, values, nodes: list = None, offset: int = 0) -> dict:
+        nodes = self.nodes if nodes is None else nodes
+        return {n: float(values[i + offset]) for i, n in enumerate(nodes)}
+
+    def degree(self):
+        return np.concatenate([np.asarray(self.biadjacency.sum(axis=1)).ravel(),
+                               np.asarray(self.biadjacency.sum(axis=0)).ravel()])
+
+    def degree_centrality(self) -> dict:
+        degree = self.degree()
+        scale = np.empty(len(self.nodes))
+        scale[:self.n_repos] = 1 / self.n_users if self.n_users else 0
+        scale[self.n_repos:] = 1 / self.n_repos if self.n_repos else 0
+        return self._to_dict(degree * scale)
+
+    def closeness_centrality(self, sources: str = 'repos', normalized: bool = True) -> dict:
+        assert sources in ('repos', 'users', 'all')
+
+        total = len(self.nodes)
+        indices = np.arange(total)
+        if sources == 'repos':
+            indices = indices[:self.n_repos]
+        elif sources == 'users':
+            indices = indices[self.n_repos:]
+
+        values = np.zeros(len(indices))
+        block = max(1, BLOCK_CELLS // max(total, 1))
+        for start in range(0, len(indices), block):
+            chunk = indices[start:start + block]
+            distances = csgraph.shortest_path(self.adjacency, method='D', unweighted=True, directed=False,
+                                              indices=chunk)
+            reachable = np.isfinite(distances)
+            totsp = np.where(reachable, distances, 0).sum(axis=1)
+            reached = reachable.sum(axis=1)
+            # Bipartite normalization of Borgatti and Halgin, as in networkx.
+            is_repo = chunk < self.n_repos
+            n = np.where(is_repo, self.n_repos, self.n_users)
+            m = np.where(is_repo, self.n_users, self.n_repos)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                closeness = (m + 2 * (n - 1)) / totsp
+                if normalized:
+                    closeness *= (reached - 1) / (total - 1)
+            values[start:start + len(chunk)] = np.where((totsp > 0) & (total > 1), closeness, 0.0)
+        return {self.nodes[i]: float(v) for i, v in zip(indices, values)}
+
+    def _block(self) -> int:
+        return max(1, min(256, BLOCK_CELLS // max(len(self.nodes), 1)))
+
+    def _dependencies(self, chunk) -> 'np.ndarray':
+        adjacency = self.adjacency
+        total = len(self.nodes)
+        k = len(chunk)
+        columns = np.arange(k)
+        # Level synchronous Brandes for a block of sources at once: columns are sources.
+        sigma = np.zeros((total, k))
+        sigma[chunk, columns] = 1
+        depth = np.full((total, k), -1, dtype=np.int32)
+        depth[chunk, columns] = 0
+        frontier = sigma.copy()
+        level = 0
+        while True:
+            paths = adjacency @ frontier
+            new = (paths > 0) & (depth < 0)
+            if not new.any():
+                break
+            level += 1
+            depth[new] = level
+            frontier = np.where(new, paths, 0)
+            sigma += frontier
+
+        delta = np.zeros((total, k))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            for d in range(level, 0, -1):
+                coefficient = np.where(depth == d, (1 + delta) / sigma, 0)
+                delta += np.where(depth == d - 1, sigma * (adjacency @ coefficient), 0)
+        delta[chunk, columns] = 0
+        return delta
+
+    def betweenness(self, sources=None) -> 'np.ndarray':
+        total = len(self.nodes)
+        sources = np.arange(total) if sources is None else np.asarray(sources)
+        betweenness = np.zeros(total)
+        block = self._block()
+        for start in range(0, len(sources), block):
+            betweenness += self._dependencies(sources[start:start + block]).sum(axis=1)
+        return betweenness
+
+    def _normalize_betweenness(self, values: 'np.ndarray') -> 'np.ndarray':
+        # Matches networkx.algorithms.bipartite.betweenness_centrality(g, users).
+        if not self.n_repos or not self.n_users:
+            return values
+        if len(self.nodes) > 2:
+            values = values / 2
+        n = self.n_users
+        m = self.n_repos
+        s, t = divmod(n - 1, m)
+        bet_max_top = ((m ** 2) * ((s + 1) ** 2) + m * (s + 1) * (2 * t - s - 1) - t * (2 * s - t + 3)) / 2.0
+        p, r = divmod(m - 1, n)
+        bet_max_bot = ((n ** 2) * ((p + 1) ** 2) + n * (p + 1) * (2 * r - p - 1) - r * (2 * p - r + 3)) / 2.0
+        values = values.copy()
+        values[:self.n_repos] /= bet_max_bot
+        values[self.n_repos:] /= bet_max_top
+        return values
+
+    def betweenness_centrality(self) -> dict:
+        return self._to_dict(self._normalize_betweenness(self.betweenness()))
+
+    def _ranked(self, ranked: str) -> 'np.ndarray':
+        assert ranked in ('repos', 'users', 'all')
+        if ranked == 'repos':
+            return np.arange(self.n_repos)
+        elif ranked == 'users':
+            return np.arange(self.n_repos, len(self.nodes))
+        return np.arange(len(self.nodes))
+
+    def _pivots(self, pivots: int, seed: int) -> list:
+        order = np.random.default_rng(seed).permutation(len(self.nodes))[:pivots]
+        block = self._block()
+        return [order[start:start + block] for start in range(0, len(order), block)]
+
+    def _estimate(self, sums: 'np.ndarray', squares: 'np.ndarray', count: int, total: int = None):
+        # Estimate the sum over all the sources from a sample of pivots drawn without replacement.
+        total = len(self.nodes) if total is None else total
+        mean = sums / count
+        variance = np.maximum(squares / count - mean ** 2, 0)
+        correction = (total - count) / (total - 1) if total > 1 else 0
+        return total * mean, total * np.sqrt(variance / count * correction)
+
+    @staticmethod
+    def _stable(values: 'np.ndarray', errors: 'np.ndarray', ranked: 'np.ndarray', limit: int) -> bool:
+        # The top limit nodes are known when their confidence intervals do not overlap with the rest.
+        if not limit or limit >= len(ranked):
+            return False
+        values = values[ranked]
+        errors = errors[ranked]
+        order = np.argsort(-values)
+        top, rest = order[:limit], order[limit:]
+        return (values[top] - errors[top]).min() > (values[rest] + errors[rest]).max()
+
+    def _leaves(self):
+        # A source with a single neighbor depends on the same nodes as its neighbor, plus the neighbor itself
+        # for every other node of the component. Its work is folded into the neighbor as a weight.
+        adjacency = self.adjacency
+        total = len(self.nodes)
+        degree = np.diff(adjacency.indptr)
+        neighbor = adjacency.indices[np.minimum(adjacency.indptr[:-1], max(adjacency.nnz - 1, 0))] \
+            if adjacency.nnz else np.zeros(total, dtype=np.int64)
+        leaves = np.flatnonzero((degree == 1) & (degree[neighbor] > 1))
+        weight = np.ones(total)
+        np.add.at(weight, neighbor[leaves], 1)
+        weight[leaves] = 0
+        _, labels = csgraph.connected_components(adjacency, directed=False)
+        dependency = np.zeros(total)
+        np.add.at(dependency, neighbor[leaves], np.bincount(labels)[labels[leaves]] - 2)
+        return weight, dependency
+
+    def sample_betweenness_centrality(self, pivots: int, limit: int = None, ranked: str = 'users',
+                                      confidence: float = 0.95, seed: int = None):
+        assert pivots > 0
+        assert 0 < confidence < 1
+
+        z = statistics.NormalDist().inv_cdf((1 + confidence) / 2)
+        ranked = self._ranked(ranked)
+        total = len(self.nodes)
+        weight, exact = self._leaves()
+        sources = np.flatnonzero(weight)
+        # The heaviest sources are computed exactly with up to half of the pivots, the rest are sampled.
+        heavy = sources[weight[sources] > 1]
+        heavy = heavy[np.argsort(-weight[heavy], kind='stable')][:pivots // 2]
+        rest = np.setdiff1d(sources, heavy)
+        sampled = np.random.default_rng(seed).permutation(rest)[:pivots - len(heavy)]
+        block = self._block()
+        for start in range(0, len(heavy), block):
+            chunk = heavy[start:start + block]
+            exact += (self._dependencies(chunk) * weight[chunk]).sum(axis=1)
+
+        sums = np.zeros(total)
+        squares = np.zeros(total)
+        count = 0
+        values, errors = exact, np.zeros(total)
+        for start in range(0, len(sampled), block):
+            chunk = sampled[start:start + block]
+            delta = self._dependencies(chunk) * weight[chunk]
+            sums += delta.sum(axis=1)
+            squares += (delta ** 2).sum(axis=1)
+            count += len(chunk)
+            estimate, errors = self._estimate(sums, squares, count, len(rest))
+            values = exact + estimate
+            if count >= MIN_PIVOTS and self._stable(values, errors * z, ranked, limit):
+                break
+        # The normalization is linear, so it applies to the error as well.
+        return (self._to_dict(self._normalize_betweenness(values)),
+                self._to_dict(self._normalize_betweenness(errors) * z), len(heavy) + count)
+
+    def sample_closeness_centrality(self, pivots: int, limit: int = None, ranked: str = 'repos',
+                                    confidence: float = 0.95, seed: int = None):
+        assert pivots > 0
+        assert 0 < confidence < 1
+
+        z = statistics.NormalDist().inv_cdf((1 + confidence) / 2)
+        ranked = self._ranked(ranked)
+        total = len(self.nodes)
+        sums = np.zeros(total)
+        squares = np.zeros(total)
+        reached = np.zeros(total)
+        count = 0
+        values = errors = np.zeros(total)
+        for chunk in self._pivots(pivots, seed):
+            distances = csgraph.shortest_path(self.adjacency, method='D', unweighted=True, directed=False,
+                                              indices=chunk)
+            reachable = np.isfinite(distances)
+            distances = np.where(reachable, distances, 0)
+            sums += distances.sum(axis=0)
+            squares += (distances ** 2).sum(axis=0)
+            reached += reachable.sum(axis=0)
+            count += len(chunk)
+
+            totsp, totsp_error = self._estimate(sums, squares, count)
+            # Bipartite normalization of Borgatti and Halgin, as in networkx.
+            is_repo = np.arange(total) < self.n_repos
+            n = np.where(is_repo, self.n_repos, self.n_users)
+            m = np.where(is_repo, self.n_users, self.n_repos)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                values = (m + 2 * (n - 1)) / totsp * (reached * total / count - 1) / (total - 1)
+                values = np.where((totsp > 0) & (total > 1), values, 0.0)
+                errors = np.where(totsp > 0, values * totsp_error / totsp, 0.0)
+            if count >= MIN_PIVOTS and self._stable(values, errors * z, ranked, limit):
+                break
+        return self._to_dict(values), self._to_dict(errors * z), count
+
+    def _projection_degree(self, matrix) -> 'np.ndarray':
+        # Degree of each row in the projection matrix @ matrix.T, computed in blocks of rows because a single
+        # repository with thousands of contributors would make the whole projection dense.
+        matrix = matrix.tocsr()
+        transposed = matrix.T.tocsr()
+        work = np.cumsum(matrix @ np.diff(transposed.indptr))
+        counts = np.zeros(matrix.shape[0], dtype=np.int64)
+        start = 0
+        while start < matrix.shape[0]:
+            done = work[start - 1] if start else 0
+            stop = max(start + 1, int(np.searchsorted(work, done + BLOCK_CELLS, side='right')))
+            counts[start:stop] = np.diff((matrix[start:stop] @ transposed).indptr)
+            start = stop
+        return counts - (np.diff(matrix.indptr) > 0)
+
+    def co_contributors(self) -> dict:
+        return self._to_dict(self._projection_degree(self.biadjacency.T), self.users)
+
+    def shared_contributors(self) -> dict:
+        return self._to_dict(self._projection_degree(self.biadjacency), self.repos)
@@ -0,0 +1,126 @@
+import json
+import os
+import sqlite3
+import time
+from threading import Lock
+
+PENDING = 0
+CLAIMED = 1
+DONE = 2
+
+
+class WorkQueue:
+    def __init__(self, path: str, lease: float = 600):
+        assert isinstance(path, str)
+        assert lease > 0
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.lease = lease
+        # Several processes share the file: wait for the locks of the others instead of failing.
+        self._db = sqlite3.connect(path, timeout=60, isolation_level=None, check_same_thread=False)
+        self._lock = Lock()
+        for attempt in range(100):
+            # Switching to WAL ignores the busy timeout when several processes open a new queue at once.
+            try:
+                self._db.execute('PRAGMA journal_mode=WAL')
+                break
+            except sqlite3.OperationalError:
+                time.sleep(0.1)
+        self._db.execute('PRAGMA synchronous=NORMAL')
+        self._db.execute('CREATE TABLE IF NOT EXISTS tasks (seq INTEGER PRIMARY KEY AUTOINCREMENT, '
+                         'id TEXT UNIQUE, data TEXT, state INTEGER, worker TEXT, claimed_at REAL)')
+        self._db.execute('CREATE INDEX IF NOT EXISTS tasks_state ON tasks (state, seq)')
+        self._db.execute('CREATE TABLE IF NOT EXISTS results (seq INTEGER PRIMARY KEY AUTOINCREMENT, '
+                         'worker TEXT, buffers TEXT)')
+        self._db.execute('CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)')
+
+    def _transaction(self, action):
+        # The import threads of a worker share the connection.
+        with self._lock:
+            self._db.execute('BEGIN IMMEDIATE')
+            try:
+                result = action()
+                self._db.execute('COMMIT')
+                return result
+            except BaseException:
+                self._db.execute('ROLLBACK')
+                raise
+
+    def get(self, key: str, default=None):
+        with self._lock:
+            row = self._db.execute('SELECT value FROM meta WHERE key = ?', (key,)).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def set(self, key: str, value):
+        with self._lock:
+            self._db.execute('INSERT OR REPLACE INTO meta VALUES (?, ?)', (key, json.dumps(value)))
+
+    def push(self, tasks: list) -> int:
+        # Each repository is queued once, whoever finds it first.
+        def action():
+            before = self._db.total_changes
+            self._db.executemany('INSERT OR IGNORE INTO tasks (id, data, state) VALUES (?, ?, ?)',
+                                 [(task_id, json.dumps(data), PENDING) for task_id, data in tasks])
+            return self._db.total_changes - before
+        return self._transaction(action)
+
+    def reserve(self, task_id: str, worker: str) -> bool:
+        # Claims a repository found while importing another one, like the parent of a fork.
+        def action():
+            before = self._db.total_changes
+            self._db.execute('INSERT OR IGNORE INTO tasks (id, state, worker, claimed_at) VALUES (?, ?, ?, ?)',
+                             (task_id, CLAIMED, worker, time.time()))
+            return self._db.total_changes > before
+        return self._transaction(action)
+
+    def claim(self, worker: str, count: int) -> list:
+        def action():
+            now = time.time()
+            rows = self._db.execute('SELECT seq, id, data FROM tasks WHERE state = ? OR state = ? AND claimed_at < ? '
+                                    'ORDER BY seq LIMIT ?', (PENDING, CLAIMED, now - self.lease, count)).fetchall()
+            self._db.executemany('UPDATE tasks SET state = ?, worker = ?, claimed_at = ? WHERE seq = ?',
+                                 [(CLAIMED, worker, now, seq) for seq, _, _ in rows])
+            return [(task_id, json.loads(data) if data else None) for _, task_id, data in rows]
+        return self._transaction(action)
+
+    def release(self, task_ids: list, worker: str):
+        self._transaction(lambda: self._db.executemany(
+            'UPDATE tasks SET state = ?, worker = NULL WHERE id = ? AND worker = ? AND state = ?',
+            [(PENDING, task_id, worker, CLAIMED) for task_id in task_ids]))
+
+    def complete(self, task_ids: list, worker: str, buffers: list, forks: list):
+        # The partial graph, the forks to crawl next and the end of the tasks are recorded atomically.
+        def action():
+            if buffers:
+                self._db.execute('INSERT INTO results (worker, buffers) VALUES (?, ?)', (worker, json.dumps(buffers)))
+            self._db.executemany('INSERT OR IGNORE INTO tasks (id, data, state) VALUES (?, ?, ?)',
+                                 [(task_id, json.dumps(data), PENDING) for task_id, data in forks])
+            self._db.executemany('UPDATE tasks SET state = ? WHERE id = ?', [(DONE, x) for x in task_ids])
+        self._transaction(action)
+
+    def skip(self, task_ids: list):
+        # Repositories that are already in the graph are never queued.
+        self._transaction(lambda: self._db.executemany('INSERT OR IGNORE INTO tasks (id, state) VALUES (?, ?)',
+                                                       [(task_id, DONE) for task_id in task_ids]))
+
+    def results(self, after: int = 0, count: int = 1000) -> list:
+        with self._lock:
+            rows = self._db.execute('SELECT seq, buffers FROM results WHERE seq > ? ORDER BY seq LIMIT ?',
+                                    (after, count)).fetchall()
+        return [(seq, json.loads(buffers)) for seq, buffers in rows]
+
+    def acknowledge(self, seq: int):
+        # The results are kept until the graph that contains them is saved, merging them again is harmless.
+        self._transaction(lambda: self._db.execute('DELETE FROM results WHERE seq <= ?', (seq,)))
+
+    def counts(self) -> dict:
+        with self._lock:
+            counts = dict(self._db.execute('SELECT state, COUNT(*) FROM tasks GROUP BY state').fetchall())
+            results = self._db.execute('SELECT COUNT(*) FROM results').fetchone()[0]
+        return {'pending': counts.get(PENDING, 0), 'claimed': counts.get(CLAIMED, 0), 'done': counts.get(DONE, 0),
+                'results': results}
+
+    def close(self):
+        self._db.close()
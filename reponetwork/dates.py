@@ -0,0 +1,20 @@
+from datetime import datetime, timezone
+
+import dateutil.parser
+
+
+def parse_date(value) -> datetime:
+    if isinstance(value, datetime):
+        date = value
+    else:
+        try:
+            # Fast path for the ISO 8601 dates written by the crawlers.
+            date = datetime.fromisoformat(value[:-1] + '+00:00' if value.endswith('Z') else value)
+        except ValueError:
+            date = dateutil.parser.parse(value)
+    # Dates without time zone are considered UTC, so they can be compared with the ones that have it.
+    return date if date.tzinfo is not None else date.replace(tzinfo=timezone.utc)
+
+
+def to_timestamp(value) -> float:
+    return parse_date(value).timestamp() if value else None
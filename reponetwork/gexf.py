@@ -0,0 +1,68 @@
+import xml.etree.ElementTree as ET
+from datetime import datetime
+
+import networkx as nx
+
+from reponetwork.dates import parse_date
+
+BOOLEANS = {'true': True, 'false': False, 'True': True, 'False': False, '0': False, '1': True}
+TYPES = {'integer': int, 'long': int, 'float': float, 'double': float, 'string': str, 'boolean': BOOLEANS.get}
+
+
+def local_name(tag: str) -> str:
+    return tag.rpartition('}')[2]
+
+
+def read_gexf(path: str, since: datetime = None) -> nx.Graph:
+    # Streaming reader for the static graphs written by networkx.write_gexf. Nodes and edges dated before since
+    # are dropped as soon as they are parsed, so the memory used depends on the result and not on the file.
+    since = parse_date(since) if since is not None else None
+
+    def recent(data: dict) -> bool:
+        return since is None or 'date' not in data or parse_date(data['date']) >= since
+
+    g: nx.Graph = None
+    attributes = {'node': {}, 'edge': {}}
+    defaults = {'node': {}, 'edge': {}}
+    attribute_class = None
+    container = None
+    for event, element in ET.iterparse(path, events=('start', 'end')):
+        tag = local_name(element.tag)
+        if event == 'start':
+            if tag == 'graph':
+                g = nx.DiGraph() if element.get('defaultedgetype') == 'directed' else nx.Graph()
+            elif tag == 'attributes':
+                attribute_class = element.get('class')
+            elif tag in ('nodes', 'edges'):
+                container = element
+            continue
+
+        if tag == 'attribute':
+            title = element.get('title')
+            convert = TYPES.get(element.get('type'), str)
+            attributes[attribute_class][element.get('id')] = (title, convert)
+            for child in element:
+                if local_name(child.tag) == 'default':
+                    defaults[attribute_class][title] = convert(child.text)
+        elif tag in ('node', 'edge'):
+            data = dict(defaults[tag])
+            for child in element.iter():
+                if local_name(child.tag) == 'attvalue':
+                    title, convert = attributes[tag].get(child.get('for'), (child.get('for'), str))
+                    data[title] = convert(child.get('value'))
+            if element.get('label') is not None:
+                data['label'] = element.get('label')
+            if tag == 'node':
+                if recent(data):
+                    g.add_node(element.get('id'), **data)
+            else:
+                if element.get('id') is not None:
+                    data['id'] = element.get('id')
+                if element.get('weight') is not None:
+                    data['weight'] = float(element.get('weight'))
+                source, target = element.get('source'), element.get('target')
+                # Edges of dropped nodes are dropped too.
+                if source in g and target in g and recent(data):
+                    g.add_edge(source, target, **data)
+            container.clear()
+    return g
@@ -1,21 +1,78 @@
 import networkx as nx
-import networkx.algorithms.isomorphism as iso
 import itertools
+import math
+import collections
+import os
 import argparse
+from datetime import datetime
 import dateutil
 import matplotlib
 #matplotlib.use('WXAgg')
 import matplotlib.pyplot as plt
 from matplotlib import cm, colors
+from matplotlib.collections import LineCollection
 
+from reponetwork.AsyncGithubCrawler import AsyncGithubCrawler
+from reponetwork.CompactGraph import CompactGraph
+from reponetwork.CrawlCheckpoint import CrawlCheckpoint
+from reponetwork.CrawlMetrics import CrawlMetrics
+from reponetwork.DeltaGraph import DeltaGraph
+from reponetwork.DistributedCrawler import CrawlCoordinator, CrawlWorker
 from reponetwork.GithubCrawler import GithubCrawler
 from reponetwork.GitlabCrawler import GitlabCrawler
+from reponetwork.GraphDiff import GraphDiff
+from reponetwork.GraphLayout import GraphLayout
+from reponetwork.GraphStore import GraphStore
+from reponetwork.IncrementalAnalyzer import IncrementalAnalyzer
+from reponetwork.ResponseCache import ResponseCache
+from reponetwork.SparseBipartite import SparseBipartite, sp
+from reponetwork.WorkQueue import WorkQueue
+from reponetwork import gexf
 
+# Larger graphs are drawn with the multilevel layout unless another one is requested.
+SPRING_NODES = 1000
 
-def analize_graph(g: nx.Graph, limit: int = 3, clean: bool = True, draw: bool = False, cmp_with: nx.Graph = None):
-    assert isinstance(g, nx.Graph)
+
+def read_graph(path: str, since: datetime = None, compact: bool = False) -> nx.Graph:
+    if GraphStore.is_store(path):
+        store = GraphStore(path)
+        try:
+            return store.load(graph_class=CompactGraph if compact else DeltaGraph, since=since)
+        finally:
+            store.close()
+    if since is not None:
+        g = gexf.read_gexf(path, since=since)
+    else:
+        g = nx.read_gexf(path)
+    return CompactGraph(g) if compact else g
+
+
+def write_gexf(g: nx.Graph, path: str):
+    nx.write_gexf(g.to_networkx() if isinstance(g, CompactGraph) else g, path)
+
+
+def is_gexf(path: str) -> bool:
+    if os.path.exists(path) and os.path.getsize(path) > 0:
+        return not GraphStore.is_store(path)
+    return os.path.splitext(path)[1].lower() == '.gexf'
+
+
+def count_forks(g: nx.Graph, repos: set) -> collections.Counter:
+    # The crawlers link the owner of a fork to the forked repository with a 'fork' edge.
+    return collections.Counter(u if u in repos else v for u, v, relation in g.edges(data='relation')
+                               if relation == 'fork')
+
+
+def analize_graph(g: nx.Graph, limit: int = 3, clean: bool = True, draw: bool = False, cmp_with: nx.Graph = None,
+                  backend: str = 'networkx', approx: int = None, confidence: float = 0.95, draw_options: dict = None,
+                  diff_output: str = None, metrics: CrawlMetrics = None):
+    assert isinstance(g, (nx.Graph, CompactGraph))
     assert isinstance(limit, int)
-    assert cmp_with is None or isinstance(cmp_with, nx.Graph)
+    assert cmp_with is None or isinstance(cmp_with, (nx.Graph, CompactGraph))
+    assert backend in ('networkx', 'sparse')
+    assert approx is None or isinstance(approx, int) and approx > 0
+    assert draw_options is None or isinstance(draw_options, dict)
+    assert metrics is None or isinstance(metrics, CrawlMetrics)
 
     def take_by_value(items, l, f=None):
         items = sorted(items, key=lambda t: t[1], reverse=True)
@@ -23,119 +80,252 @@ def analize_graph(g: nx.Graph, limit: int = 3, clean: bool = True, draw: bool =
             items = filter(f, items)
         return [k for k, v in itertools.islice(items, 0, l)]
 
+    def with_errors(items, errors):
+        return ['{0} ±{1:.2g}'.format(k, errors[k]) for k in items]
+
+    def to_networkx(graph):
+        # Compact graphs are only converted for the networkx algorithms without a compact implementation.
+        return graph.to_networkx() if isinstance(graph, CompactGraph) else graph
+
+    compact = isinstance(g, CompactGraph)
     labels = set()
+    # Each section of the analysis is timed from the end of the previous one.
+    phases = (metrics or CrawlMetrics()).stopwatch('analysis.')
     print('Graph analysis:')
     nodes = g.nodes(data=True)
     repos = {n for n, d in nodes if d['bipartite'] == 0}
     print('Repositories: {0}'.format(len(repos)))
     users = set(g) - repos
     print('Users: {0}'.format(len(users)))
-    components = list(nx.connected_components(g))
-    print('Connected components: \n{0}'.format(sum(1 for _ in components)))
+    components = list(g.connected_components() if compact else nx.connected_components(g))
+    component = {n: i for i, c in enumerate(components) for n in c}
+    print('Connected components: \n{0}'.format(len(components)))
     languages = {d['language'] for n, d in nodes if d['bipartite'] == 0}
     print('Languages: \n{0}'.format(languages))
+    phases.lap('components')
 
-    bridges = {(n1, n2): len(next((c for c in components if n1 in c), [])) for n1, n2 in nx.algorithms.bridges(g)}
+    bridges = {(n1, n2): len(components[component[n1]]) for n1, n2 in (g.bridges() if compact else nx.algorithms.bridges(g))}
     bridges = take_by_value(bridges.items(), limit)
     print('Connecting memberships: \n{0}'.format(list(bridges)))
+    phases.lap('bridges')
 
     deg1_repos = [n for n in repos if g.degree[n] <= 1]
     print('Number of risked projects: \n{0}'.format(len(deg1_repos)))
     deg1_repos = sorted(deg1_repos, key=lambda n: -nodes[n].get('weight', 0))
     print('Most risked projects: \n{0}'.format(deg1_repos[0:limit]))
+    phases.lap('risked')
 
     if cmp_with:
         print('Comparing graphs...')
-        nm = iso.categorical_node_match(['bipartite', 'language'], [0, '?'])
-        em = iso.categorical_edge_match('relation', 'contributor')
-        #are_equal = nx.is_isomorphic(g, cmp_with, node_match=nm, edge_match=em)
-        are_equal = nx.could_be_isomorphic(g, cmp_with)
-        print('The graphs are similar.' if are_equal else 'The graphs are not isomorphic.')
+        # The compared graph is the previous snapshot.
+        diff = GraphDiff(cmp_with, g)
+        print('The graphs are similar.' if diff.similar else 'The graphs are not isomorphic.')
+        diff.print_summary(limit)
+        if diff_output:
+            diff.write(diff_output, limit=max(limit, 10))
+            print('Saved the differences to {0}'.format(diff_output))
+        phases.lap('compare')
 
     if clean:
         repo_count = len(repos)
-        components = sorted(components, key=lambda c: len(c))
-        min_size = len(components[-1])/2
-
-        for component in components:
-            component_repos = repos.intersection(component)
-            if len(component_repos) <= 1 or len(component) < min_size:
-                repos.difference_update(component)
-                users.difference_update(component)
-                # g.remove_nodes_from(component)
+        min_size = max((len(c) for c in components), default=0)/2
+        component_repos = collections.Counter(component[n] for n in repos)
+        excluded = {i for i, c in enumerate(components) if component_repos[i] <= 1 or len(c) < min_size}
+        if excluded:
+            repos = {n for n in repos if component[n] not in excluded}
+            users = {n for n in users if component[n] not in excluded}
 
         if len(repos) < repo_count:
             print('Excluded {0} isolated projects.'.format(repo_count - len(repos)))
             # g = nx.classes.graphviews.subgraph_view(g, filter_node=lambda n: n in repos or n in users)
-            g = nx.subgraph(g, repos.union(users))
+            g = g.subgraph(repos.union(users)) if compact else nx.subgraph(g, repos.union(users))
+        phases.lap('clean')
 
     if limit and repos:
-        fork_sources = {n: d.get('fork_source') for n, d in nodes if d.get('relation') == 'fork'}
-        fork_count = {n: sum(1 for k, v in fork_sources if v == n) for n in repos}
-        fork_count = take_by_value(fork_count.items(), limit)
+        fork_count = take_by_value(count_forks(g, repos).items(), limit)
         labels.update(fork_count)
         print('Most forked projects: \n{0}'.format(fork_count))
+        phases.lap('forks')
+
+        matrix = SparseBipartite(g, repos) if backend == 'sparse' or approx else None
+        if matrix is None:
+            g = to_networkx(g)
 
-        repo_centrality = nx.algorithms.bipartite.degree_centrality(g, repos)
-        repo_centrality = take_by_value(repo_centrality.items(), limit, f=lambda t: t[0] in repos)
+        if matrix is not None:
+            degree_centrality = matrix.degree_centrality()
+        else:
+            degree_centrality = nx.algorithms.bipartite.degree_centrality(g, repos)
+        repo_centrality = take_by_value(degree_centrality.items(), limit, f=lambda t: t[0] in repos)
         labels.update(repo_centrality)
         print('Most popular projects: \n{0}'.format(repo_centrality))
+        phases.lap('degree')
 
-        repo_centrality = nx.algorithms.bipartite.closeness_centrality(g, repos, normalized=True)
-        repo_centrality = take_by_value(repo_centrality.items(), limit, f=lambda t: t[0] in repos)
-        labels.update(repo_centrality)
-        print('Most central projects: \n{0}'.format(repo_centrality))
+        if matrix is not None:
+            repo_centrality = take_by_value(matrix.shared_contributors().items(), limit)
+            labels.update(repo_centrality)
+            print('Projects sharing the most contributors: \n{0}'.format(repo_centrality))
+            phases.lap('shared_contributors')
+
+        if approx:
+            repo_centrality, errors, pivots = matrix.sample_closeness_centrality(approx, limit=limit,
+                                                                               confidence=confidence)
+            repo_centrality = take_by_value(repo_centrality.items(), limit, f=lambda t: t[0] in repos)
+            labels.update(repo_centrality)
+            print('Most central projects ({0} pivots, {1:.0%} confidence): \n{2}'.format(
+                pivots, confidence, with_errors(repo_centrality, errors)))
+        else:
+            if matrix is not None:
+                repo_centrality = matrix.closeness_centrality('repos')
+            else:
+                repo_centrality = nx.algorithms.bipartite.closeness_centrality(g, repos, normalized=True)
+            repo_centrality = take_by_value(repo_centrality.items(), limit, f=lambda t: t[0] in repos)
+            labels.update(repo_centrality)
+            print('Most central projects: \n{0}'.format(repo_centrality))
+        phases.lap('closeness')
 
-        user_centrality = nx.algorithms.bipartite.degree_centrality(g, users)
-        user_centrality = take_by_value(user_centrality.items(), limit, f=lambda t: t[0] in users)
+        if matrix is None:
+            degree_centrality = nx.algorithms.bipartite.degree_centrality(g, users)
+        user_centrality = take_by_value(degree_centrality.items(), limit, f=lambda t: t[0] in users)
         labels.update(user_centrality)
         print('Most active users: \n{0}'.format(user_centrality))
+        phases.lap('user_degree')
 
-        user_languages = {u: len(set(nodes[n]['language'] for n in nx.neighbors(g, u) if nodes[n]['language']))
-                          for u in users}
-        user_centrality = nx.algorithms.bipartite.betweenness_centrality(g, users)
+        if matrix is not None:
+            user_centrality = take_by_value(matrix.co_contributors().items(), limit)
+            print('Users with most co-contributors: \n{0}'.format(user_centrality))
+            phases.lap('co_contributors')
+
+        language = g.nodes(data='language')
+        user_languages = {u: len(set(language[n] for n in g.neighbors(u) if language[n])) for u in users}
+        errors = None
+        if approx:
+            user_centrality, errors, pivots = matrix.sample_betweenness_centrality(approx, limit=limit,
+                                                                                 confidence=confidence)
+        elif matrix is not None:
+            user_centrality = matrix.betweenness_centrality()
+        else:
+            user_centrality = nx.algorithms.bipartite.betweenness_centrality(g, users)
         user_centrality = take_by_value(user_centrality.items(), limit, f=lambda t: user_languages.get(t[0]) or 0 > 1)
         labels.update(user_centrality)
-        print('Users connecting communities: \n{0}'.format(user_centrality))
+        if errors is not None:
+            print('Users connecting communities ({0} pivots, {1:.0%} confidence): \n{2}'.format(
+                pivots, confidence, with_errors(user_centrality, errors)))
+        else:
+            print('Users connecting communities: \n{0}'.format(user_centrality))
+        phases.lap('betweenness')
     if draw:
-        draw_communities(g, labels=list(labels))
+        draw_communities(g, labels=list(labels), **(draw_options or {}))
+        phases.lap('draw')
 
 
-def draw_communities(G: nx.Graph, labels=None):
-    assert isinstance(G, nx.Graph)
+def draw_communities(G: nx.Graph, labels=None, layout: str = 'auto', max_nodes: int = 2000, output: str = None,
+                     store: GraphStore = None):
+    assert isinstance(G, (nx.Graph, CompactGraph))
     assert labels is None or isinstance(labels, list)
+    assert layout in ('auto', 'spring', 'multilevel')
+    assert isinstance(max_nodes, int) and max_nodes > 0
+    assert store is None or isinstance(store, GraphStore)
 
     labels = {n: n for n in labels} if labels else {}
 
     print('Drawing graph...')
-    pos = nx.spring_layout(G)
+    if layout == 'auto':
+        layout = 'spring' if len(G) <= SPRING_NODES else 'multilevel'
+    hierarchy: GraphLayout = None
+    if layout == 'spring':
+        pos = nx.spring_layout(G.to_networkx() if isinstance(G, CompactGraph) else G)
+    else:
+        hierarchy = GraphLayout(G, positions=store.load_layout() if store is not None else None)
+        pos = hierarchy.to_dict()
+        if hierarchy.reused:
+            print('Reused the stored positions of {0} of {1} nodes'.format(hierarchy.reused, len(G)))
+        if store is not None and hierarchy.reused < len(G):
+            store.save_layout(pos)
     nodes = G.nodes(data=True)
     languages = {d['language'] for n, d in nodes if d['bipartite'] == 0}
     languages = {x: i for i, x in enumerate(languages, start=0)}
     norm = colors.Normalize(vmin=0, vmax=len(languages))
-    node_list = list(G.nodes)
-    color_list = ['0.3' if d['bipartite'] else cm.jet(norm(languages[d['language']])) for n, d in nodes]
-    size_list = [2 if d['bipartite'] else 6 for n, d in nodes]
 
+    def color(bipartite, language):
+        return '0.3' if bipartite else cm.jet(norm(languages[language]))
+
+    if output:
+        # Renders to the file, also on servers without a display.
+        plt.switch_backend('Agg')
     fig, ax = plt.subplots(figsize=(16, 9))
     ax.plot([0], [0], color='0.3', label='User')
     for l, i in languages.items():
         ax.plot([0], [0], color=cm.jet(norm(i)), label=l)
     plt.title("Github repositories")
-    nx.draw_networkx(G, pos=pos, nodelist=node_list, node_color=color_list, node_size=size_list,
-                     with_labels=True, labels=labels, ax=ax, edge_color='0.7')
+    if len(G) <= max_nodes:
+        node_list = list(G.nodes)
+        color_list = [color(d['bipartite'], d.get('language')) for n, d in nodes]
+        size_list = [2 if d['bipartite'] else 6 for n, d in nodes]
+        nx.draw_networkx(G.to_networkx() if isinstance(G, CompactGraph) else G, pos=pos, nodelist=node_list,
+                         node_color=color_list, node_size=size_list, with_labels=True, labels=labels, ax=ax,
+                         edge_color='0.7')
+    else:
+        if hierarchy is None:
+            hierarchy = GraphLayout(G, positions=pos)
+        draw_aggregated(G, hierarchy, labels, max_nodes, color, ax)
     plt.legend()
-    plt.show()
+    if output:
+        fig.savefig(output, dpi=150)
+        plt.close(fig)
+        print('Saved drawing to {0}'.format(output))
+    else:
+        plt.show()
+
+
+def draw_aggregated(G: nx.Graph, layout: GraphLayout, labels: dict, max_nodes: int, color, ax):
+    # The communities are drawn as nodes sized by their number of members and coloured by their most common language,
+    # and only the labelled nodes are drawn with their own edges.
+    community, centers, sizes, segments, weights = layout.communities(max_nodes)
+    print('Drew {0} nodes as {1} communities'.format(len(G), len(sizes)))
+    counts = collections.Counter()
+    for n, d in G.nodes(data=True):
+        if d['bipartite'] == 0:
+            counts[community[layout.index[n]], d['language']] += 1
+    dominant = {}
+    for (c, language), k in sorted(counts.items(), key=lambda t: t[1]):
+        dominant[c] = language
+    color_list = [color(0, dominant[c]) if c in dominant else color(1, None) for c in range(len(sizes))]
+    ax.add_collection(LineCollection(segments, colors='0.7', linewidths=[0.2 + 0.3 * math.log1p(w) for w in weights],
+                                     zorder=1, rasterized=True))
+    ax.scatter(centers[:, 0], centers[:, 1], s=[6 * math.sqrt(k) for k in sizes], c=color_list, zorder=2,
+               rasterized=True)
+
+    detail = [n for n in labels if n in layout.index]
+    position = layout.positions
+    index = layout.index
+    ax.add_collection(LineCollection([(position[index[n]], position[index[v]]) for n in detail for v in G.neighbors(n)],
+                                     colors='0.4', linewidths=0.3, zorder=3, rasterized=True))
+    nodes = G.nodes
+    ax.scatter([position[index[n]][0] for n in detail], [position[index[n]][1] for n in detail], s=30,
+               c=[color(nodes[n]['bipartite'], nodes[n].get('language')) for n in detail], edgecolors='k', zorder=4)
+    for n in detail:
+        ax.annotate(labels[n], position[index[n]], fontsize=8, zorder=5)
+    ax.autoscale_view()
+    ax.set_axis_off()
 
 
 def main():
     github_repo = ['https://www.github.com', 'www.github.com', 'github.com']
 
     parser = argparse.ArgumentParser(description='Analyze the network of code projects in a code repository.')
-    parser.add_argument('-i', '--input', help='Path of a previously saved graph in GEXF format.')
+    parser.add_argument('-i', '--input', help='Path of a previously saved graph, in GEXF or native format.')
     parser.add_argument('--stats', type=int, default=0, help='Specify the amount of results to display in graph analysis. '
                                                         'Use 0 to disable graph analysis.')
     parser.add_argument('--draw', dest='draw', action='store_true', help='Draw the resulting graph.')
+    parser.add_argument('--layout', choices=['auto', 'spring', 'multilevel'], default='auto',
+                        help='Layout of the drawing. The multilevel layout coarsens the graph, lays out the coarsest '
+                             'level and refines it level by level. It is used by default above {0} nodes and its '
+                             'positions are kept in native graph files for the next drawings.'.format(SPRING_NODES))
+    parser.add_argument('--draw-nodes', type=int, default=2000,
+                        help='Above this number of nodes, the drawing shows the communities as single nodes and only '
+                             'the labelled nodes in detail.')
+    parser.add_argument('--draw-output', help='Save the drawing to this image file instead of showing it, also '
+                                              'without a display. The format is given by the extension.')
     parser.add_argument('-s', '--source', default=github_repo[0],
                         help='The URL of the repository.')
     parser.add_argument('-u', '--user', help='The user name to use for login. '
@@ -149,45 +339,247 @@ def main():
     parser.add_argument('-q', '--query', help='Search the projects that match the specified text.')
     parser.add_argument('--since', type=lambda s: dateutil.parser.parse(s),
                         help='Starting date.')
-    parser.add_argument('-o', '--output', help='Specify a path to save the resulting graph in GEXF format.')
-    parser.add_argument('--compare', help='Path of another graph in GEXF format to compare with.')
+    parser.add_argument('--since-commits', choices=['all', 'until-authors', 'none'], default='all',
+                        help='Commits read on GitHub to find the committers since the starting date: all of them, '
+                             'only until every author listed in the contributor statistics has been seen, or none, '
+                             'using the week of the first commit of each author from the statistics as its date.')
+    parser.add_argument('-o', '--output', help='Specify a path to save the resulting graph. Paths ending in .gexf are '
+                                               'saved in GEXF format, any other path in the native format, which '
+                                               'only appends the changes after each crawl batch.')
+    parser.add_argument('--export-gexf', help='Path where the final graph is exported in GEXF format.')
+    parser.add_argument('--compare', help='Path of another graph, in GEXF or native format, to compare with. It is '
+                                          'taken as the previous snapshot of the analysed graph.')
+    parser.add_argument('--diff-output', help='Path of a JSON file where the differences with the --compare graph '
+                                              'are written.')
+    parser.add_argument('--cache', help='Path of a local database used to cache the API responses between runs.')
+    parser.add_argument('--cache-ttl', type=float, default=24,
+                        help='Hours during which a cached response is reused without contacting the server. '
+                             'Older responses are revalidated with conditional requests.')
+    parser.add_argument('--cache-size', type=int, default=512,
+                        help='Maximum size of the response cache in MB.')
+    parser.add_argument('--checkpoint', help='Path of a file where the crawl progress is periodically saved.')
+    parser.add_argument('--checkpoint-interval', type=float, default=60,
+                        help='Seconds between two consecutive checkpoint saves, or graph saves of a coordinator.')
+    parser.add_argument('--resume', action='store_true',
+                        help='Continue the crawl saved in the checkpoint file instead of starting a new one.')
+    parser.add_argument('--engine', choices=['threads', 'async'], default='threads',
+                        help='Crawling engine. The async engine adapts the number of concurrent requests to the '
+                             'GitHub rate limit headers and requires aiohttp.')
+    parser.add_argument('--graphql', action='store_true',
+                        help='Fetch the metadata, owner, parent and forks of GitHub repositories in batches '
+                             'with the GraphQL API.')
+    parser.add_argument('--workers', type=int, default=64,
+                        help='Maximum number of concurrent requests of the async engine.')
+    parser.add_argument('--backend', choices=['networkx', 'sparse'], default='networkx',
+                        help='Analysis backend. The sparse backend computes the centrality measures with '
+                             'scipy sparse matrices and is much faster on large graphs. It requires '
+                             'pip install reponetwork[sparse].')
+    parser.add_argument('--approx', type=int, metavar='K',
+                        help='Estimate the closeness and betweenness centralities from at most K sampled pivots. '
+                             'The sampling stops early once the top ranking is separated by the error margin. '
+                             'Always uses the sparse backend, which requires pip install reponetwork[sparse].')
+    parser.add_argument('--confidence', type=float, default=0.95,
+                        help='Confidence level of the error reported by --approx.')
+    parser.add_argument('--incremental', action='store_true',
+                        help='Update the cheap statistics with the changes since the previous crawl batch and run '
+                             'the full analysis only when the graph has grown enough.')
+    parser.add_argument('--reanalyze-growth', type=float, default=1.0,
+                        help='Growth ratio of the number of edges that triggers a full analysis in incremental mode.')
+    parser.add_argument('--max-fork-depth', type=int,
+                        help='Do not crawl forks further than this many levels below the repositories found by the '
+                             'search. The parents of the crawled forks are always imported.')
+    parser.add_argument('--frontier-priority', choices=['depth', 'stars'], default='depth',
+                        help='Order in which the pending repositories are crawled: the shallowest forks first, or '
+                             'the most starred repositories first.')
+    parser.add_argument('--compact', action='store_true',
+                        help='Keep the graph in a compact representation with integer node ids and typed arrays, '
+                             'which uses several times less memory than networkx on large crawls.')
+    parser.add_argument('--coordinator', metavar='QUEUE',
+                        help='Share the crawl with worker processes through the queue database at this path. '
+                             'The coordinator searches the repositories and merges the graphs of the workers.')
+    parser.add_argument('--worker', metavar='QUEUE',
+                        help='Import the repositories of the crawl coordinated through the queue database at this '
+                             'path, with the given credentials, until the coordinator finishes.')
+    parser.add_argument('--queue-lease', type=float, default=600,
+                        help='Seconds after which the repositories claimed by an unresponsive worker are claimed '
+                             'again by the others.')
+    parser.add_argument('--metrics', metavar='PATH',
+                        help='Write the crawl metrics to this file: request latencies by endpoint, rate limit quota, '
+                             'repositories per second, lock waits and analysis timings. Paths ending in .prom are '
+                             'rewritten in the Prometheus text format, any other one gets JSON lines.')
+    parser.add_argument('--metrics-interval', type=float, default=10,
+                        help='Seconds between the snapshots written to the --metrics file.')
+    parser.add_argument('--profile', action='store_true',
+                        help='Print a summary of the crawl metrics at the end.')
     args = parser.parse_args()
+    # Fail before crawling rather than when the analysis starts.
+    if sp is None and (args.approx or args.backend == 'sparse'):
+        parser.error('{0} requires numpy and scipy. Install them with: pip install reponetwork[sparse]'.format(
+            '--approx' if args.approx else '--backend sparse'))
+
+    metrics = CrawlMetrics(args.metrics, interval=args.metrics_interval)
+
+    def finish_metrics():
+        metrics.close()
+        if args.profile:
+            metrics.print_summary()
+        if args.metrics:
+            print('Saved metrics to {0}'.format(args.metrics))
+
+    cache = None
+    if args.cache:
+        cache = ResponseCache(args.cache, ttl=args.cache_ttl * 3600, max_size=args.cache_size * 1024 * 1024)
 
-    if args.source.lower() in github_repo:
-        c = GithubCrawler(token=args.token, user=args.user, password=args.password)
+    if args.engine == 'async':
+        if args.source.lower() not in github_repo:
+            parser.error('The async engine is only available for GitHub')
+        if cache is not None:
+            print('The response cache is not used by the async engine.')
+        c = AsyncGithubCrawler(token=args.token, user=args.user, password=args.password,
+                               max_workers=args.workers, max_depth=args.max_fork_depth,
+                               priority=args.frontier_priority, since_commits=args.since_commits, metrics=metrics)
+    elif args.source.lower() in github_repo:
+        c = GithubCrawler(token=args.token, user=args.user, password=args.password, cache=cache,
+                          graphql=args.graphql, max_depth=args.max_fork_depth, priority=args.frontier_priority,
+                          since_commits=args.since_commits, metrics=metrics)
     else:
-        c = GitlabCrawler(args.source, token=args.token, user=args.user, password=args.password)
+        if args.since_commits != 'all':
+            print('GitLab has no contributor statistics by date, all the commits are read.')
+        c = GitlabCrawler(args.source, token=args.token, user=args.user, password=args.password, cache=cache,
+                          max_depth=args.max_fork_depth, priority=args.frontier_priority, metrics=metrics)
+
+    if args.coordinator or args.worker:
+        if not isinstance(c, GithubCrawler):
+            parser.error('Distributed crawls are only available for GitHub with the threads engine')
+        if args.coordinator and args.worker:
+            parser.error('--coordinator and --worker are exclusive')
+    if args.worker:
+        queue = WorkQueue(args.worker, lease=args.queue_lease)
+        CrawlWorker(c, queue).run()
+        queue.close()
+        if cache is not None:
+            cache.close()
+        finish_metrics()
+        return
+    if args.coordinator:
+        c = CrawlCoordinator(c, WorkQueue(args.coordinator, lease=args.queue_lease),
+                             interval=args.checkpoint_interval)
+
+    store: GraphStore = None
+    if args.output and not is_gexf(args.output):
+        store = GraphStore(args.output)
 
     g: nx.Graph = None
     g2: nx.Graph = None
     if args.input:
-        g = nx.read_gexf(args.input)
+        if store is not None and os.path.abspath(args.input) == os.path.abspath(args.output):
+            # Loading from the output store lets the next saves append to it.
+            g = store.load(graph_class=CompactGraph if args.compact else DeltaGraph, since=args.since)
+        else:
+            g = read_graph(args.input, since=args.since, compact=args.compact)
         print('Loaded graph from {0}'.format(args.input))
         if args.since:
-            nodes = g.nodes(data=True)
-            edges = g.edges(data=True)
-            g.remove_edges_from(
-                [(e1, e2) for e1, e2, d in edges if 'date' in d and dateutil.parser.parse(d['date']) < args.since])
-            g.remove_nodes_from(
-                [n for n, d in nodes if 'date' in d and dateutil.parser.parse(d['date']) < args.since])
             print('Excluded information prior to {0}'.format(args.since))
 
     if args.compare:
-        g2 = nx.read_gexf(args.compare)
-        print('Loaded graph from {0} for comparison'.format(args.input))
-
-    if args.query:
-        print('Searching for projects matching {0}'.format(args.query))
-        for g in c.find(args.query, limit=args.limit, since=args.since, previous=g):
-            if args.output:
-                nx.write_gexf(g, args.output)
-                print('Saved to {0}'.format(args.output))
-            analize_graph(g, limit=args.stats, draw=args.draw, cmp_with=g2)
+        g2 = read_graph(args.compare)
+        print('Loaded graph from {0} for comparison'.format(args.compare))
+
+    def save(graph: nx.Graph):
+        with metrics.phase('save'):
+            if store is not None:
+                store.save(graph)
+            else:
+                write_gexf(graph, args.output)
+        print('Saved to {0}'.format(args.output))
+
+    # The checkpoints of a crawl with an output save the graph there and only keep the crawl state. The coordinator
+    # keeps its state in the queue.
+    save_graph = save if args.output and not args.coordinator else None
+    query = args.query
+    since = args.since
+    checkpoint: CrawlCheckpoint = None
+    if args.resume:
+        if not args.checkpoint:
+            parser.error('--resume requires --checkpoint')
+        checkpoint = CrawlCheckpoint.load(args.checkpoint, interval=args.checkpoint_interval, save_graph=save_graph)
+        print('Resuming crawl from {0} after {1} repositories'.format(args.checkpoint, checkpoint.count))
+        query = query or checkpoint.query
+        since = since or checkpoint.since
+        graph = checkpoint.graph
+        if graph is None and args.output and os.path.exists(args.output) and not (
+                args.input and os.path.abspath(args.input) == os.path.abspath(args.output)):
+            # The graph of the crawl was saved to the output instead of the checkpoint.
+            if store is not None:
+                graph = store.load(graph_class=CompactGraph if args.compact else DeltaGraph)
+            else:
+                graph = read_graph(args.output, compact=args.compact)
+            checkpoint.rollback(graph)
+            print('Loaded graph from {0}'.format(args.output))
+        elif graph is None and g is not None:
+            checkpoint.rollback(g)
+        if graph is not None:
+            if args.compact and not isinstance(graph, CompactGraph):
+                graph = CompactGraph(graph)
+            if g is not None:
+                graph.update(g)
+            g = graph
+    elif args.checkpoint:
+        checkpoint = CrawlCheckpoint(args.checkpoint, interval=args.checkpoint_interval, save_graph=save_graph)
+
+    layout_store = store
+    if layout_store is None and (args.draw or args.draw_output) and args.input and GraphStore.is_store(args.input):
+        layout_store = GraphStore(args.input)
+    draw_options = {'layout': args.layout, 'max_nodes': args.draw_nodes, 'output': args.draw_output,
+                    'store': layout_store}
+
+    def analyze(graph: nx.Graph):
+        analize_graph(graph, limit=args.stats, draw=args.draw or bool(args.draw_output), cmp_with=g2,
+                      backend=args.backend, approx=args.approx, confidence=args.confidence, draw_options=draw_options,
+                      diff_output=args.diff_output, metrics=metrics)
+
+    if query:
+        print('Searching for projects matching {0}'.format(query))
+        analyzer: IncrementalAnalyzer = None
+        if args.incremental:
+            analyzer = IncrementalAnalyzer(growth=args.reanalyze_growth)
+        if args.compact:
+            if not isinstance(g, CompactGraph):
+                g = CompactGraph(g)
+        elif not isinstance(g, DeltaGraph) and (store is not None or analyzer is not None):
+            # Only the native store and the incremental analysis read the changes between batches.
+            g = DeltaGraph(g)
+        for g in c.find(query, limit=args.limit, since=since, previous=g, checkpoint=checkpoint):
+            if args.output and (checkpoint is None or checkpoint.save_graph is None):
+                save(g)
+            if analyzer is None:
+                analyze(g)
+                continue
+            analyzer.update(g)
+            analyzer.print_stats(args.stats)
+            if analyzer.due():
+                analyze(g)
+                analyzer.mark_analyzed()
+        if analyzer is not None and analyzer.pending:
+            analyze(g)
     elif g:
-        analize_graph(g, limit=args.stats, draw=args.draw, cmp_with=g2)
+        analyze(g)
     else:
         print('Nothing to analyze')
 
+    if args.export_gexf and g is not None:
+        write_gexf(g, args.export_gexf)
+        print('Exported to {0}'.format(args.export_gexf))
+    if store is not None:
+        store.close()
+    elif layout_store is not None:
+        layout_store.close()
+
+    if cache is not None:
+        print('Cache statistics: {0}'.format(cache.stats()))
+        cache.close()
+    finish_metrics()
+
 
 if __name__ == "__main__":
     main()
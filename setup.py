@@ -12,7 +12,7 @@ setuptools.setup(
     long_description=long_description,
     long_description_content_type="text/markdown",
     url="https://github.com/ALabrada/PyRepos/",
-    packages=setuptools.find_packages(),
+    packages=setuptools.find_packages(exclude=['benchmarks', 'tests']),
     entry_points={
         'console_scripts': ['reponet=reponetwork.repos:main'],
     },
@@ -23,6 +23,10 @@ setuptools.setup(
         "Matplotlib",
         "wxPython",
     ],
+    extras_require={
+        'async': ["aiohttp"],
+        'sparse': ["numpy", "scipy"],
+    },
     classifiers=[
         "Programming Language :: Python :: 3",
         "License :: OSI Approved :: MIT License",
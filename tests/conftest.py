@@ -0,0 +1,4 @@
+import pytest
+
+# The assertions of the shared helpers report the differences like the ones of the tests.
+pytest.register_assert_rewrite('tests.helpers')
@@ -0,0 +1,24 @@
+import contextlib
+import io
+
+import networkx as nx
+
+
+def crawl(crawler, query: str = 'project', **kwargs) -> nx.Graph:
+    # The last graph yielded by the crawler, without its progress messages.
+    g = None
+    with contextlib.redirect_stdout(io.StringIO()):
+        for g in crawler.find(query, **kwargs):
+            pass
+    return g
+
+
+def assert_same_graph(expected, g, data: bool = False):
+    # Same nodes and same edges, as unordered pairs. With data, the attributes of both are also compared.
+    if data:
+        assert dict(g.nodes(data=True)) == dict(expected.nodes(data=True))
+        assert {frozenset((u, v)): d for u, v, d in g.edges(data=True)} == \
+            {frozenset((u, v)): d for u, v, d in expected.edges(data=True)}
+    else:
+        assert set(g.nodes) == set(expected.nodes)
+        assert {frozenset(e) for e in g.edges} == {frozenset(e) for e in expected.edges}
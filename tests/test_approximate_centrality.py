@@ -0,0 +1,28 @@
+import pytest
+
+from benchmarks.analysis_backends import synthetic_graph
+from reponetwork.SparseBipartite import SparseBipartite
+
+LIMIT = 10
+
+
+def top(values: dict, nodes: list) -> list:
+    return sorted(nodes, key=lambda n: values[n], reverse=True)[:LIMIT]
+
+
+def check(exact: dict, approximate: dict, errors: dict, nodes: list):
+    expected = top(exact, nodes)
+    found = top(approximate, nodes)
+    assert len(set(expected) & set(found)) >= 0.7 * LIMIT
+    assert all(errors[n] >= 0 for n in found)
+
+
+@pytest.mark.parametrize('seed', [0, 1, 2])
+def test_sampled_top_k_overlaps_the_exact_one(seed):
+    g = synthetic_graph(200, 2000, 20, seed)
+    matrix = SparseBipartite(g)
+    closeness, closeness_errors, _ = matrix.sample_closeness_centrality(256, limit=LIMIT, confidence=0.95, seed=seed)
+    check(matrix.closeness_centrality('repos'), closeness, closeness_errors, matrix.repos)
+    betweenness, betweenness_errors, _ = matrix.sample_betweenness_centrality(256, limit=LIMIT, confidence=0.95,
+                                                                              seed=seed)
+    check(matrix.betweenness_centrality(), betweenness, betweenness_errors, matrix.users)
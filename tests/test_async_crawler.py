@@ -0,0 +1,25 @@
+import pytest
+
+from benchmarks.mock_api import Ecosystem, GithubHandler, MockServer
+from reponetwork.AsyncGithubCrawler import AsyncGithubCrawler, aiohttp
+from reponetwork.GithubCrawler import GithubCrawler
+from tests.helpers import assert_same_graph, crawl
+
+
+@pytest.mark.skipif(aiohttp is None, reason='aiohttp is not installed')
+def test_async_engine_builds_the_threaded_graph(monkeypatch):
+    # GitHub answers the contributors of an empty repository with No Content.
+    route = GithubHandler._route
+
+    def empty_route(self, method, path, params, body):
+        if path == '/repos/org3/project3/contributors':
+            return 204, None, None
+        return route(self, method, path, params, body)
+
+    monkeypatch.setattr(GithubHandler, '_route', empty_route)
+    ecosystem = Ecosystem(repos=10, users=60, fork_ratio=0.5, seed=1)
+    with MockServer(ecosystem) as server:
+        expected = crawl(GithubCrawler(None, None, None, url=server.base_url))
+        g = crawl(AsyncGithubCrawler(None, None, None, url=server.base_url))
+    assert 'org3/project3' in expected
+    assert_same_graph(expected, g, data=True)
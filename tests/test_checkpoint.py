@@ -0,0 +1,50 @@
+import os
+
+import networkx as nx
+
+from benchmarks.mock_api import Ecosystem, MockServer
+from reponetwork.CrawlCheckpoint import CrawlCheckpoint
+from reponetwork.DeltaGraph import DeltaGraph
+from reponetwork.GithubCrawler import GithubCrawler
+from reponetwork.GraphStore import GraphStore
+from tests.helpers import assert_same_graph, crawl
+
+
+def interrupted_crawl(server: MockServer, checkpoint: CrawlCheckpoint, previous: nx.Graph = None):
+    # The crawl is stopped when the rate limit is exceeded, in the middle of a batch, and the quota is restored.
+    server.quota = 40
+    next(GithubCrawler(None, None, None, url=server.base_url).find('project', previous=previous,
+                                                                   checkpoint=checkpoint))
+    server.quota = None
+    server.usage.clear()
+
+
+def test_resumed_crawl_builds_the_whole_graph(tmp_path, capsys):
+    # The search also finds the forks, so parents are imported with a fork while they are still queued.
+    ecosystem = Ecosystem(repos=12, users=80, fork_ratio=0.6, seed=2)
+    path = os.path.join(tmp_path, 'crawl.json')
+    with MockServer(ecosystem, search_forks=True) as server:
+        interrupted_crawl(server, CrawlCheckpoint(path, interval=0))
+        expected = crawl(GithubCrawler(None, None, None, url=server.base_url))
+        checkpoint = CrawlCheckpoint.load(path, interval=0)
+        assert checkpoint.frontier and checkpoint.graph is not None
+        resumed = crawl(GithubCrawler(None, None, None, url=server.base_url), checkpoint=checkpoint,
+                        previous=checkpoint.graph)
+    assert_same_graph(expected, resumed, data=True)
+
+
+def test_checkpoint_keeps_the_graph_in_the_output(tmp_path, capsys):
+    ecosystem = Ecosystem(repos=12, users=80, fork_ratio=0.6, seed=2)
+    path = os.path.join(tmp_path, 'crawl.json')
+    store = GraphStore(os.path.join(tmp_path, 'graph.db'))
+    with MockServer(ecosystem, search_forks=True) as server:
+        interrupted_crawl(server, CrawlCheckpoint(path, interval=0, save_graph=store.save), previous=DeltaGraph())
+        expected = crawl(GithubCrawler(None, None, None, url=server.base_url))
+        checkpoint = CrawlCheckpoint.load(path, interval=0, save_graph=store.save)
+        assert checkpoint.graph is None
+        g = store.load()
+        checkpoint.rollback(g)
+        resumed = crawl(GithubCrawler(None, None, None, url=server.base_url), checkpoint=checkpoint, previous=g)
+    store.close()
+    assert_same_graph(expected, resumed, data=True)
+    assert_same_graph(expected, GraphStore(os.path.join(tmp_path, 'graph.db')).load(), data=True)
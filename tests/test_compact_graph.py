@@ -0,0 +1,61 @@
+import random
+
+import networkx as nx
+
+from reponetwork.CompactGraph import CompactGraph
+from tests.helpers import assert_same_graph
+
+
+def random_graph(seed: int) -> nx.Graph:
+    rng = random.Random(seed)
+    g = nx.Graph()
+    for i in range(300):
+        repo = 'org/project{0}'.format(i)
+        g.add_node(repo, bipartite=0, language=rng.choice(['Python', 'Go']), weight=rng.randrange(100),
+                   date='2020-01-{0:02d}T00:00:00+00:00'.format(rng.randrange(1, 29)))
+        for _ in range(rng.randrange(1, 6)):
+            user = 'user{0}'.format(int(200 * rng.random() ** 2))
+            g.add_node(user, bipartite=1)
+            g.add_edge(user, repo, relation=rng.choice(['owner', 'contributor']))
+    return g
+
+
+def assert_same_compact_graph(expected: nx.Graph, g: CompactGraph):
+    # The arrays also keep the order of the nodes and the degrees of networkx.
+    assert_same_graph(expected, g, data=True)
+    assert list(g.nodes) == list(expected.nodes)
+    assert dict(g.degree) == dict(expected.degree)
+
+
+def test_removals_match_networkx_and_compact_the_arrays():
+    rng = random.Random(1)
+    expected = random_graph(0)
+    g = CompactGraph(expected)
+    for _ in range(8):
+        nodes = rng.sample(list(expected.nodes), 30)
+        expected.remove_nodes_from(nodes)
+        g.remove_nodes_from(nodes)
+        edges = rng.sample(list(expected.edges), 20)
+        expected.remove_edges_from(edges)
+        g.remove_edges_from(edges)
+        assert_same_compact_graph(expected, g)
+        assert len(g.source) <= 2 * g.number_of_edges() + 1
+        assert len(g.names) <= 2 * g.number_of_nodes() + 1
+        assert all(len(x) == len(g.source) for x in g.edge_data.values())
+
+    # The graph keeps growing after the arrays were compacted.
+    g.add_edge('user1', 'org/new', relation='fork', fork_source='user1/new')
+    expected.add_edge('user1', 'org/new', relation='fork', fork_source='user1/new')
+    assert_same_compact_graph(expected, g)
+    assert set(frozenset(c) for c in g.connected_components()) == \
+        set(frozenset(c) for c in nx.connected_components(expected))
+
+
+def test_removing_many_users_of_a_popular_repository():
+    g = CompactGraph()
+    g.add_edges_from(('user{0}'.format(i), 'big/repo') for i in range(1000))
+    g.add_edges_from(('user{0}'.format(i), 'small/repo') for i in range(10))
+    g.remove_nodes_from(['user{0}'.format(i) for i in range(500)])
+    assert g.degree['big/repo'] == 500
+    assert g.degree['small/repo'] == 0
+    assert g.number_of_edges() == 500
@@ -0,0 +1,55 @@
+import contextlib
+import io
+import multiprocessing
+import os
+import time
+
+from benchmarks.mock_api import Ecosystem, MockServer
+from reponetwork.DistributedCrawler import CrawlCoordinator, CrawlWorker
+from reponetwork.GithubCrawler import GithubCrawler
+from reponetwork.WorkQueue import WorkQueue
+from tests.helpers import assert_same_graph, crawl
+
+
+def run_worker(url: str, token: str, path: str):
+    with contextlib.redirect_stdout(io.StringIO()):
+        crawler = GithubCrawler(token=token, user=None, password=None, url=url)
+        CrawlWorker(crawler, WorkQueue(path), name=token, batch=3, poll=0.1).run()
+
+
+def test_expired_leases_are_claimed_again(tmp_path):
+    queue = WorkQueue(os.path.join(tmp_path, 'queue.db'), lease=0.2)
+    queue.push([('a/a', {'id': 'a/a'}), ('b/b', {'id': 'b/b'})])
+    assert [x for x, _ in queue.claim('w1', 1)] == ['a/a']
+    assert [x for x, _ in queue.claim('w2', 5)] == ['b/b']
+    assert queue.claim('w2', 5) == []
+
+    time.sleep(0.3)
+    # The lease of the first worker expired: the repository goes to the second one.
+    assert queue.claim('w2', 5) == [('a/a', {'id': 'a/a'}), ('b/b', {'id': 'b/b'})]
+    # The first worker no longer owns it and cannot release it.
+    queue.release(['a/a'], 'w1')
+    assert queue.counts()['claimed'] == 2
+    queue.complete(['a/a', 'b/b'], 'w2', [], [('c/c', {'id': 'c/c'})])
+    assert queue.counts() == {'pending': 1, 'claimed': 0, 'done': 2, 'results': 0}
+    assert queue.claim('w1', 5) == [('c/c', {'id': 'c/c'})]
+    queue.release(['c/c'], 'w1')
+    assert queue.counts()['pending'] == 1
+    queue.close()
+
+
+def test_distributed_crawl_builds_the_local_graph(tmp_path):
+    ecosystem = Ecosystem(repos=12, users=80, fork_ratio=0.5, seed=1)
+    with MockServer(ecosystem) as server:
+        expected = crawl(GithubCrawler(token=None, user=None, password=None, url=server.base_url))
+    path = os.path.join(tmp_path, 'queue.db')
+    with MockServer(ecosystem, per_token=True) as server:
+        workers = [multiprocessing.Process(target=run_worker, args=(server.base_url, 'worker{0}'.format(i), path))
+                   for i in range(2)]
+        for worker in workers:
+            worker.start()
+        crawler = GithubCrawler(token='coordinator', user=None, password=None, url=server.base_url)
+        g = crawl(CrawlCoordinator(crawler, WorkQueue(path), poll=0.1))
+        for worker in workers:
+            worker.join()
+    assert_same_graph(expected, g, data=True)
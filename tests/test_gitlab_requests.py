@@ -0,0 +1,23 @@
+import math
+
+from benchmarks.mock_api import Ecosystem, MockServer
+from reponetwork.GitlabCrawler import GitlabCrawler
+from tests.helpers import crawl
+
+
+def test_requests_per_repo(capsys):
+    ecosystem = Ecosystem(repos=20, users=150, fork_ratio=0.5, seed=0)
+    with MockServer(ecosystem, api='gitlab') as server:
+        g = crawl(GitlabCrawler(server.base_url, token='test', user=None, password=None))
+
+    repos = [n for n, d in g.nodes(data=True) if d['bipartite'] == 0]
+    assert sorted(repos) == sorted(ecosystem.repos)
+    # The forks are built from the forks listing and the languages come from GraphQL batches, so each repository
+    # only needs the listing of its forks and the pages of its contributors.
+    endpoints = server.endpoints
+    contributor_pages = sum(math.ceil(len(ecosystem.contributors[x]) / 20) for x in repos)
+    assert set(endpoints) == {'GET /api/v4/projects', 'POST /api/graphql', 'GET /api/v4/projects/{id}/forks',
+                              'GET /api/v4/projects/{id}/repository/contributors'}
+    assert endpoints['GET /api/v4/projects/{id}/forks'] == len(repos)
+    assert endpoints['GET /api/v4/projects/{id}/repository/contributors'] == contributor_pages
+    assert server.requests <= 2.5 * len(repos)
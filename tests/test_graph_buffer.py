@@ -0,0 +1,45 @@
+import networkx as nx
+
+from benchmarks.mock_api import Ecosystem, GithubHandler, MockServer
+from reponetwork.GithubCrawler import GithubCrawler
+from reponetwork.GraphBuffer import GraphBuffer, GraphWriter
+
+
+def fork_buffer(repo_id: str, owner: str, parent_id: str) -> GraphBuffer:
+    buffer = GraphBuffer(repo_id)
+    buffer.link_user(parent_id, owner, relation='fork', fork_source=repo_id)
+    buffer.add_repo(bipartite=0, language='Python', weight=1)
+    buffer.link_user(repo_id, owner, relation='owner')
+    return buffer
+
+
+def test_fork_links_wait_for_the_parent():
+    g = nx.Graph()
+    writer = GraphWriter(g)
+    writer.merge([fork_buffer('b/p', 'b', 'a/p')])
+    assert not g.has_edge('b', 'a/p') and 'a/p' in writer.deferred
+    parent = GraphBuffer('a/p')
+    parent.add_repo(bipartite=0, language='Python', weight=1)
+    writer.merge([parent])
+    assert g.edges['b', 'a/p']['relation'] == 'fork'
+    assert not writer.deferred
+
+
+def test_links_to_parents_never_imported_are_dropped(capsys, monkeypatch):
+    # The parent fails, so the link of its forks cannot be merged.
+    route = GithubHandler._route
+
+    def failing_route(self, method, path, params, body):
+        if path == '/repos/org5/project5/contributors':
+            return 404, {'message': 'Not Found'}, None
+        return route(self, method, path, params, body)
+
+    monkeypatch.setattr(GithubHandler, '_route', failing_route)
+    ecosystem = Ecosystem(repos=6, users=40, fork_ratio=0.6, seed=2)
+    with MockServer(ecosystem, search_forks=True) as server:
+        g = None
+        for g in GithubCrawler(None, None, None, url=server.base_url).find('project'):
+            pass
+    assert 'org5/project5' not in g
+    assert 'user21/project5' in g
+    assert 'links to repositories that were not imported' in capsys.readouterr().out
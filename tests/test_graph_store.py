@@ -0,0 +1,107 @@
+import os
+import sqlite3
+from datetime import datetime, timezone
+
+import pytest
+
+from reponetwork.CompactGraph import CompactGraph
+from reponetwork.DeltaGraph import DeltaGraph
+from reponetwork.GraphStore import GraphStore
+from reponetwork.IncrementalAnalyzer import IncrementalAnalyzer
+from tests.helpers import assert_same_graph
+
+
+def add_repo(g, repo: str, user: str, date: str):
+    g.add_node(repo, bipartite=0, language='Python', weight=1, date=date)
+    g.add_edge(user, repo, relation='contributor', date=date)
+    g.nodes[user]['bipartite'] = 1
+
+
+@pytest.mark.parametrize('graph_class', [DeltaGraph, CompactGraph])
+def test_saves_append_and_reload(tmp_path, graph_class):
+    path = os.path.join(tmp_path, 'graph.db')
+    store = GraphStore(path)
+    g = graph_class()
+    add_repo(g, 'a/old', 'a', '2010-01-01T00:00:00')
+    store.save(g)
+    add_repo(g, 'b/new', 'b', '2020-01-01T00:00:00')
+    g.add_edge('a', 'b/new', relation='fork', fork_source='a/new', date='2020-02-01T00:00:00')
+    store.save(g)
+    store.close()
+
+    store = GraphStore(path)
+    loaded = store.load(graph_class=graph_class)
+    assert_same_graph(g, loaded, data=True)
+    # A graph loaded from the store is extended, not rewritten.
+    add_repo(loaded, 'c/newer', 'c', '2021-01-01T00:00:00')
+    store.save(loaded)
+    assert store._db.execute('SELECT COUNT(*) FROM edges').fetchone()[0] == 4
+    assert_same_graph(loaded, store.load(graph_class=graph_class), data=True)
+    recent = store.load(graph_class=graph_class, since=datetime(2015, 1, 1, tzinfo=timezone.utc))
+    # Users have no date and are kept with their recent edges.
+    assert set(recent.nodes) == {'b/new', 'c/newer', 'a', 'b', 'c'} and recent.number_of_edges() == 3
+    store.close()
+
+
+@pytest.mark.parametrize('graph_class', [DeltaGraph, CompactGraph])
+def test_removals_rewrite_the_store(tmp_path, graph_class):
+    path = os.path.join(tmp_path, 'graph.db')
+    store = GraphStore(path)
+    g = graph_class()
+    add_repo(g, 'a/old', 'a', '2010-01-01T00:00:00')
+    add_repo(g, 'b/new', 'b', '2020-01-01T00:00:00')
+    store.save(g)
+    g.remove_node('a/old')
+    g.remove_node('a')
+    store.save(g)
+    assert_same_graph(g, store.load(graph_class=graph_class), data=True)
+    store.close()
+
+
+def test_logs_are_trimmed_to_the_oldest_consumer(tmp_path):
+    g = DeltaGraph()
+    add_repo(g, 'a/old', 'a', '2010-01-01T00:00:00')
+    # Nothing is logged without consumers.
+    assert not g.node_log and not g.edge_log
+    store = GraphStore(os.path.join(tmp_path, 'graph.db'))
+    analyzer = IncrementalAnalyzer()
+    store.save(g)
+    analyzer.update(g)
+    add_repo(g, 'b/new', 'b', '2020-01-01T00:00:00')
+    store.save(g)
+    assert len(g.edge_log) == 1
+    analyzer.update(g)
+    assert not g.edge_log
+    add_repo(g, 'c/newer', 'c', '2021-01-01T00:00:00')
+    analyzer.update(g)
+    store.save(g)
+    assert not g.node_log and not g.edge_log
+    assert_same_graph(g, store.load(), data=True)
+    store.close()
+
+
+def test_old_store_gets_the_time_column(tmp_path):
+    # A store written before the dates were indexed.
+    path = os.path.join(tmp_path, 'graph.db')
+    db = sqlite3.connect(path)
+    db.execute('CREATE TABLE strings (id INTEGER PRIMARY KEY, value)')
+    db.execute('CREATE TABLE nodes (id INTEGER PRIMARY KEY, bipartite, language INTEGER, weight, date TEXT, '
+               'extra TEXT)')
+    db.execute('CREATE TABLE edges (source INTEGER, target INTEGER, relation INTEGER, date TEXT, '
+               'fork_source INTEGER, extra TEXT)')
+    db.executemany('INSERT INTO strings VALUES (?, ?)',
+                   [(1, 'old/repo'), (2, 'new/repo'), (3, 'user'), (4, 'Python'), (5, 'contributor')])
+    db.executemany('INSERT INTO nodes VALUES (?, ?, ?, ?, ?, ?)',
+                   [(1, 0, 4, 1, '2010-01-01T00:00:00', None), (2, 0, 4, 1, '2020-01-01T00:00:00', None),
+                    (3, 1, None, None, None, None)])
+    db.executemany('INSERT INTO edges VALUES (?, ?, ?, ?, ?, ?)',
+                   [(3, 1, 5, '2010-01-01T00:00:00', None, None), (3, 2, 5, '2020-01-01T00:00:00', None, None)])
+    db.commit()
+    db.close()
+
+    store = GraphStore(path)
+    g = store.load(since=datetime(2015, 1, 1, tzinfo=timezone.utc))
+    store.close()
+    assert set(g.nodes) == {'new/repo', 'user'}
+    assert set(g.edges) == {('user', 'new/repo')}
+    assert GraphStore(path).load().number_of_edges() == 2
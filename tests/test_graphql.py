@@ -0,0 +1,29 @@
+from benchmarks.mock_api import Ecosystem, GithubHandler, MockServer
+from reponetwork.GithubCrawler import GithubCrawler
+from tests.helpers import assert_same_graph, crawl
+
+
+def test_graphql_builds_the_rest_graph(capsys):
+    # The search also finds the forks, so some parents are skipped because they are already claimed.
+    ecosystem = Ecosystem(repos=15, users=100, fork_ratio=0.6, seed=3)
+    with MockServer(ecosystem, search_forks=True) as server:
+        expected = crawl(GithubCrawler(None, None, None, url=server.base_url))
+        rest_requests = server.requests
+        server.reset_counters()
+        crawler = GithubCrawler(None, None, None, url=server.base_url, graphql=True)
+        g = crawl(crawler)
+    assert_same_graph(expected, g, data=True)
+    assert server.endpoints['POST /graphql'] > 0
+    assert server.requests < rest_requests
+    assert not crawler.prefetched
+
+
+def test_graphql_errors_fall_back_to_rest(capsys, monkeypatch):
+    monkeypatch.setattr(GithubHandler, '_graphql', lambda self, body: (502, {'message': 'Server Error'}, None))
+    ecosystem = Ecosystem(repos=15, users=100, fork_ratio=0.6, seed=3)
+    with MockServer(ecosystem, search_forks=True) as server:
+        expected = crawl(GithubCrawler(None, None, None, url=server.base_url))
+        crawler = GithubCrawler(None, None, None, url=server.base_url, graphql=True)
+        g = crawl(crawler)
+    assert_same_graph(expected, g, data=True)
+    assert not crawler.prefetched
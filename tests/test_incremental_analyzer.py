@@ -0,0 +1,36 @@
+import random
+
+from reponetwork.DeltaGraph import DeltaGraph
+from reponetwork.IncrementalAnalyzer import IncrementalAnalyzer, WeightIndex
+
+
+def test_weight_index_top():
+    index = WeightIndex()
+    for key, weight in [('a', 5), ('b', 3), ('c', 9), ('d', 1)]:
+        index.set(key, weight)
+    index.set('a', 0)
+    index.discard('c')
+    index.set('b', 3)
+    assert index.top(2) == ['b', 'd'] and len(index) == 3
+    # Reading the top keeps it.
+    assert index.top(5) == ['b', 'd', 'a']
+
+
+def test_risked_projects_follow_the_batches():
+    rng = random.Random(0)
+    g = DeltaGraph()
+    analyzer = IncrementalAnalyzer()
+    for batch in range(20):
+        for i in range(50):
+            repo = 'repo{0}'.format(rng.randrange(400))
+            g.add_node(repo, bipartite=0, weight=rng.randrange(1000))
+            user = 'user{0}'.format(rng.randrange(300))
+            g.add_node(user, bipartite=1)
+            g.add_edge(user, repo)
+        analyzer.update(g)
+
+        risked = [n for n, d in g.nodes(data=True) if d['bipartite'] == 0 and g.degree[n] <= 1]
+        expected = sorted((g.nodes[n]['weight'] for n in risked), reverse=True)[:10]
+        assert len(analyzer.risked) == len(risked)
+        assert [g.nodes[n]['weight'] for n in analyzer.risked.top(10)] == expected
+        assert len(analyzer.risked.heap) <= 2 * len(risked) + 64
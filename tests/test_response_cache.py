@@ -0,0 +1,83 @@
+import os
+import time
+
+from benchmarks.mock_api import Ecosystem, MockServer
+from reponetwork.GithubCrawler import GithubCrawler
+from reponetwork.ResponseCache import ResponseCache
+from tests.helpers import assert_same_graph, crawl
+
+
+def api_requests(server: MockServer) -> int:
+    # The rate limit status is never cached.
+    return sum(n for endpoint, n in server.endpoints.items() if not endpoint.endswith('/rate_limit'))
+
+
+def test_second_crawl_is_served_from_cache(tmp_path):
+    ecosystem = Ecosystem(repos=10, users=60, seed=1)
+    cache = ResponseCache(os.path.join(tmp_path, 'cache.db'), ttl=3600)
+    with MockServer(ecosystem) as server:
+        first = crawl(GithubCrawler(None, None, None, cache=cache, url=server.base_url))
+        requests_count = api_requests(server)
+        stats = cache.stats()
+        assert stats['hits'] == 0 and stats['misses'] == requests_count
+
+        server.reset_counters()
+        second = crawl(GithubCrawler(None, None, None, cache=cache, url=server.base_url))
+        assert api_requests(server) == 0
+    stats = cache.stats()
+    cache.close()
+
+    assert stats['hits'] == requests_count
+    assert stats['hit_rate'] == 0.5
+    assert_same_graph(first, second, data=True)
+
+
+def test_fresh_hits_do_not_replay_the_quota(tmp_path):
+    cache = ResponseCache(os.path.join(tmp_path, 'cache.db'), ttl=3600)
+    with MockServer(Ecosystem(repos=2, users=10), quota=100) as server:
+        client = GithubCrawler(None, None, None, cache=cache, url=server.base_url).client
+        client.get_repo('org0/project0')
+        client.get_repo('org1/project1')
+        assert client.get_repo('org0/project0').full_name == 'org0/project0'
+        # The cached response does not report the quota of the first request as the current one.
+        assert client.requester.rate_limiting == (98, 100)
+        assert cache.stats()['hits'] == 1
+    cache.close()
+
+
+def test_stale_entries_are_revalidated(tmp_path):
+    ecosystem = Ecosystem(repos=10, users=60, seed=1)
+    cache = ResponseCache(os.path.join(tmp_path, 'cache.db'), ttl=0)
+    with MockServer(ecosystem) as server:
+        first = crawl(GithubCrawler(None, None, None, cache=cache, url=server.base_url))
+        requests_count = api_requests(server)
+        assert server.not_modified == 0
+
+        server.reset_counters()
+        second = crawl(GithubCrawler(None, None, None, cache=cache, url=server.base_url))
+        # Every request reaches the server, which answers Not Modified with no body.
+        assert api_requests(server) == requests_count
+        assert server.not_modified == requests_count
+    stats = cache.stats()
+    cache.close()
+
+    assert stats['hits'] == 0
+    assert stats['revalidations'] == requests_count
+    assert_same_graph(first, second, data=True)
+
+
+def test_revalidations_extend_the_freshness(tmp_path):
+    cache = ResponseCache(os.path.join(tmp_path, 'cache.db'), ttl=0.5)
+    with MockServer(Ecosystem(repos=2, users=10), quota=100) as server:
+        client = GithubCrawler(None, None, None, cache=cache, url=server.base_url).client
+        client.get_repo('org0/project0')
+        time.sleep(0.6)
+        # The stale entry is revalidated and the cached body is served with the current quota.
+        assert client.get_repo('org0/project0').full_name == 'org0/project0'
+        assert cache.stats()['revalidations'] == 1 and server.not_modified == 1
+        assert client.requester.rate_limiting == (98, 100)
+        # The revalidation made the entry fresh again, and its hit does not replay the quota.
+        assert client.get_repo('org0/project0').full_name == 'org0/project0'
+        assert cache.stats()['hits'] == 1 and server.requests == 2
+        assert client.requester.rate_limiting == (98, 100)
+    cache.close()
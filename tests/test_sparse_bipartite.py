@@ -0,0 +1,16 @@
+import pytest
+from networkx.algorithms import bipartite
+
+from benchmarks.analysis_backends import synthetic_graph
+from reponetwork.SparseBipartite import SparseBipartite, sp
+
+
+@pytest.mark.skipif(sp is None, reason='numpy and scipy are not installed')
+def test_projection_degrees_match_networkx():
+    g = synthetic_graph(100, 600, 10, 0)
+    matrix = SparseBipartite(g)
+    # The co-contributors of a user are its neighbours in the projection of the graph on the users.
+    users = bipartite.projected_graph(g, matrix.users)
+    assert matrix.co_contributors() == dict(users.degree)
+    repos = bipartite.projected_graph(g, matrix.repos)
+    assert matrix.shared_contributors() == dict(repos.degree)